@@ -0,0 +1,332 @@
+import bisect
+import sys
+from datetime import date
+from itertools import repeat
+
+from cartera import ordinal_fecha
+from dinero import a_centavos, de_centavos
+from metricas import contar, medido
+from saldos import es_traspaso
+
+# Totales de cobranza materializados: lo cobrado por día, por semana y por
+# cobrador, y las cuotas semanales esperadas (monto_total / plazo_semanas,
+# como en resta_pago) repartidas en las semanas de cada préstamo. Se arman una
+# vez recorriendo la cartera y después se actualizan con cada préstamo y pago
+# registrado (ver Datos.acumulados), así consultar un período lee solo las
+# cubetas de esos días o semanas en vez de todos los pagos.
+#
+# También lo prestado por día de inicio y los préstamos saldados por día del
+# pago que los saldó: con eso sale el saldo de la cartera a una fecha pasada.
+# En un renganche solo cuenta como prestado el crédito nuevo y el saldo que
+# pasa del préstamo anterior no cuenta como cobrado.
+# Cada serie guarda una instantánea de sus totales cada PERIODO_CORTE días, y
+# una consulta "al día D" suma solo las cubetas desde la instantánea anterior.
+#
+# Se guardan junto a la instantánea (database.acumulados.json) con la
+# "secuencia" que reflejan; al cargar se usan solo si coinciden con ella.
+#
+# Uso: python acumulados.py [desde] [hasta]     cobranza del período
+#      python acumulados.py saldo [fecha]       saldo de la cartera a una fecha
+#      python acumulados.py reconstruir         recalcular desde los pagos
+
+SIN_COBRADOR = ""
+# Cambia cuando cambian las series guardadas: un archivo de otra versión se
+# descarta y los totales se rearman desde los pagos
+VERSION = 3
+PERIODO_CORTE = 28  # días entre instantáneas de los totales de cada serie
+
+
+# Lunes (día ordinal) de la semana de un día ordinal; el día 1 fue lunes
+def lunes(dia):
+    return dia - (dia - 1) % 7
+
+def _ordinal(fecha):
+    return fecha if isinstance(fecha, int) else ordinal_fecha(fecha)
+
+def _fecha(dia):
+    return date.fromordinal(dia).isoformat()
+
+
+class Serie:
+    """Cubetas {día ordinal: [centavos, pagos]} con las claves ordenadas"""
+
+    def __init__(self, cubetas=None):
+        self.cubetas = cubetas or {}
+        self.claves = sorted(self.cubetas)
+        # Instantáneas: período -> [centavos, pagos] de todos los días
+        # anteriores a ese período. Se arman al consultarlas, desde la primera.
+        self.cortes = {}
+        self.primer_corte = self.ultimo_corte = None
+
+    def sumar(self, clave, centavos, pagos=1):
+        cubeta = self.cubetas.get(clave)
+        if cubeta is None:
+            cubeta = self.cubetas[clave] = [0, 0]
+            if self.claves and clave < self.claves[-1]:
+                bisect.insort(self.claves, clave)
+            else:
+                self.claves.append(clave)
+        cubeta[0] += centavos
+        cubeta[1] += pagos
+        # Un pago con fecha atrasada cambia las instantáneas posteriores
+        if self.ultimo_corte is not None and clave < self.ultimo_corte * PERIODO_CORTE:
+            for periodo in range(max(clave // PERIODO_CORTE + 1, self.primer_corte), self.ultimo_corte + 1):
+                self.cortes[periodo][0] += centavos
+                self.cortes[periodo][1] += pagos
+
+    def _cortar(self, periodo):
+        """Armar las instantáneas que falten hasta la del período"""
+        if self.ultimo_corte is None:
+            self.primer_corte = self.ultimo_corte = self.claves[0] // PERIODO_CORTE
+            self.cortes[self.ultimo_corte] = [0, 0]
+        while self.ultimo_corte < periodo:
+            inicio = self.ultimo_corte * PERIODO_CORTE
+            centavos, pagos = self.total(inicio, inicio + PERIODO_CORTE - 1)
+            anterior = self.cortes[self.ultimo_corte]
+            self.ultimo_corte += 1
+            self.cortes[self.ultimo_corte] = [anterior[0] + centavos, anterior[1] + pagos]
+
+    def acumulado(self, hasta):
+        """(centavos, pagos) de todos los días hasta el día hasta, inclusive:
+        la instantánea anterior más las cubetas desde ella"""
+        if not self.claves or hasta < self.claves[0]:
+            return 0, 0
+        periodo = hasta // PERIODO_CORTE
+        self._cortar(periodo)
+        if periodo < self.primer_corte:
+            return self.total(self.claves[0], hasta)
+        centavos, pagos = self.total(periodo * PERIODO_CORTE, hasta)
+        corte = self.cortes[periodo]
+        return corte[0] + centavos, corte[1] + pagos
+
+    def entre(self, desde, hasta):
+        inicio = bisect.bisect_left(self.claves, desde)
+        fin = bisect.bisect_right(self.claves, hasta)
+        for clave in self.claves[inicio:fin]:
+            yield clave, self.cubetas[clave]
+
+    def total(self, desde, hasta):
+        centavos = pagos = 0
+        for _, cubeta in self.entre(desde, hasta):
+            centavos += cubeta[0]
+            pagos += cubeta[1]
+        return centavos, pagos
+
+    def a_json(self):
+        return {_fecha(clave): cubeta for clave, cubeta in self.cubetas.items()}
+
+    @classmethod
+    def de_json(cls, valores):
+        return cls({ordinal_fecha(fecha): list(cubeta) for fecha, cubeta in valores.items()})
+
+
+class Acumulados:
+    """Cobranza por día, semana y cobrador, y cuotas esperadas por semana"""
+
+    def __init__(self):
+        self.dias = Serie()
+        self.semanas = Serie()
+        self.cobradores = {}  # cobrador -> Serie por día
+        self.esperado = {}    # lunes -> centavos de cuotas semanales esperados esa semana
+        self.prestamos = Serie()   # [centavos prestados, préstamos] por día de inicio
+        self.saldados = Serie()    # [0, préstamos] por día del pago que los saldó
+
+    def _sumar(self, dia, centavos, cobrador):
+        self.dias.sumar(dia, centavos)
+        self.semanas.sumar(lunes(dia), centavos)
+        cobrador = cobrador or SIN_COBRADOR
+        serie = self.cobradores.get(cobrador)
+        if serie is None:
+            serie = self.cobradores[sys.intern(cobrador)] = Serie()
+        serie.sumar(dia, centavos)
+
+    def agregar_pago(self, pago):
+        if es_traspaso(pago):
+            return
+        try:
+            dia = ordinal_fecha(pago["fecha"])
+            centavos = a_centavos(pago["monto"])
+        except (TypeError, ValueError, OverflowError):
+            return  # pago con fecha o monto ilegible: no entra en los totales
+        self._sumar(dia, centavos, pago.get("cobrador"))
+
+    # Pago que dejó el préstamo sin saldo
+    def agregar_saldado(self, pago):
+        try:
+            self.saldados.sumar(ordinal_fecha(pago["fecha"]), 0)
+        except (TypeError, ValueError):
+            pass
+
+    def agregar_prestamo(self, prestamo):
+        try:
+            inicio = ordinal_fecha(prestamo["fecha_inicio"])
+            monto = a_centavos(prestamo["monto_total"])
+            self.prestamos.sumar(inicio, monto - a_centavos(prestamo.get("saldo_anterior", 0)))
+            dias = 7 * int(prestamo["plazo_semanas"])
+        except (TypeError, ValueError, OverflowError):
+            return
+        if dias <= 0:
+            return
+        # Cada día del plazo espera un séptimo de la cuota. Se reparte en
+        # centavos con la regla de Cuotas.esperado sobre los días (lo esperado
+        # hasta el día t es monto * t / dias redondeado), así las semanas
+        # suman exactamente el préstamo; se suma por semana de calendario (el
+        # préstamo puede empezar cualquier día).
+        dia, fin = inicio, inicio + dias
+        while dia < fin:
+            siguiente = min(lunes(dia) + 7, fin)
+            centavos = ((2 * monto * (siguiente - inicio) + dias) // (2 * dias)
+                        - (2 * monto * (dia - inicio) + dias) // (2 * dias))
+            self.esperado[lunes(dia)] = self.esperado.get(lunes(dia), 0) + centavos
+            dia = siguiente
+
+    @classmethod
+    @medido("construir_acumulados")
+    def construir(cls, clientes):
+        acumulados = cls()
+        recorridos = 0
+        for cliente in clientes:
+            for prestamo in cliente["prestamos"]:
+                acumulados.agregar_prestamo(prestamo)
+                pagos = prestamo["pagos"]
+                recorridos += len(pagos)
+                # Centavos que faltan pagar, para anotar el pago que lo saldó
+                try:
+                    falta = a_centavos(prestamo["monto_total"])
+                except (TypeError, ValueError, OverflowError):
+                    falta = 0
+                # Con el modelo compacto se leen los arreglos directamente
+                if hasattr(pagos, "exactos") and pagos.exactos():
+                    traspasos = {i for i, aparte in (pagos.originales or {}).items() if "renganche" in aparte}
+                    for i, (centavos, dia, cobrador) in enumerate(
+                            zip(pagos.centavos, pagos.dias, pagos.cobradores or repeat(None))):
+                        if i not in traspasos:
+                            acumulados._sumar(dia, centavos, cobrador)
+                        if falta > 0 >= falta - centavos:
+                            acumulados.saldados.sumar(dia, 0)
+                        falta -= centavos
+                else:
+                    for pago in pagos:
+                        acumulados.agregar_pago(pago)
+                        try:
+                            saldo = falta - a_centavos(pago["monto"])
+                        except (TypeError, ValueError, OverflowError):
+                            continue
+                        if falta > 0 >= saldo:
+                            acumulados.agregar_saldado(pago)
+                        falta = saldo
+        contar("construir_acumulados", "registros_recorridos", recorridos)
+        return acumulados
+
+    # Consultas: desde y hasta como "YYYY-MM-DD" (o día ordinal), inclusive
+    def total(self, desde, hasta=None):
+        centavos, pagos = self.dias.total(_ordinal(desde), _ordinal(hasta or desde))
+        return {"cobrado": de_centavos(centavos), "pagos": pagos}
+
+    def por_dia(self, desde, hasta=None, cobrador=None):
+        serie = self.dias if cobrador is None else self.cobradores.get(cobrador, Serie())
+        return [{"fecha": _fecha(dia), "cobrado": de_centavos(centavos), "pagos": pagos}
+                for dia, (centavos, pagos) in serie.entre(_ordinal(desde), _ordinal(hasta or desde))]
+
+    def por_cobrador(self, desde, hasta=None):
+        desde, hasta = _ordinal(desde), _ordinal(hasta or desde)
+        filas = []
+        for cobrador, serie in self.cobradores.items():
+            centavos, pagos = serie.total(desde, hasta)
+            if pagos:
+                filas.append({"cobrador": cobrador, "cobrado": de_centavos(centavos), "pagos": pagos})
+        filas.sort(key=lambda fila: (-fila["cobrado"], fila["cobrador"]))
+        return filas
+
+    def por_semana(self, desde, hasta=None):
+        """Semanas (de lunes a domingo) que tocan el período, completas, con
+        lo cobrado contra lo esperado"""
+        primera, ultima = lunes(_ordinal(desde)), lunes(_ordinal(hasta or desde))
+        filas = []
+        for semana in range(primera, ultima + 1, 7):
+            centavos, pagos = self.semanas.cubetas.get(semana, (0, 0))
+            esperado = self.esperado.get(semana, 0)
+            filas.append({
+                "semana": _fecha(semana),
+                "cobrado": de_centavos(centavos),
+                "pagos": pagos,
+                "esperado": de_centavos(esperado),
+                "cumplimiento": round(centavos / esperado, 4) if esperado else None
+            })
+        return filas
+
+    def saldo_al(self, fecha):
+        """Saldo de la cartera al cierre de un día: lo prestado en préstamos
+        ya iniciados menos lo cobrado hasta ese día"""
+        dia = _ordinal(fecha)
+        prestado, prestamos = self.prestamos.acumulado(dia)
+        cobrado, pagos = self.dias.acumulado(dia)
+        return {
+            "fecha": _fecha(dia),
+            "prestado": de_centavos(prestado),
+            "cobrado": de_centavos(cobrado),
+            "saldo": de_centavos(prestado - cobrado),
+            "prestamos": prestamos,
+            "prestamos_con_deuda": prestamos - self.saldados.acumulado(dia)[1],
+            "pagos": pagos
+        }
+
+    def a_json(self):
+        return {
+            "version": VERSION,
+            "dias": self.dias.a_json(),
+            "semanas": self.semanas.a_json(),
+            "cobradores": {cobrador: serie.a_json() for cobrador, serie in self.cobradores.items()},
+            "esperado": {_fecha(semana): monto for semana, monto in self.esperado.items()},
+            "prestamos": self.prestamos.a_json(),
+            "saldados": self.saldados.a_json()
+        }
+
+    @classmethod
+    def de_json(cls, valores):
+        acumulados = cls()
+        acumulados.dias = Serie.de_json(valores["dias"])
+        acumulados.semanas = Serie.de_json(valores["semanas"])
+        acumulados.cobradores = {cobrador: Serie.de_json(serie) for cobrador, serie in valores["cobradores"].items()}
+        acumulados.esperado = {ordinal_fecha(semana): monto for semana, monto in valores["esperado"].items()}
+        acumulados.prestamos = Serie.de_json(valores["prestamos"])
+        acumulados.saldados = Serie.de_json(valores["saldados"])
+        return acumulados
+
+
+# Informe de cobranza de un período para la consola
+def informe_cobranza(acumulados, desde, hasta=None):
+    hasta = hasta or desde
+    total = acumulados.total(desde, hasta)
+    lineas = [f"📅 Cobranza del {desde} al {hasta}: ${total['cobrado']:,.2f} en {total['pagos']} pagos",
+              "", "Semana       Cobrado        Esperado       Cumplimiento"]
+    for fila in acumulados.por_semana(desde, hasta):
+        cumplimiento = f"{fila['cumplimiento']:.0%}" if fila["cumplimiento"] is not None else "-"
+        lineas.append(f"{fila['semana']}  ${fila['cobrado']:>12,.2f}  ${fila['esperado']:>12,.2f}  {cumplimiento:>6}")
+    lineas += ["", "Cobrador                  Cobrado        Pagos"]
+    for fila in acumulados.por_cobrador(desde, hasta):
+        lineas.append(f"{fila['cobrador'] or '(sin cobrador)':<20}  ${fila['cobrado']:>12,.2f}  {fila['pagos']:>6}")
+    return "\n".join(lineas)
+
+
+if __name__ == "__main__":
+    import bitacora
+
+    datos = bitacora.cargar_datos()
+    if sys.argv[1:2] == ["saldo"]:
+        saldo = datos.acumulados.saldo_al(sys.argv[2] if len(sys.argv) > 2 else date.today().isoformat())
+        print(f"📅 Al {saldo['fecha']}: prestado ${saldo['prestado']:,.2f} en {saldo['prestamos']} préstamos, "
+              f"cobrado ${saldo['cobrado']:,.2f}")
+        print(f"💰 Saldo de la cartera: ${saldo['saldo']:,.2f} | Préstamos con deuda: {saldo['prestamos_con_deuda']}")
+    elif sys.argv[1:2] == ["reconstruir"]:
+        # Se recalcula desde los pagos y se guarda con una compactación, así
+        # el archivo queda a la par de la instantánea
+        datos.reconstruir_acumulados()
+        bitacora.compactar(datos)
+        print(f"✅ Totales reconstruidos: {len(datos.acumulados.dias.cubetas)} días, "
+              f"{len(datos.acumulados.cobradores)} cobradores.")
+    else:
+        hoy = date.today()
+        desde = sys.argv[1] if len(sys.argv) > 1 else date.fromordinal(lunes(hoy.toordinal()) - 28).isoformat()
+        hasta = sys.argv[2] if len(sys.argv) > 2 else hoy.isoformat()
+        print(informe_cobranza(datos.acumulados, desde, hasta))
@@ -0,0 +1,482 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+import bitacora
+from cache_datos import CacheDatos
+from dinero import a_centavos, de_centavos, sumar_centavos
+from eventos import aplicar_evento, cargar_mora, nuevo_cliente, nuevo_prestamo, nuevo_pago, nuevo_renganche
+from busqueda import LIMITE_SUGERENCIAS, IndiceBusqueda
+from indices import Datos, buscar_cliente as buscar_en_datos, normalizar_nombre, sugerir_clientes as sugerir_en_datos
+from saldos import CAMPOS_SALDO, recalcular_saldo
+
+# Repositorios de datos. Todos ofrecen la misma interfaz:
+#   cargar()                  -> datos completos {"clientes": [...]}
+#   guardar(datos)            -> reemplaza todo el contenido
+#   buscar_cliente(nombre)    -> (índice, cliente) o (None, None)
+#   sugerir_clientes(texto, limite) -> [(índice, cliente, coincidencia)]
+#   leer_cliente(índice)      -> cliente o None
+#   registrar(evento, datos)  -> persiste un evento y lo aplica a datos
+#   registrar_lote(eventos, datos) -> lo mismo para varios, en una sola escritura
+#   registrar_grupos(grupos, datos, validar, responder) -> los eventos de
+#                             varias peticiones en una escritura, cada una
+#                             validada y aplicada entera o rechazada (ver
+#                             bitacora.registrar_grupos)
+# El backend se elige con la variable de entorno PRESTAMOS_BACKEND
+# ("json" por defecto o "sqlite").
+
+RUTA_SQLITE = "database.sqlite3"
+
+
+class RepositorioJSON:
+    """database.json + bitácora de eventos, con los datos en caché"""
+
+    def __init__(self, ruta_datos=bitacora.RUTA_DATOS, ruta_bitacora=bitacora.RUTA_BITACORA, usar_hash=False):
+        self.ruta_datos = ruta_datos
+        self.ruta_bitacora = ruta_bitacora
+        self.cache = CacheDatos(
+            (ruta_datos, ruta_bitacora),
+            lambda: bitacora.cargar_datos(ruta_datos, ruta_bitacora),
+            usar_hash,
+            lambda datos: bitacora.sincronizar(datos, ruta_datos, ruta_bitacora)
+        )
+
+    def cargar(self):
+        return self.cache.obtener()
+
+    def guardar(self, datos):
+        bitacora.compactar(datos, self.ruta_datos, self.ruta_bitacora)
+        self.cache.escrito(datos)
+
+    def buscar_cliente(self, nombre):
+        return buscar_en_datos(self.cargar(), nombre)
+
+    def sugerir_clientes(self, texto, limite=LIMITE_SUGERENCIAS):
+        return sugerir_en_datos(self.cargar(), texto, limite)
+
+    def leer_cliente(self, indice):
+        clientes = self.cargar()["clientes"]
+        return clientes[indice] if 0 <= indice < len(clientes) else None
+
+    def registrar(self, evento, datos=None):
+        # Sin datos propios se usa la copia en caché; bitacora.registrar_evento
+        # incorpora antes lo que hayan anexado otros procesos
+        if datos is None:
+            datos = self.cargar()
+        resultado = bitacora.registrar_evento(datos, evento, self.ruta_datos, self.ruta_bitacora)
+        self.cache.escrito(datos)
+        return resultado
+
+    def registrar_lote(self, eventos, datos=None):
+        if datos is None:
+            datos = self.cargar()
+        resultados = bitacora.registrar_eventos(datos, eventos, self.ruta_datos, self.ruta_bitacora)
+        self.cache.escrito(datos)
+        return resultados
+
+    def registrar_grupos(self, grupos, datos=None, validar=None, responder=None):
+        if datos is None:
+            datos = self.cargar()
+        try:
+            return bitacora.registrar_grupos(datos, grupos, self.ruta_datos, self.ruta_bitacora, validar, responder)
+        finally:
+            # También si falló: datos quedó recargado desde disco
+            self.cache.escrito(datos)
+
+
+class RepositorioSQLite:
+    """Base SQLite indexada: las operaciones de un cliente son consultas puntuales"""
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS clientes (
+            id INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            nombre_normalizado TEXT NOT NULL,
+            telefono TEXT,
+            extra TEXT
+        );
+        CREATE TABLE IF NOT EXISTS prestamos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cliente_id INTEGER NOT NULL REFERENCES clientes(id),
+            indice INTEGER NOT NULL,
+            monto_total REAL NOT NULL,
+            plazo_semanas INTEGER NOT NULL,
+            fecha_inicio TEXT NOT NULL,
+            extra TEXT,
+            UNIQUE (cliente_id, indice)
+        );
+        CREATE TABLE IF NOT EXISTS pagos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prestamo_id INTEGER NOT NULL REFERENCES prestamos(id),
+            monto REAL NOT NULL,
+            fecha TEXT NOT NULL,
+            extra TEXT
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            clave TEXT PRIMARY KEY,
+            valor TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_clientes_nombre ON clientes(nombre_normalizado);
+        CREATE INDEX IF NOT EXISTS idx_pagos_fecha ON pagos(fecha);
+        CREATE INDEX IF NOT EXISTS idx_pagos_prestamo ON pagos(prestamo_id);
+    """
+
+    # Campos con columna propia; el resto de claves va como JSON en "extra"
+    CAMPOS_CLIENTE = ("nombre", "telefono", "prestamos")
+    # Los totales de saldos.py y las cuotas no se guardan: se recalculan
+    # desde los pagos al leerlos
+    CAMPOS_PRESTAMO = ("monto_total", "plazo_semanas", "fecha_inicio", "pagos", "cuotas") + CAMPOS_SALDO
+    CAMPOS_PAGO = ("monto", "fecha")
+
+    def __init__(self, ruta=RUTA_SQLITE):
+        self.ruta = ruta
+        # La interfaz gráfica la usa desde hilos de trabajo (ver tareas.py)
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self.conexion.executescript(self.ESQUEMA)
+        # Índice de búsqueda aproximada y último id que contiene
+        self.busqueda = None
+        self.busqueda_hasta = -1
+
+    @staticmethod
+    def _extra(objeto, campos):
+        extra = {k: v for k, v in objeto.items() if k not in campos}
+        return json.dumps(extra) if extra else None
+
+    @staticmethod
+    def _con_extra(objeto, extra):
+        if extra:
+            objeto.update(json.loads(extra))
+        return objeto
+
+    def _pagos_por_prestamo(self, filas_pagos):
+        pagos = {}
+        for prestamo_id, monto, fecha, extra in filas_pagos:
+            pago = self._con_extra({"monto": monto, "fecha": fecha}, extra)
+            pagos.setdefault(prestamo_id, []).append(pago)
+        return pagos
+
+    def _armar_prestamo(self, fila, pagos):
+        prestamo_id, _, monto_total, plazo_semanas, fecha_inicio, extra = fila
+        prestamo = {
+            "monto_total": monto_total,
+            "plazo_semanas": plazo_semanas,
+            "fecha_inicio": fecha_inicio,
+            "pagos": pagos.get(prestamo_id, [])
+        }
+        return recalcular_saldo(self._con_extra(prestamo, extra))
+
+    def cargar(self):
+        cur = self.conexion.cursor()
+        pagos = self._pagos_por_prestamo(cur.execute(
+            "SELECT prestamo_id, monto, fecha, extra FROM pagos ORDER BY id"))
+        prestamos = {}
+        for fila in cur.execute(
+                "SELECT id, cliente_id, monto_total, plazo_semanas, fecha_inicio, extra "
+                "FROM prestamos ORDER BY cliente_id, indice"):
+            prestamos.setdefault(fila[1], []).append(self._armar_prestamo(fila, pagos))
+        clientes = []
+        for cliente_id, nombre, telefono, extra in cur.execute(
+                "SELECT id, nombre, telefono, extra FROM clientes ORDER BY id"):
+            cliente = {"nombre": nombre, "telefono": telefono, "prestamos": prestamos.get(cliente_id, [])}
+            clientes.append(self._con_extra(cliente, extra))
+        datos = Datos(clientes=clientes)
+        for clave, valor in cur.execute("SELECT clave, valor FROM meta"):
+            datos[clave] = json.loads(valor)
+        return datos
+
+    def guardar(self, datos):
+        with self.conexion:
+            self.conexion.execute("DELETE FROM pagos")
+            self.conexion.execute("DELETE FROM prestamos")
+            self.conexion.execute("DELETE FROM clientes")
+            self.conexion.execute("DELETE FROM meta")
+            for clave, valor in datos.items():
+                if clave != "clientes":
+                    self._guardar_meta(clave, valor)
+            for idx, cliente in enumerate(datos["clientes"]):
+                self._insertar_cliente(idx, cliente)
+                for indice, prestamo in enumerate(cliente["prestamos"]):
+                    prestamo_id = self._insertar_prestamo(idx, indice, prestamo)
+                    for pago in prestamo["pagos"]:
+                        self._insertar_pago(prestamo_id, pago)
+        # Todo el contenido cambió: la búsqueda se vuelve a armar
+        self.busqueda = None
+        self.busqueda_hasta = -1
+
+    def _insertar_cliente(self, idx, cliente):
+        self.conexion.execute(
+            "INSERT INTO clientes (id, nombre, nombre_normalizado, telefono, extra) VALUES (?, ?, ?, ?, ?)",
+            (idx, cliente["nombre"], normalizar_nombre(cliente["nombre"]),
+             cliente.get("telefono"), self._extra(cliente, self.CAMPOS_CLIENTE)))
+
+    def _insertar_prestamo(self, cliente_id, indice, prestamo):
+        cur = self.conexion.execute(
+            "INSERT INTO prestamos (cliente_id, indice, monto_total, plazo_semanas, fecha_inicio, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (cliente_id, indice, prestamo["monto_total"], prestamo["plazo_semanas"],
+             prestamo["fecha_inicio"], self._extra(prestamo, self.CAMPOS_PRESTAMO)))
+        return cur.lastrowid
+
+    def _insertar_pago(self, prestamo_id, pago):
+        self.conexion.execute(
+            "INSERT INTO pagos (prestamo_id, monto, fecha, extra) VALUES (?, ?, ?, ?)",
+            (prestamo_id, pago["monto"], pago["fecha"], self._extra(pago, self.CAMPOS_PAGO)))
+
+    def _guardar_meta(self, clave, valor):
+        self.conexion.execute(
+            "INSERT OR REPLACE INTO meta (clave, valor) VALUES (?, ?)", (clave, json.dumps(valor)))
+
+    # Modificar las claves "extra" de un préstamo con funcion(prestamo)
+    def _modificar_extra_prestamo(self, cliente_id, indice, funcion):
+        fila = self.conexion.execute(
+            "SELECT id, extra FROM prestamos WHERE cliente_id = ? AND indice = ?",
+            (cliente_id, indice)).fetchone()
+        if fila is None:
+            raise IndexError("Préstamo no encontrado")
+        prestamo = self._con_extra({}, fila[1])
+        funcion(prestamo)
+        self.conexion.execute(
+            "UPDATE prestamos SET extra = ? WHERE id = ?",
+            (self._extra(prestamo, self.CAMPOS_PRESTAMO), fila[0]))
+
+    def _leer_cliente(self, cliente_id):
+        fila = self.conexion.execute(
+            "SELECT nombre, telefono, extra FROM clientes WHERE id = ?", (cliente_id,)).fetchone()
+        if fila is None:
+            return None
+        filas_prestamos = self.conexion.execute(
+            "SELECT id, cliente_id, monto_total, plazo_semanas, fecha_inicio, extra "
+            "FROM prestamos WHERE cliente_id = ? ORDER BY indice", (cliente_id,)).fetchall()
+        pagos = self._pagos_por_prestamo(self.conexion.execute(
+            "SELECT pagos.prestamo_id, pagos.monto, pagos.fecha, pagos.extra FROM pagos "
+            "JOIN prestamos ON prestamos.id = pagos.prestamo_id "
+            "WHERE prestamos.cliente_id = ? ORDER BY pagos.id", (cliente_id,)))
+        cliente = {
+            "nombre": fila[0],
+            "telefono": fila[1],
+            "prestamos": [self._armar_prestamo(f, pagos) for f in filas_prestamos]
+        }
+        return self._con_extra(cliente, fila[2])
+
+    def buscar_cliente(self, nombre):
+        filas = self.conexion.execute(
+            "SELECT id, nombre FROM clientes WHERE nombre_normalizado = ? ORDER BY id",
+            (normalizar_nombre(nombre),)).fetchall()
+        if not filas:
+            return None, None
+        # Con nombres repetidos se prefiere el escrito igual, como IndiceClientes
+        cliente_id = next((i for i, n in filas if n.lower() == nombre.lower()), filas[0][0])
+        return cliente_id, self._leer_cliente(cliente_id)
+
+    def sugerir_clientes(self, texto, limite=LIMITE_SUGERENCIAS):
+        # Los ids son las posiciones y solo crecen: se agregan los clientes
+        # nuevos (de este u otro proceso) desde el último id indexado
+        if self.busqueda is None:
+            self.busqueda = IndiceBusqueda()
+        for cliente_id, nombre, telefono in self.conexion.execute(
+                "SELECT id, nombre, telefono FROM clientes WHERE id > ? ORDER BY id", (self.busqueda_hasta,)):
+            self.busqueda.agregar(cliente_id, {"nombre": nombre, "telefono": telefono})
+            self.busqueda_hasta = cliente_id
+        return [(cliente_id, self._leer_cliente(cliente_id), coincidencia)
+                for cliente_id, _, coincidencia in self.busqueda.buscar(texto, limite)]
+
+    def leer_cliente(self, indice):
+        return self._leer_cliente(indice)
+
+    def _registrar(self, evento):
+        """Escribe el evento dentro de la transacción en curso. Devuelve el
+        evento aplicado y lo que creó (lo mismo que devuelve aplicar_evento)"""
+        tipo = evento["tipo"]
+        if tipo == "agregar_cliente":
+            siguiente = self.conexion.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM clientes").fetchone()[0]
+            creado = nuevo_cliente(evento)
+            self._insertar_cliente(siguiente, creado)
+        elif tipo == "registrar_prestamo":
+            indice = self.conexion.execute(
+                "SELECT COUNT(*) FROM prestamos WHERE cliente_id = ?", (evento["cliente"],)).fetchone()[0]
+            creado = nuevo_prestamo(evento)
+            self._insertar_prestamo(evento["cliente"], indice, creado)
+        elif tipo == "registrar_pago":
+            fila = self.conexion.execute(
+                "SELECT id FROM prestamos WHERE cliente_id = ? AND indice = ?",
+                (evento["cliente"], evento["prestamo"])).fetchone()
+            if fila is None:
+                raise IndexError("Préstamo no encontrado")
+            creado = nuevo_pago(evento)
+            self._insertar_pago(fila[0], creado)
+        elif tipo == "renganchar":
+            fila = self.conexion.execute(
+                "SELECT id, monto_total FROM prestamos WHERE cliente_id = ? AND indice = ?",
+                (evento["cliente"], evento["prestamo"])).fetchone()
+            if fila is None:
+                raise IndexError("Préstamo no encontrado")
+            # El saldo se suma en centavos, como saldos.restante en memoria
+            pagado = sumar_centavos(monto for monto, in self.conexion.execute(
+                "SELECT monto FROM pagos WHERE prestamo_id = ?", (fila[0],)))
+            saldo = de_centavos(max(0, a_centavos(fila[1]) - pagado))
+            indice = self.conexion.execute(
+                "SELECT COUNT(*) FROM prestamos WHERE cliente_id = ?", (evento["cliente"],)).fetchone()[0]
+            hijo, traspaso = nuevo_renganche(evento, saldo, indice)
+            self._insertar_prestamo(evento["cliente"], indice, hijo)
+            if traspaso is not None:
+                self._insertar_pago(fila[0], traspaso)
+            self._modificar_extra_prestamo(
+                evento["cliente"], evento["prestamo"], lambda p: p.setdefault("renganches", []).append(indice))
+            creado = hijo
+        elif tipo == "acumular_mora":
+            fila = self.conexion.execute("SELECT valor FROM meta WHERE clave = 'mora_hasta'").fetchone()
+            # Una fecha igual o anterior a la ya acumulada no carga nada ni la hace retroceder
+            if fila and json.loads(fila[0]) >= evento["fecha"]:
+                evento = dict(evento, cargos=[])
+            else:
+                for cliente_id, indice, monto in evento["cargos"]:
+                    self._modificar_extra_prestamo(
+                        cliente_id, indice, lambda p, monto=monto: cargar_mora(p, evento["fecha"], monto))
+                self._guardar_meta("mora_hasta", evento["fecha"])
+            creado = evento["cargos"]
+        else:
+            raise ValueError(f"Tipo de evento desconocido: {tipo}")
+        return evento, creado
+
+    # "secuencia" en meta cuenta los eventos escritos, como en la bitácora.
+    # Los eventos nuevos toman su posición (len(...) al aplicarlos en datos,
+    # MAX(id) y COUNT(*) acá), así que antes de escribir, con el bloqueo de
+    # escritura tomado, datos tiene que estar al día con la base: si otro
+    # proceso escribió desde que se cargó, se recarga (como bitacora.sincronizar).
+    def _empezar(self, datos):
+        self.conexion.execute("BEGIN IMMEDIATE")
+        fila = self.conexion.execute("SELECT valor FROM meta WHERE clave = 'secuencia'").fetchone()
+        secuencia = json.loads(fila[0]) if fila else 0
+        if datos is not None and datos.get("secuencia", 0) != secuencia:
+            datos.reemplazar(self.cargar())
+        return secuencia
+
+    def _terminar(self, datos, secuencia):
+        self._guardar_meta("secuencia", secuencia)
+        if datos is not None:
+            datos["secuencia"] = secuencia
+
+    # Sin datos devuelve lo que se escribió, como lo habría devuelto aplicarlo
+    def registrar(self, evento, datos=None):
+        with self.conexion:
+            secuencia = self._empezar(datos)
+            evento, creado = self._registrar(evento)
+            self._terminar(datos, secuencia + 1)
+        if datos is None:
+            return creado
+        return aplicar_evento(datos, evento)
+
+    def registrar_lote(self, eventos, datos=None):
+        # Una sola transacción para todo el lote
+        with self.conexion:
+            secuencia = self._empezar(datos)
+            registrados = [self._registrar(evento) for evento in eventos]
+            self._terminar(datos, secuencia + len(registrados))
+        if datos is None:
+            return [creado for _, creado in registrados]
+        return [aplicar_evento(datos, evento) for evento, _ in registrados]
+
+    def registrar_grupos(self, grupos, datos=None, validar=None, responder=None):
+        # Una sola transacción; cada grupo se valida contra datos en memoria
+        # antes de escribirlo, como en bitacora.registrar_grupos
+        if datos is None:
+            datos = self.cargar()
+        resultados = []
+        try:
+            with self.conexion:
+                secuencia = self._empezar(datos)
+                for eventos in grupos:
+                    if validar:
+                        try:
+                            for evento in eventos:
+                                validar(datos, evento)
+                        except (ValueError, LookupError) as error:
+                            resultados.append(error)
+                            continue
+                    aplicados = []
+                    for evento in eventos:
+                        evento, _ = self._registrar(evento)
+                        secuencia += 1
+                        aplicado = aplicar_evento(datos, evento)
+                        aplicados.append(responder(datos, evento, aplicado) if responder else aplicado)
+                    resultados.append(aplicados)
+                self._terminar(datos, secuencia)
+        except BaseException:
+            # La transacción se deshizo: datos vuelve a lo que quedó en la base
+            datos.reemplazar(self.cargar())
+            raise
+        return resultados
+
+
+# Migración única de database.json (+ bitácora) a SQLite
+def migrar_json_a_sqlite(ruta_datos=bitacora.RUTA_DATOS, ruta_sqlite=RUTA_SQLITE):
+    destino = RepositorioSQLite(ruta_sqlite)
+    existentes = destino.conexion.execute("SELECT COUNT(*) FROM clientes").fetchone()[0]
+    if existentes:
+        raise RuntimeError(f"{ruta_sqlite} ya contiene {existentes} clientes")
+    datos = RepositorioJSON(ruta_datos).cargar()
+    destino.guardar(datos)
+    return len(datos["clientes"])
+
+
+# Repositorio compartido por las interfaces. El candado serializa el acceso
+# cuando las operaciones corren en hilos de trabajo.
+_repositorio = None
+_candado = threading.RLock()
+
+def obtener_repositorio():
+    global _repositorio
+    with _candado:
+        if _repositorio is None:
+            if os.environ.get("PRESTAMOS_BACKEND", "json") == "sqlite":
+                _repositorio = RepositorioSQLite()
+            else:
+                _repositorio = RepositorioJSON(usar_hash=os.environ.get("PRESTAMOS_CACHE_HASH") == "1")
+        return _repositorio
+
+def cargar_datos():
+    with _candado:
+        return obtener_repositorio().cargar()
+
+def guardar_datos(datos):
+    with _candado:
+        obtener_repositorio().guardar(datos)
+
+def buscar_cliente(nombre):
+    with _candado:
+        return obtener_repositorio().buscar_cliente(nombre)
+
+def sugerir_clientes(texto, limite=LIMITE_SUGERENCIAS):
+    with _candado:
+        return obtener_repositorio().sugerir_clientes(texto, limite)
+
+def leer_cliente(indice):
+    with _candado:
+        return obtener_repositorio().leer_cliente(indice)
+
+def registrar_evento(evento, datos=None):
+    with _candado:
+        return obtener_repositorio().registrar(evento, datos)
+
+def registrar_eventos(eventos, datos=None):
+    with _candado:
+        return obtener_repositorio().registrar_lote(eventos, datos)
+
+def registrar_grupos(grupos, datos=None, validar=None, responder=None):
+    with _candado:
+        return obtener_repositorio().registrar_grupos(grupos, datos, validar, responder)
+
+# Aciertos/fallos y tiempo de parseo de la caché (None si el backend no usa)
+def estadisticas_cache():
+    cache = getattr(obtener_repositorio(), "cache", None)
+    return cache.estadisticas() if cache else None
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["migrar"]:
+        total = migrar_json_a_sqlite()
+        print(f"✅ {total} clientes migrados a {RUTA_SQLITE}.")
+    else:
+        print("Uso: python almacenamiento.py migrar")
@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime
+
+import bitacora
+from cartera import atrasados, np, resta_prestamo
+from eventos import evento_pago
+from generador import escribir_cartera, generar_cartera
+from indices import indice_clientes, resumen_pagos
+from saldos import totales_cartera
+
+# Mediciones de rendimiento sin interfaz: para cada tamaño se genera una
+# cartera sintética en un directorio temporal y se mide cada operación varias
+# veces. Cada medición es una línea JSON en el archivo de salida, para
+# comparar corridas y detectar regresiones.
+
+TAMANOS = (1000, 10000, 50000)
+REPETICIONES = 3
+SALIDA = "bench_output.txt"
+CONSULTAS = 200  # búsquedas y resta_pago por medición
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+# Operaciones a medir sobre una cartera ya escrita en ruta_datos
+def operaciones(ruta_datos, ruta_bitacora, azar):
+    def cargar():
+        return bitacora.cargar_datos(ruta_datos, ruta_bitacora)
+
+    datos = cargar()
+    nombres = [c["nombre"] for c in datos["clientes"]]
+    referencias = [(c, p) for c, cliente in enumerate(datos["clientes"]) for p in range(len(cliente["prestamos"]))]
+    hoy = date.today().isoformat()
+
+    # Con un diccionario común los índices se arman en cada medición, como
+    # la primera búsqueda de registrar_pago o el primer resumen del día
+    sin_indices = {"clientes": datos["clientes"]}
+
+    def buscar():
+        indice = indice_clientes(sin_indices)
+        for nombre in azar.sample(nombres, min(CONSULTAS, len(nombres))):
+            indice.buscar(nombre.upper())
+
+    def resta():
+        for c, p in azar.sample(referencias, min(CONSULTAS, len(referencias))):
+            resta_prestamo(datos["clientes"][c]["prestamos"][p], hoy)
+
+    def registrar_pago():
+        c, p = azar.choice(referencias)
+        bitacora.registrar_evento(datos, evento_pago(c, p, 100.0, hoy), ruta_datos, ruta_bitacora)
+
+    return {
+        "cargar_datos": cargar,
+        "guardar_datos": lambda: bitacora.compactar(datos, ruta_datos, ruta_bitacora),
+        "registrar_pago": registrar_pago,
+        "buscar_cliente": buscar,
+        "resumen_diario": lambda: resumen_pagos(sin_indices, hoy),
+        "resta_pago": resta,
+        "atrasados": lambda: atrasados(datos, hoy),
+        "totales_por_partes": lambda: totales_cartera(bitacora.iterar_clientes(ruta_datos, ruta_bitacora))
+    }
+
+def ejecutar(tamanos=TAMANOS, repeticiones=REPETICIONES, salida=SALIDA, solo=None, semilla=1):
+    comun = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__ if np is not None else None,
+        "formato": bitacora.FORMATO
+    }
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio, open(salida, "a", encoding="utf-8") as file:
+        for tamano in tamanos:
+            ruta_datos = os.path.join(directorio, f"cartera_{tamano}.json")
+            ruta_bitacora = os.path.join(directorio, f"cartera_{tamano}.journal")
+            datos = generar_cartera(tamano, pagos_por_dia=max(10, tamano // 10), semilla=semilla)
+            escribir_cartera(datos, ruta_datos)
+            medidas = {
+                "clientes": tamano,
+                "prestamos": sum(len(c["prestamos"]) for c in datos["clientes"]),
+                "pagos": sum(len(p["pagos"]) for c in datos["clientes"] for p in c["prestamos"]),
+                "bytes": os.path.getsize(ruta_datos)
+            }
+            del datos
+
+            for nombre, funcion in operaciones(ruta_datos, ruta_bitacora, random.Random(semilla)).items():
+                if solo and nombre not in solo:
+                    continue
+                tiempos = medir(funcion, repeticiones)
+                resultado = dict(comun, operacion=nombre, **medidas, repeticiones=repeticiones,
+                                 segundos_min=min(tiempos), segundos_mediana=statistics.median(tiempos))
+                file.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+                file.flush()
+                resultados.append(resultado)
+                print(f"{nombre:<20} {tamano:>8} clientes  {resultado['segundos_min'] * 1000:10.2f} ms")
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Medir el rendimiento de las operaciones de préstamos")
+    parser.add_argument("--tamanos", default=",".join(map(str, TAMANOS)), help="clientes por cartera, separados por coma")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--salida", default=SALIDA)
+    parser.add_argument("--solo", help="operaciones a medir, separadas por coma")
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    ejecutar(
+        [int(t) for t in args.tamanos.split(",")],
+        args.repeticiones,
+        args.salida,
+        args.solo.split(",") if args.solo else None,
+        args.semilla
+    )
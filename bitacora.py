@@ -0,0 +1,341 @@
+import json
+import os
+
+from bloqueo import bloqueo, escribir_atomico
+from eventos import aplicar_evento
+from acumulados import VERSION as VERSION_ACUMULADOS, Acumulados
+from flujo_json import LectorJSON
+from indices import Datos
+from metricas import contar, medido
+from modelo import Cliente, a_json
+
+# Persistencia: database.json es una instantánea y database.journal una
+# bitácora (una línea JSON por evento). Registrar una operación solo anexa una
+# línea; cada LIMITE_BITACORA eventos la bitácora se compacta en la instantánea.
+#
+# Varios procesos (la consola y la interfaz gráfica de cada estación) pueden
+# usar los mismos archivos. "secuencia" es la versión de los datos: quien
+# escribe toma el bloqueo, aplica primero los eventos que otros anexaron desde
+# su última lectura y recién entonces numera y anexa el suyo. Como los eventos
+# solo agregan (clientes, préstamos, pagos) y se refieren a posiciones que no
+# cambian, los de distintas estaciones se combinan sin pisarse. La lectura no
+# toma el bloqueo: la instantánea se reemplaza de forma atómica y de la
+# bitácora solo se leen líneas completas.
+#
+# La instantánea se escribe con las claves sueltas ("secuencia", "mora_hasta")
+# antes que "clientes", así iterar_clientes puede recorrerla por partes. Con
+# PRESTAMOS_FORMATO=compacto se escribe sin sangría ni espacios (más chica y
+# rápida de leer y escribir); la lectura acepta los dos formatos.
+#
+# Cada compactación guarda además los totales de cobranza (acumulados.py) con
+# la misma "secuencia", para no recorrer todos los pagos al cargar.
+
+RUTA_DATOS = "database.json"
+RUTA_BITACORA = "database.journal"
+LIMITE_BITACORA = 500
+FORMATO = os.environ.get("PRESTAMOS_FORMATO", "indentado")
+
+# Eventos anexados desde la última compactación
+_pendientes = 0
+
+
+def ruta_bloqueo(ruta_datos):
+    return ruta_datos + ".lock"
+
+def ruta_acumulados(ruta_datos):
+    return os.path.splitext(ruta_datos)[0] + ".acumulados.json"
+
+# Totales de cobranza guardados, o None si no son de esta secuencia
+def leer_acumulados(ruta_datos, secuencia):
+    try:
+        with open(ruta_acumulados(ruta_datos), "r", encoding="utf-8") as file:
+            valores = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if valores.get("secuencia") != secuencia or valores.get("version") != VERSION_ACUMULADOS:
+        return None
+    return Acumulados.de_json(valores)
+
+def escribir_acumulados(datos, ruta_datos):
+    valores = dict(datos.acumulados.a_json(), secuencia=datos.get("secuencia", 0))
+    escribir_atomico(ruta_acumulados(ruta_datos), lambda file: json.dump(valores, file, separators=(",", ":")))
+
+# Identidad de la instantánea: cambia cada vez que alguien compacta
+def firma_instantanea(ruta_datos):
+    try:
+        info = os.stat(ruta_datos)
+    except FileNotFoundError:
+        return None
+    return (info.st_ino, info.st_mtime_ns, info.st_size)
+
+# Eventos completos de la bitácora a partir de una posición en bytes.
+# Devuelve (eventos, posición después del último evento completo).
+def leer_desde(ruta_bitacora=RUTA_BITACORA, posicion=0):
+    eventos = []
+    try:
+        with open(ruta_bitacora, "rb") as file:
+            file.seek(posicion)
+            for linea in file:
+                # Línea sin terminar: otro proceso escribiendo o un corte a mitad
+                if not linea.endswith(b"\n"):
+                    break
+                if linea.strip():
+                    try:
+                        eventos.append(json.loads(linea))
+                    except json.JSONDecodeError:
+                        break
+                posicion += len(linea)
+    except FileNotFoundError:
+        pass
+    return eventos, posicion
+
+# Leer los eventos de la bitácora en orden
+def leer_bitacora(ruta_bitacora=RUTA_BITACORA):
+    yield from leer_desde(ruta_bitacora)[0]
+
+def _aplicar_nuevos(datos, eventos):
+    global _pendientes
+    secuencia = datos.get("secuencia", 0)
+    for evento in eventos:
+        _pendientes += 1
+        if evento["seq"] <= secuencia:
+            continue
+        aplicar_evento(datos, evento)
+        datos["secuencia"] = secuencia = evento["seq"]
+
+# Cargar datos: instantánea + eventos de la bitácora posteriores a ella
+@medido("cargar_datos")
+def cargar_datos(ruta_datos=RUTA_DATOS, ruta_bitacora=RUTA_BITACORA):
+    global _pendientes
+    # Si otro proceso compacta mientras se lee, la instantánea cambia de
+    # identidad y se vuelve a leer el par completo
+    while True:
+        firma = firma_instantanea(ruta_datos)
+        datos = Datos()
+        try:
+            with open(ruta_datos, "r") as file:
+                # Cada cliente pasa al modelo compacto apenas se lee
+                for clave, valor in LectorJSON(file).recorrer("clientes"):
+                    if clave == "clientes":
+                        datos["clientes"].append(Cliente(valor))
+                    else:
+                        datos[clave] = valor
+        except FileNotFoundError:
+            pass
+        eventos, posicion = leer_desde(ruta_bitacora)
+        if firma_instantanea(ruta_datos) == firma:
+            break
+
+    contar("cargar_datos", "bytes_leidos", (firma[2] if firma else 0) + posicion)
+    contar("cargar_datos", "registros_recorridos", len(datos["clientes"]) + len(eventos))
+    # Los eventos de la bitácora se suman a los totales al aplicarlos
+    datos._acumulados = leer_acumulados(ruta_datos, datos.get("secuencia", 0))
+    _pendientes = 0
+    _aplicar_nuevos(datos, eventos)
+    datos.firma_instantanea = firma
+    datos.posicion_bitacora = posicion
+    return datos
+
+# Traer a datos lo que otros procesos escribieron desde su última lectura:
+# se aplican solo los eventos nuevos de la bitácora, o se recarga todo (sobre
+# el mismo objeto) si mientras tanto alguien compactó.
+@medido("sincronizar")
+def sincronizar(datos, ruta_datos=RUTA_DATOS, ruta_bitacora=RUTA_BITACORA):
+    if datos.firma_instantanea != firma_instantanea(ruta_datos):
+        datos.reemplazar(cargar_datos(ruta_datos, ruta_bitacora))
+        return
+    eventos, posicion = leer_desde(ruta_bitacora, datos.posicion_bitacora)
+    contar("sincronizar", "bytes_leidos", posicion - datos.posicion_bitacora)
+    contar("sincronizar", "eventos_ajenos", len(eventos))
+    _aplicar_nuevos(datos, eventos)
+    datos.posicion_bitacora = posicion
+
+# Recorrer los clientes de a uno sin armar todos los datos en memoria, para
+# reportes que solo necesitan totales. A cada cliente de la instantánea se le
+# aplican sus eventos de la bitácora; los clientes agregados en la bitácora
+# salen al final.
+def iterar_clientes(ruta_datos=RUTA_DATOS, ruta_bitacora=RUTA_BITACORA):
+    # La bitácora se lee primero: si alguien compacta en el medio, la
+    # instantánea nueva ya incluye esos eventos y "secuencia" los descarta
+    eventos = list(leer_bitacora(ruta_bitacora))
+    try:
+        file = open(ruta_datos, "r")
+    except FileNotFoundError:
+        file = None
+
+    meta = {}
+    por_cliente = None
+    cantidad = 0
+    if file is not None:
+        with file:
+            for clave, valor in LectorJSON(file).recorrer("clientes"):
+                if clave != "clientes":
+                    meta[clave] = valor
+                    continue
+                if por_cliente is None:
+                    if eventos and "secuencia" not in meta:
+                        # Instantánea vieja con "clientes" primero: no se sabe
+                        # qué eventos ya incluye sin leerla entera
+                        yield from cargar_datos(ruta_datos, ruta_bitacora)["clientes"]
+                        return
+                    por_cliente = _eventos_por_cliente(eventos, meta)
+                for evento in por_cliente.get(cantidad, ()):
+                    aplicar_evento({"clientes": {cantidad: valor}}, evento)
+                yield valor
+                cantidad += 1
+
+    # Clientes nuevos: se aplican solo los eventos de posiciones >= cantidad
+    nuevos = {"clientes": [None] * cantidad}
+    for posicion, evento in (por_cliente or _eventos_por_cliente(eventos, meta))["todos"]:
+        if posicion is None or posicion >= cantidad:
+            aplicar_evento({"clientes": nuevos["clientes"]}, evento)
+    yield from nuevos["clientes"][cantidad:]
+
+# Eventos nuevos de la bitácora agrupados por posición del cliente. Las
+# corridas de mora se parten en un evento por cliente. En "todos" quedan
+# en orden como (posición, evento), con posición None al agregar un cliente.
+def _eventos_por_cliente(eventos, meta):
+    secuencia = meta.get("secuencia", 0)
+    mora_hasta = meta.get("mora_hasta")
+    grupos = {"todos": []}
+    for evento in eventos:
+        if evento["seq"] <= secuencia:
+            continue
+        if evento["tipo"] == "agregar_cliente":
+            grupos["todos"].append((None, evento))
+        elif evento["tipo"] == "acumular_mora":
+            # Misma regla que aplicar_evento: una fecha ya procesada no cobra
+            if mora_hasta and mora_hasta >= evento["fecha"]:
+                continue
+            mora_hasta = evento["fecha"]
+            for cargo in evento["cargos"]:
+                parte = dict(evento, cargos=[cargo])
+                grupos.setdefault(cargo[0], []).append(parte)
+                grupos["todos"].append((cargo[0], parte))
+        else:
+            grupos.setdefault(evento["cliente"], []).append(evento)
+            grupos["todos"].append((evento["cliente"], evento))
+    return grupos
+
+# Anexar eventos a la bitácora con una sola escritura y un solo fsync (no
+# reescribe database.json). Devuelve la posición al final del último.
+def anexar_eventos(eventos, ruta_bitacora=RUTA_BITACORA):
+    with open(ruta_bitacora, "a", encoding="utf-8") as file:
+        file.write("".join(json.dumps(evento, ensure_ascii=False) + "\n" for evento in eventos))
+        file.flush()
+        os.fsync(file.fileno())
+        return file.tell()
+
+def anexar_evento(evento, ruta_bitacora=RUTA_BITACORA):
+    return anexar_eventos([evento], ruta_bitacora)
+
+def _truncar(ruta_bitacora, posicion):
+    if os.path.exists(ruta_bitacora) and os.path.getsize(ruta_bitacora) > posicion:
+        os.truncate(ruta_bitacora, posicion)
+
+# Aplicar en memoria los eventos de varias peticiones, anexarlos juntos a la
+# bitácora y compactar si toca. Cada grupo (los eventos de una petición) entra
+# entero o nada: validar(datos, evento), si se da, lo revisa contra los datos
+# con los grupos anteriores ya aplicados, y si lanza ValueError o LookupError
+# el grupo se rechaza. responder(datos, evento, aplicado) arma el resultado de
+# cada evento apenas se aplica; sin él es lo que creó el evento. Devuelve, por
+# grupo, sus resultados o el error que lo rechazó.
+# Si aplicar o anexar falla a mitad de camino, la bitácora vuelve a como
+# estaba y datos se recarga desde disco: en memoria no queda nada sin guardar.
+@medido("registrar_eventos")
+def registrar_grupos(datos, grupos, ruta_datos=RUTA_DATOS, ruta_bitacora=RUTA_BITACORA, validar=None, responder=None):
+    global _pendientes
+    with bloqueo(ruta_bloqueo(ruta_datos)):
+        sincronizar(datos, ruta_datos, ruta_bitacora)
+        # Con el bloqueo tomado, lo que sigue a la última línea completa es
+        # una escritura cortada por una caída: se descarta
+        _truncar(ruta_bitacora, datos.posicion_bitacora)
+        secuencia = datos.get("secuencia", 0)
+        numerados, resultados = [], []
+        try:
+            for eventos in grupos:
+                if validar:
+                    try:
+                        for evento in eventos:
+                            validar(datos, evento)
+                    except (ValueError, LookupError) as error:
+                        resultados.append(error)
+                        continue
+                aplicados = []
+                for evento in eventos:
+                    secuencia += 1
+                    numerados.append(dict(evento, seq=secuencia))
+                    aplicado = aplicar_evento(datos, numerados[-1])
+                    aplicados.append(responder(datos, numerados[-1], aplicado) if responder else aplicado)
+                resultados.append(aplicados)
+            if not numerados:
+                return resultados
+            posicion = anexar_eventos(numerados, ruta_bitacora)
+        except BaseException:
+            _truncar(ruta_bitacora, datos.posicion_bitacora)
+            datos.reemplazar(cargar_datos(ruta_datos, ruta_bitacora))
+            raise
+        contar("registrar_eventos", "bytes_escritos", posicion - datos.posicion_bitacora)
+        contar("registrar_eventos", "eventos", len(numerados))
+        datos.posicion_bitacora = posicion
+        datos["secuencia"] = secuencia
+        _pendientes += len(numerados)
+        if _pendientes >= LIMITE_BITACORA:
+            compactar(datos, ruta_datos, ruta_bitacora)
+    return resultados
+
+# Aplicar un lote de eventos en memoria, anexarlos a la bitácora y compactar
+# si toca. Devuelve lo que creó cada evento.
+def registrar_eventos(datos, eventos, ruta_datos=RUTA_DATOS, ruta_bitacora=RUTA_BITACORA):
+    return registrar_grupos(datos, [eventos], ruta_datos, ruta_bitacora)[0]
+
+# Registrar un solo evento
+def registrar_evento(datos, evento, ruta_datos=RUTA_DATOS, ruta_bitacora=RUTA_BITACORA):
+    return registrar_eventos(datos, [evento], ruta_datos, ruta_bitacora)[0]
+
+# Volcar datos en un archivo abierto: claves sueltas primero y "clientes" al
+# final, un cliente a la vez (el mismo texto que json.dump del total, sin
+# armar una copia de todos los datos)
+def escribir_instantanea(datos, file, formato=None):
+    if (formato or FORMATO) == "compacto":
+        opciones, dos_puntos, margen = {"separators": (",", ":")}, ":", ""
+    else:
+        opciones, dos_puntos, margen = {"indent": 4}, ": ", "\n    "
+
+    def texto(valor, nivel):
+        resultado = json.dumps(valor, **opciones)
+        return resultado.replace("\n", "\n" + "    " * nivel) if margen else resultado
+
+    file.write("{")
+    for clave, valor in datos.items():
+        if clave != "clientes":
+            file.write(margen + json.dumps(clave) + dos_puntos + texto(valor, 1) + ",")
+    file.write(margen + '"clientes"' + dos_puntos + "[")
+    for i, cliente in enumerate(datos["clientes"]):
+        file.write(("," if i else "") + margen + margen[1:] + texto(a_json(cliente), 2))
+    if datos["clientes"]:
+        file.write(margen)
+    file.write("]" + margen[:1] + "}")
+
+# Escribir la instantánea completa y vaciar la bitácora. Antes de escribir se
+# incorporan los eventos de otros procesos, así nunca se pisa lo que ya
+# anexaron.
+@medido("guardar_datos")
+def compactar(datos, ruta_datos=RUTA_DATOS, ruta_bitacora=RUTA_BITACORA):
+    global _pendientes
+    with bloqueo(ruta_bloqueo(ruta_datos)):
+        sincronizar(datos, ruta_datos, ruta_bitacora)
+        escribir_atomico(ruta_datos, lambda file: escribir_instantanea(datos, file))
+        escribir_acumulados(datos, ruta_datos)
+        contar("guardar_datos", "bytes_escritos", os.path.getsize(ruta_datos))
+        contar("guardar_datos", "registros_recorridos", len(datos["clientes"]))
+        # Si el proceso se corta aquí, "secuencia" evita aplicar dos veces la bitácora
+        with open(ruta_bitacora, "w", encoding="utf-8"):
+            pass
+        datos.firma_instantanea = firma_instantanea(ruta_datos)
+        datos.posicion_bitacora = 0
+        _pendientes = 0
+
+# Guardar datos completos (compactación explícita)
+def guardar_datos(datos):
+    compactar(datos)
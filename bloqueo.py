@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Bloqueo consultivo entre procesos sobre un archivo ".lock". Solo lo toman
+# quienes escriben (anexar a la bitácora o compactar); la lectura no se
+# bloquea. Dentro de un proceso es reentrante: los hilos se serializan con
+# un RLock y solo el nivel exterior toma el bloqueo del archivo.
+
+INTENTOS = 200
+ESPERA = 0.05  # segundos entre intentos en Windows
+
+
+class BloqueoArchivo:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._hilos = threading.RLock()
+        self._nivel = 0
+        self._archivo = None
+
+    def __enter__(self):
+        self._hilos.acquire()
+        if self._nivel == 0:
+            try:
+                self._tomar()
+            except BaseException:
+                self._hilos.release()
+                raise
+        self._nivel += 1
+        return self
+
+    def __exit__(self, *_):
+        self._nivel -= 1
+        if self._nivel == 0:
+            self._soltar()
+        self._hilos.release()
+
+    def _tomar(self):
+        self._archivo = open(self.ruta, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._archivo.fileno(), fcntl.LOCK_EX)
+            return
+        for _ in range(INTENTOS):
+            try:
+                self._archivo.seek(0)
+                msvcrt.locking(self._archivo.fileno(), msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                time.sleep(ESPERA)
+        self._archivo.close()
+        self._archivo = None
+        raise TimeoutError(f"No se pudo bloquear {self.ruta}")
+
+    def _soltar(self):
+        if fcntl is not None:
+            fcntl.flock(self._archivo.fileno(), fcntl.LOCK_UN)
+        else:
+            self._archivo.seek(0)
+            msvcrt.locking(self._archivo.fileno(), msvcrt.LK_UNLCK, 1)
+        self._archivo.close()
+        self._archivo = None
+
+
+# Un bloqueo por ruta para todo el proceso
+_bloqueos = {}
+_bloqueos_candado = threading.Lock()
+
+def bloqueo(ruta):
+    ruta = os.path.abspath(ruta)
+    with _bloqueos_candado:
+        if ruta not in _bloqueos:
+            _bloqueos[ruta] = BloqueoArchivo(ruta)
+        return _bloqueos[ruta]
+
+
+# Escribir un archivo completo de forma atómica: temporal + fsync + rename
+def escribir_atomico(ruta, escribir, modo="w"):
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporal, modo) as file:
+            escribir(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
@@ -0,0 +1,139 @@
+import bisect
+import heapq
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+# Búsqueda aproximada de clientes por nombre o teléfono, para cuando el
+# cobrador escribe mal el nombre o solo sabe el número. Dos índices:
+#   - prefijos: cada nombre completo, cada palabra del nombre y el teléfono,
+#     en una lista ordenada; los que empiezan con el texto buscado son un
+#     rango que se encuentra con bisect (lo mismo que recorrer un trie, sin
+#     un diccionario por nodo)
+#   - trigramas: grupos de tres letras -> clientes que los contienen, para
+#     encontrar nombres parecidos aunque tengan letras de más o de menos
+# Los nombres se comparan sin mayúsculas, acentos ni espacios de más. Los
+# clientes nuevos se agregan al índice sin reconstruirlo (ver Datos).
+
+LIMITE_SUGERENCIAS = 10
+MAXIMO_PREFIJOS = 200    # coincidencias por prefijo que se evalúan
+MAXIMO_CANDIDATOS = 200  # parecidos por trigramas que se evalúan
+SIMILITUD_MINIMA = 0.3
+# Trigramas presentes en más de esta fracción de los clientes no ayudan a
+# elegir candidatos (" ma", "ez "): se usan solo para el puntaje final
+FRACCION_FRECUENTE = 0.02
+
+EXACTA = "exacta"
+PREFIJO = "prefijo"
+PARECIDA = "parecida"
+
+
+def normalizar(texto):
+    texto = str(texto or "")
+    if texto.isascii():
+        return " ".join(texto.lower().split())
+    texto = unicodedata.normalize("NFKD", texto)
+    return " ".join("".join(c for c in texto if not unicodedata.combining(c)).lower().split())
+
+def digitos(texto):
+    return re.sub(r"\D", "", str(texto or ""))
+
+def trigramas(texto):
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+def similitud(a, b):
+    """Coeficiente de Dice entre los trigramas de dos textos (0 a 1)"""
+    if not a or not b:
+        return 0.0
+    ta, tb = trigramas(a), trigramas(b)
+    return 2 * len(ta & tb) / (len(ta) + len(tb))
+
+# Un texto es un teléfono si casi todo son dígitos ("809-555 1234")
+def es_telefono(texto):
+    cifras = digitos(texto)
+    return len(cifras) >= 3 and len(cifras) >= 0.7 * len(texto.replace(" ", "").replace("-", ""))
+
+
+class IndiceBusqueda:
+    """Prefijos y trigramas de nombre y teléfono de cada cliente"""
+
+    def __init__(self, clientes=()):
+        self.nombres = []    # nombre normalizado por posición
+        self.telefonos = []  # solo dígitos
+        self.prefijos = []   # (término, posición), ordenada
+        self.por_trigrama = {"nombre": defaultdict(list), "telefono": defaultdict(list)}
+        for posicion, cliente in enumerate(clientes):
+            self.agregar(posicion, cliente, ordenar=False)
+        self.prefijos.sort()
+
+    def __len__(self):
+        return sum(1 for nombre in self.nombres if nombre is not None)
+
+    def agregar(self, posicion, cliente, ordenar=True):
+        while len(self.nombres) <= posicion:
+            self.nombres.append(None)
+            self.telefonos.append(None)
+        nombre, telefono = normalizar(cliente["nombre"]), digitos(cliente.get("telefono"))
+        self.nombres[posicion], self.telefonos[posicion] = nombre, telefono
+
+        terminos = {nombre, *nombre.split()}
+        if telefono:
+            terminos.add(telefono)
+        for termino in terminos:
+            if ordenar:
+                bisect.insort(self.prefijos, (termino, posicion))
+            else:
+                self.prefijos.append((termino, posicion))
+        for campo, texto in (("nombre", nombre), ("telefono", telefono)):
+            if texto:
+                indice = self.por_trigrama[campo]
+                for trigrama in trigramas(texto):
+                    indice[trigrama].append(posicion)
+
+    def _por_prefijo(self, consulta):
+        inicio = bisect.bisect_left(self.prefijos, (consulta,))
+        vistas = set()
+        for termino, posicion in self.prefijos[inicio:inicio + MAXIMO_PREFIJOS]:
+            if not termino.startswith(consulta):
+                break
+            vistas.add(posicion)
+        return vistas
+
+    def _por_trigramas(self, campo, consulta):
+        indice = self.por_trigrama[campo]
+        listas = sorted((indice[t] for t in trigramas(consulta) if t in indice), key=len)
+        if not listas:
+            return []
+        frecuente = max(10, int(FRACCION_FRECUENTE * len(self.nombres)))
+        # Siempre se usa al menos el trigrama más raro, aunque sea frecuente
+        utiles = [lista for lista in listas if len(lista) <= frecuente] or listas[:1]
+        coincidencias = Counter()
+        for lista in utiles:
+            coincidencias.update(lista)
+        return [posicion for posicion, _ in heapq.nlargest(MAXIMO_CANDIDATOS, coincidencias.items(), key=lambda i: i[1])]
+
+    def buscar(self, texto, limite=LIMITE_SUGERENCIAS):
+        """[(posición, puntaje, coincidencia)] de mejor a peor. El puntaje es
+        la similitud de trigramas (0 a 1), más 1 si coincide el prefijo y más
+        2 si el nombre o teléfono es igual."""
+        telefono = es_telefono(texto)
+        campo, consulta = ("telefono", digitos(texto)) if telefono else ("nombre", normalizar(texto))
+        textos = self.telefonos if telefono else self.nombres
+        if not consulta:
+            return []
+
+        prefijos = self._por_prefijo(consulta)
+        resultados = []
+        for posicion in prefijos | set(self._por_trigramas(campo, consulta)):
+            valor = textos[posicion]
+            if not valor:
+                continue
+            puntaje = similitud(consulta, valor)
+            if valor == consulta:
+                resultados.append((posicion, 2 + puntaje, EXACTA))
+            elif posicion in prefijos:
+                resultados.append((posicion, 1 + puntaje, PREFIJO))
+            elif puntaje >= SIMILITUD_MINIMA:
+                resultados.append((posicion, puntaje, PARECIDA))
+        return heapq.nlargest(limite, resultados, key=lambda r: (r[1], -r[0]))
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import time
+
+# Datos cargados en memoria compartidos por todo el proceso. Antes de
+# devolverlos se compara la firma de los archivos (mtime y tamaño, y si se
+# pide también un hash del contenido) con la de la última carga: solo se
+# vuelve a leer si otro proceso los modificó (con actualizar, incorporando
+# solo lo nuevo sobre el mismo objeto en vez de parsear todo). Las escrituras
+# propias se aplican sobre los datos en memoria y luego se anota la firma
+# nueva, así no provocan una recarga.
+
+
+class CacheDatos:
+    def __init__(self, rutas, cargar, usar_hash=False, actualizar=None):
+        self.rutas = rutas
+        self.cargar = cargar
+        self.actualizar = actualizar
+        self.usar_hash = usar_hash
+        self.datos = None
+        self.firma = None
+        self.aciertos = 0
+        self.fallos = 0
+        self.tiempo_carga = 0.0
+        self.ultima_carga = 0.0
+
+    def _firma(self):
+        firma = []
+        for ruta in self.rutas:
+            try:
+                info = os.stat(ruta)
+            except FileNotFoundError:
+                firma.append(None)
+                continue
+            parte = (info.st_mtime_ns, info.st_size)
+            if self.usar_hash:
+                with open(ruta, "rb") as file:
+                    parte += (hashlib.blake2b(file.read(), digest_size=16).hexdigest(),)
+            firma.append(parte)
+        return tuple(firma)
+
+    def obtener(self):
+        firma = self._firma()
+        if self.datos is not None and firma == self.firma:
+            self.aciertos += 1
+            return self.datos
+        self.fallos += 1
+        inicio = time.perf_counter()
+        if self.datos is not None and self.actualizar is not None:
+            self.actualizar(self.datos)
+        else:
+            self.datos = self.cargar()
+        self.ultima_carga = time.perf_counter() - inicio
+        self.tiempo_carga += self.ultima_carga
+        self.firma = firma
+        return self.datos
+
+    def es_vigente(self, datos):
+        """True si datos es la copia en memoria y nadie más cambió los archivos"""
+        return datos is self.datos and self._firma() == self.firma
+
+    def escrito(self, datos):
+        """Anotar una escritura propia ya aplicada sobre datos"""
+        if datos is self.datos:
+            self.firma = self._firma()
+        else:
+            self.invalidar()
+
+    def invalidar(self):
+        self.datos = None
+        self.firma = None
+
+    def estadisticas(self):
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tiempo_carga_total": self.tiempo_carga,
+            "tiempo_ultima_carga": self.ultima_carga
+        }
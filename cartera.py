@@ -0,0 +1,294 @@
+from datetime import date, datetime
+from functools import lru_cache
+
+from cuotas import Cuotas
+from dinero import a_centavos, de_centavos
+from metricas import contar, medido
+from saldos import pagado
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional: sin él se usa el cálculo por préstamo
+    np = None
+
+# Análisis de atrasos de toda la cartera. resta_prestamo calcula un préstamo
+# desde su calendario de cuotas (cuotas.py); analizar_cartera hace el mismo
+# cálculo para todos los préstamos a la vez sobre columnas de numpy
+# (monto_total, plazo_semanas, día de inicio, pagado), con los montos en
+# centavos enteros y lo esperado con la misma regla de Cuotas.esperado.
+
+ESTADO_AL_DIA = "al_dia"
+ESTADO_ATRASADO = "atrasado"
+ESTADO_LIQUIDADO = "liquidado"
+
+
+# Día ordinal de una fecha "YYYY-MM-DD" (muchos préstamos comparten fecha)
+@lru_cache(maxsize=None)
+def ordinal_fecha(fecha):
+    return datetime.strptime(fecha, "%Y-%m-%d").toordinal()
+
+def _hoy_ordinal(hoy):
+    if hoy is None:
+        hoy = date.today()
+    elif isinstance(hoy, str):
+        return ordinal_fecha(hoy)
+    elif isinstance(hoy, int):
+        return hoy  # ya es un día ordinal
+    return hoy.toordinal()
+
+
+def _fecha(dia):
+    return date.fromordinal(dia).isoformat()
+
+# (centavos, día ordinal) de un pago; lo que no se puede leer cuenta como 0
+def _centavos_dia(pago):
+    try:
+        centavos = a_centavos(pago["monto"])
+    except (TypeError, ValueError, OverflowError):
+        centavos = 0
+    try:
+        dia = ordinal_fecha(pago["fecha"])
+    except (TypeError, ValueError):
+        dia = 0
+    return centavos, dia
+
+
+# (pagado, num_pagos) de un préstamo contando solo los pagos hasta un día
+# ordinal, inclusive. Si no hay pagos posteriores son los totales guardados.
+def pagos_al(prestamo, dia):
+    ultimo = prestamo.get("ultimo_pago")
+    if ultimo is None or ordinal_fecha(ultimo) <= dia:
+        return pagado(prestamo), len(prestamo["pagos"])
+    pagos = prestamo["pagos"]
+    if hasattr(pagos, "exactos") and pagos.exactos():
+        centavos = [c for c, d in zip(pagos.centavos, pagos.dias) if d <= dia]
+    else:
+        centavos = [c for c, d in map(_centavos_dia, pagos) if d <= dia]
+    return de_centavos(sum(centavos)), len(centavos)
+
+# Calendario de un préstamo nuevo, o None si sus datos no alcanzan para
+# armarlo (se vuelve a intentar al consultarlo)
+def generar_cuotas(monto_total, plazo_semanas, fecha_inicio):
+    try:
+        return Cuotas(a_centavos(monto_total), plazo_semanas, ordinal_fecha(fecha_inicio))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+# Calendario de un préstamo con sus pagos asignados. Si no lo tiene (datos
+# viejos, SQLite) se arma una vez desde los pagos y queda en el préstamo.
+def calendario(prestamo):
+    cuotas = prestamo.get("cuotas")
+    if isinstance(cuotas, Cuotas):
+        return cuotas
+    cuotas = Cuotas.de_json(cuotas) if cuotas else None
+    if cuotas is None:
+        cuotas = Cuotas(a_centavos(prestamo["monto_total"]), prestamo["plazo_semanas"],
+                        ordinal_fecha(prestamo["fecha_inicio"]))
+        pagos = prestamo["pagos"]
+        # Con el modelo compacto se leen los arreglos directamente
+        if hasattr(pagos, "exactos") and pagos.exactos():
+            for centavos, dia in zip(pagos.centavos, pagos.dias):
+                cuotas.asignar(centavos, dia)
+        else:
+            for pago in pagos:
+                cuotas.asignar(*_centavos_dia(pago))
+    prestamo["cuotas"] = cuotas
+    return cuotas
+
+# Asignar a las cuotas un pago recién agregado
+def asignar_pago(prestamo, pago):
+    cuotas = prestamo.get("cuotas")
+    try:
+        if isinstance(cuotas, Cuotas):
+            cuotas.asignar(*_centavos_dia(pago))
+        else:
+            # El pago ya está en la lista; armar el calendario lo incluye
+            calendario(prestamo)
+    except (KeyError, TypeError, ValueError, OverflowError):
+        pass  # préstamo con datos ilegibles: resta_pago avisará al consultarlo
+
+
+# Cálculo de resta_pago para un préstamo concreto, desde sus cuotas. Con un
+# hoy pasado solo cuentan los pagos hasta ese día.
+def resta_prestamo(prestamo, hoy=None):
+    monto_total = prestamo["monto_total"]
+    cuotas = calendario(prestamo)
+    hoy = _hoy_ordinal(hoy)
+    pagado_prestamo, num_pagos = pagos_al(prestamo, hoy)
+    if num_pagos == len(prestamo["pagos"]):
+        cubierto, pagadas = cuotas.cubierto, cuotas.siguiente
+    else:
+        cubierto = min(cuotas.total, max(0, a_centavos(pagado_prestamo)))
+        pagadas = cuotas.cubiertas(cubierto)
+    vencidas = cuotas.vencidas(hoy)
+    esperado = cuotas.esperado(vencidas)
+
+    return {
+        "monto_total": monto_total,
+        "pagado": pagado_prestamo,
+        "restante": de_centavos(a_centavos(monto_total) - a_centavos(pagado_prestamo)),
+        "deberia_haber_pagado": de_centavos(esperado),
+        "faltante_segun_plazo": de_centavos(max(0, esperado - cubierto)),
+        "cuotas_vencidas": vencidas,
+        "cuotas_pagadas": pagadas,
+        "cuotas_atrasadas": max(0, vencidas - pagadas),
+        "proxima_cuota": None if pagadas >= len(cuotas) else {
+            "numero": pagadas + 1,
+            "vence": _fecha(cuotas.vence(pagadas)),
+            "falta": de_centavos(cuotas.esperado(pagadas + 1) - cubierto)
+        }
+    }
+
+# Cada cuota de un préstamo con lo abonado y su estado a la fecha
+def estado_cuotas(prestamo, hoy=None):
+    cuotas = calendario(prestamo)
+    hoy = _hoy_ordinal(hoy)
+    return [{
+        "numero": i + 1,
+        "vence": _fecha(cuotas.vence(i)),
+        "monto": de_centavos(cuotas.monto(i)),
+        "abonado": de_centavos(cuotas.abonado[i]),
+        "saldada": _fecha(cuotas.saldada[i]) if cuotas.saldada[i] else None,
+        "estado": cuotas.estado(i, hoy)
+    } for i in range(len(cuotas))]
+
+def estado_prestamo(restante, faltante_segun_plazo):
+    if restante <= 0:
+        return ESTADO_LIQUIDADO
+    if faltante_segun_plazo > 0:
+        return ESTADO_ATRASADO
+    return ESTADO_AL_DIA
+
+
+class Cartera:
+    """Préstamos de todos los clientes en columnas paralelas (montos en centavos).
+    pagado cuenta solo los pagos hasta el día al (por defecto hoy), como
+    resta_prestamo. Los préstamos con datos ilegibles (una fecha mal escrita)
+    quedan fuera de las columnas y se anotan en ilegibles, como en hoja_cobro."""
+
+    def __init__(self, datos, al=None):
+        self.al = _hoy_ordinal(al)
+        self.referencias = []  # (cliente_idx, prestamo_idx)
+        self.nombres = []
+        self.ilegibles = []    # (cliente_idx, prestamo_idx)
+        monto_total, plazo_semanas, inicio, pagados = [], [], [], []
+        for cliente_idx, cliente in enumerate(datos["clientes"]):
+            for prestamo_idx, prestamo in enumerate(cliente["prestamos"]):
+                try:
+                    fila = (a_centavos(prestamo["monto_total"]), int(prestamo["plazo_semanas"]),
+                            ordinal_fecha(prestamo["fecha_inicio"]), a_centavos(pagos_al(prestamo, self.al)[0]))
+                except (KeyError, TypeError, ValueError, OverflowError):
+                    self.ilegibles.append((cliente_idx, prestamo_idx))
+                    continue
+                self.referencias.append((cliente_idx, prestamo_idx))
+                self.nombres.append(cliente["nombre"])
+                monto_total.append(fila[0])
+                plazo_semanas.append(fila[1])
+                inicio.append(fila[2])
+                pagados.append(fila[3])
+        if self.ilegibles:
+            contar("cartera", "prestamos_ilegibles", len(self.ilegibles))
+        if np is not None:
+            self.monto_total = np.array(monto_total, dtype=np.int64)
+            self.plazo_semanas = np.array(plazo_semanas, dtype=np.int64)
+            self.inicio = np.array(inicio, dtype=np.int64)
+            self.pagado = np.array(pagados, dtype=np.int64)
+        else:
+            self.monto_total = monto_total
+            self.plazo_semanas = plazo_semanas
+            self.inicio = inicio
+            self.pagado = pagados
+
+    def __len__(self):
+        return len(self.referencias)
+
+
+# Calcular restante, debería haber pagado, faltante y estado de cada préstamo.
+# Devuelve columnas alineadas con cartera.referencias, montos en centavos.
+# Lo que debería haber pagado es lo esperado hasta las cuotas vencidas
+# (Cuotas.esperado), así coincide al centavo con resta_prestamo. Una Cartera
+# ya armada tiene que ser de ese mismo día.
+def analizar_cartera(cartera, hoy=None):
+    hoy = _hoy_ordinal(hoy)
+    if not isinstance(cartera, Cartera):
+        cartera = Cartera(cartera, hoy)
+    elif cartera.al != hoy:
+        raise ValueError(f"la cartera tiene los pagos hasta el {_fecha(cartera.al)}, no hasta el {_fecha(hoy)}")
+
+    if np is None:
+        return _analizar_por_prestamo(cartera, hoy)
+
+    restante = cartera.monto_total - cartera.pagado
+    # Cuotas vencidas, como en Cuotas.vencidas (no más que el plazo)
+    semanas_transcurridas = np.minimum(np.maximum((hoy - cartera.inicio) // 7 + 1, 0), cartera.plazo_semanas)
+    plazo = cartera.plazo_semanas
+    with np.errstate(divide="ignore", invalid="ignore"):
+        deberia_haber_pagado = (2 * cartera.monto_total * semanas_transcurridas + plazo) // (2 * plazo)
+    faltante_segun_plazo = np.maximum(0, deberia_haber_pagado - cartera.pagado)
+    estado = np.where(restante <= 0, ESTADO_LIQUIDADO,
+                      np.where(faltante_segun_plazo > 0, ESTADO_ATRASADO, ESTADO_AL_DIA))
+    return {
+        "cartera": cartera,
+        "restante": restante,
+        "deberia_haber_pagado": deberia_haber_pagado,
+        "faltante_segun_plazo": faltante_segun_plazo,
+        "estado": estado
+    }
+
+def _analizar_por_prestamo(cartera, hoy):
+    restante, deberia, faltante, estado = [], [], [], []
+    for monto_total, plazo, inicio, pagado_prestamo in zip(
+            cartera.monto_total, cartera.plazo_semanas, cartera.inicio, cartera.pagado):
+        semanas_transcurridas = min(max((hoy - inicio) // 7 + 1, 0), plazo)
+        deberia_haber_pagado = (2 * monto_total * semanas_transcurridas + plazo) // (2 * plazo) if plazo > 0 else 0
+        faltante_segun_plazo = max(0, deberia_haber_pagado - pagado_prestamo)
+        restante.append(monto_total - pagado_prestamo)
+        deberia.append(deberia_haber_pagado)
+        faltante.append(faltante_segun_plazo)
+        estado.append(estado_prestamo(restante[-1], faltante_segun_plazo))
+    return {
+        "cartera": cartera,
+        "restante": restante,
+        "deberia_haber_pagado": deberia,
+        "faltante_segun_plazo": faltante,
+        "estado": estado
+    }
+
+
+# Lista de préstamos atrasados, del mayor faltante al menor
+@medido("atrasados")
+def atrasados(datos, hoy=None):
+    analisis = analizar_cartera(datos, hoy)
+    cartera = analisis["cartera"]
+    contar("atrasados", "registros_recorridos", len(cartera.referencias))
+    faltante = analisis["faltante_segun_plazo"]
+    if np is not None:
+        filas = np.flatnonzero(analisis["estado"] == ESTADO_ATRASADO)
+        filas = filas[np.argsort(-faltante[filas], kind="stable")].tolist()
+    else:
+        filas = [i for i, e in enumerate(analisis["estado"]) if e == ESTADO_ATRASADO]
+        filas.sort(key=lambda i: -faltante[i])
+    resultado = []
+    for i in filas:
+        cliente_idx, prestamo_idx = cartera.referencias[i]
+        resultado.append({
+            "cliente": cartera.nombres[i],
+            "cliente_idx": cliente_idx,
+            "prestamo_idx": prestamo_idx,
+            "monto_total": de_centavos(int(cartera.monto_total[i])),
+            "pagado": de_centavos(int(cartera.pagado[i])),
+            "restante": de_centavos(int(analisis["restante"][i])),
+            "deberia_haber_pagado": de_centavos(int(analisis["deberia_haber_pagado"][i])),
+            "faltante_segun_plazo": de_centavos(int(faltante[i]))
+        })
+    return resultado
+
+
+if __name__ == "__main__":
+    from almacenamiento import cargar_datos
+
+    lista = atrasados(cargar_datos())
+    print(f"⚠️ Préstamos atrasados: {len(lista)}")
+    for fila in lista:
+        print(f"• {fila['cliente']} (préstamo {fila['prestamo_idx']}): "
+              f"faltan ${fila['faltante_segun_plazo']:,.2f} | restante ${fila['restante']:,.2f}")
@@ -0,0 +1,176 @@
+import argparse
+import csv
+import json
+from datetime import date
+
+from acumulados import SIN_COBRADOR
+from cartera import ordinal_fecha
+from dinero import a_centavos, de_centavos
+from indices import pagos_entre
+from metricas import medido
+from saldos import es_traspaso
+
+# Conciliación de la cobranza por día (o por día y cobrador) entre:
+#   libro      los pagos registrados de esos días, sumados de a uno
+#   acumulado  los totales materializados (acumulados.py) que usan los reportes
+#   caja       opcional: lo que entregó cada cobrador, de un archivo CSV o
+#              JSONL con fecha, monto y cobrador (opcional)
+# Todo se suma en centavos enteros (ver dinero.py), así que un día cuadra
+# solo si las sumas coinciden al centavo. Los traspasos de los renganches no
+# son dinero y no entran en ninguna.
+#
+# Uso: python conciliacion.py desde [hasta] [--caja archivo] [--por-cobrador]
+
+
+def _clave(dia, cobrador, por_cobrador):
+    return (dia, cobrador or SIN_COBRADOR) if por_cobrador else dia
+
+def _sumar(sumas, clave, centavos):
+    cubeta = sumas.setdefault(clave, [0, 0])
+    cubeta[0] += centavos
+    cubeta[1] += 1
+
+# {clave: [centavos, pagos]} desde los pagos registrados
+def cobrado_libro(datos, desde, hasta, por_cobrador=False):
+    sumas = {}
+    for _, _, pago in pagos_entre(datos, desde, hasta):
+        if es_traspaso(pago):
+            continue
+        try:
+            centavos, dia = a_centavos(pago["monto"]), ordinal_fecha(pago["fecha"])
+        except (TypeError, ValueError, OverflowError):
+            continue  # como en acumulados: un pago ilegible no entra en los totales
+        _sumar(sumas, _clave(dia, pago.get("cobrador"), por_cobrador), centavos)
+    return sumas
+
+# {clave: [centavos, pagos]} desde los totales materializados
+def cobrado_acumulado(acumulados, desde, hasta, por_cobrador=False):
+    desde, hasta = ordinal_fecha(desde), ordinal_fecha(hasta)
+    if not por_cobrador:
+        return {dia: list(cubeta) for dia, cubeta in acumulados.dias.entre(desde, hasta)}
+    return {(dia, cobrador): list(cubeta)
+            for cobrador, serie in acumulados.cobradores.items()
+            for dia, cubeta in serie.entre(desde, hasta)}
+
+# Filas de un archivo de caja como (número de línea, fila), en CSV con
+# encabezado o JSONL según la extensión
+def leer_caja(ruta):
+    with open(ruta, "r", newline="", encoding="utf-8-sig") as file:
+        if ruta.lower().endswith(".jsonl"):
+            for numero, linea in enumerate(file, 1):
+                if linea.strip():
+                    try:
+                        yield numero, json.loads(linea)
+                    except json.JSONDecodeError:
+                        yield numero, None
+        else:
+            lector = csv.DictReader(file)
+            for fila in lector:
+                yield lector.line_num, fila
+
+# ({clave: [centavos, entregas]}, rechazados) desde un archivo de caja
+def cobrado_caja(ruta, desde, hasta, por_cobrador=False):
+    sumas, rechazados = {}, []
+    for numero, fila in leer_caja(ruta):
+        try:
+            if not isinstance(fila, dict):
+                raise ValueError("línea con JSON inválido")
+            fecha = str(fila.get("fecha") or "").strip()
+            dia = ordinal_fecha(fecha)
+            centavos = a_centavos(float(fila.get("monto")))
+        except (TypeError, ValueError, OverflowError) as error:
+            rechazados.append({"linea": numero, "motivo": str(error)})
+            continue
+        if desde <= fecha <= hasta:
+            _sumar(sumas, _clave(dia, str(fila.get("cobrador") or "").strip(), por_cobrador), centavos)
+    return sumas, rechazados
+
+
+# Conciliación de un período: filas por día (o día y cobrador) con lo de cada
+# fuente en pesos, sus diferencias y si cuadra, más los totales
+@medido("conciliacion")
+def conciliar(datos, desde, hasta=None, ruta_caja=None, por_cobrador=False):
+    hasta = hasta or desde
+    libro = cobrado_libro(datos, desde, hasta, por_cobrador)
+    acumulado = cobrado_acumulado(datos.acumulados, desde, hasta, por_cobrador)
+    caja, rechazados = cobrado_caja(ruta_caja, desde, hasta, por_cobrador) if ruta_caja else (None, [])
+
+    claves = set(libro) | set(acumulado) | set(caja or ())
+    filas = []
+    totales = {"libro": 0, "acumulado": 0, "caja": 0}
+    for clave in sorted(claves):
+        dia, cobrador = clave if por_cobrador else (clave, None)
+        en_libro, pagos = libro.get(clave, (0, 0))
+        en_acumulado = acumulado.get(clave, (0, 0))[0]
+        en_caja = caja.get(clave, (0, 0))[0] if caja is not None else None
+        totales["libro"] += en_libro
+        totales["acumulado"] += en_acumulado
+        totales["caja"] += en_caja or 0
+        fila = {"fecha": date.fromordinal(dia).isoformat()}
+        if por_cobrador:
+            fila["cobrador"] = cobrador
+        fila.update({
+            "pagos": pagos,
+            "libro": de_centavos(en_libro),
+            "acumulado": de_centavos(en_acumulado),
+            "caja": de_centavos(en_caja) if en_caja is not None else None,
+            "diferencia_acumulado": de_centavos(en_acumulado - en_libro),
+            "diferencia_caja": de_centavos(en_caja - en_libro) if en_caja is not None else None
+        })
+        fila["cuadra"] = not fila["diferencia_acumulado"] and not fila["diferencia_caja"]
+        filas.append(fila)
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "por": "cobrador" if por_cobrador else "dia",
+        "libro": de_centavos(totales["libro"]),
+        "acumulado": de_centavos(totales["acumulado"]),
+        "caja": de_centavos(totales["caja"]) if caja is not None else None,
+        "descuadres": sum(1 for fila in filas if not fila["cuadra"]),
+        "filas": filas,
+        "rechazados": rechazados
+    }
+
+
+# Informe de conciliación para la consola (solo los días que no cuadran,
+# salvo con todas=True)
+def informe_conciliacion(resultado, todas=False):
+    con_caja = resultado["caja"] is not None
+    lineas = [f"🧾 Conciliación del {resultado['desde']} al {resultado['hasta']}",
+              f"{'Fecha':<12}{'Cobrador':<18}{'Libro':>14}{'Acumulado':>14}" + (f"{'Caja':>14}" if con_caja else "")]
+    for fila in resultado["filas"]:
+        if fila["cuadra"] and not todas:
+            continue
+        marca = "✅" if fila["cuadra"] else "❌"
+        cobrador = (fila.get("cobrador") or "(sin cobrador)") if "cobrador" in fila else ""
+        linea = f"{fila['fecha']:<12}{cobrador[:17]:<18}{fila['libro']:>14,.2f}{fila['acumulado']:>14,.2f}"
+        if con_caja:
+            linea += f"{fila['caja']:>14,.2f}"
+        lineas.append(f"{linea}  {marca}")
+    total = f"{'Total':<30}{resultado['libro']:>14,.2f}{resultado['acumulado']:>14,.2f}"
+    if con_caja:
+        total += f"{resultado['caja']:>14,.2f}"
+    lineas.append(total)
+    filas, descuadres = len(resultado["filas"]), resultado["descuadres"]
+    if descuadres:
+        lineas.append(f"❌ {descuadres} de {filas} no {'cuadra' if descuadres == 1 else 'cuadran'}.")
+    else:
+        lineas.append(f"✅ {filas} de {filas} {'cuadra' if filas == 1 else 'cuadran'} al centavo.")
+    for rechazo in resultado["rechazados"][:20]:
+        lineas.append(f"⚠️ Caja, línea {rechazo['linea']}: {rechazo['motivo']}")
+    return "\n".join(lineas)
+
+
+if __name__ == "__main__":
+    import bitacora
+
+    parser = argparse.ArgumentParser(description="Conciliación de la cobranza por día")
+    parser.add_argument("desde")
+    parser.add_argument("hasta", nargs="?")
+    parser.add_argument("--caja", help="archivo CSV o JSONL con fecha, monto y cobrador entregados")
+    parser.add_argument("--por-cobrador", action="store_true", help="por día y cobrador")
+    parser.add_argument("--todas", action="store_true", help="mostrar también las filas que cuadran")
+    args = parser.parse_args()
+
+    resultado = conciliar(bitacora.cargar_datos(), args.desde, args.hasta, args.caja, args.por_cobrador)
+    print(informe_conciliacion(resultado, args.todas))
@@ -0,0 +1,134 @@
+from array import array
+from datetime import date
+
+from dinero import a_centavos, de_centavos
+
+# Calendario de cuotas de un préstamo. Un préstamo de monto_total a
+# plazo_semanas se paga en plazo_semanas cuotas semanales: la primera vence el
+# día de inicio y las demás cada 7 días (la regla de resta_pago: en la semana
+# n desde el inicio ya vencieron n + 1 cuotas). Lo esperado hasta la cuota k
+# es monto_total * k / plazo_semanas redondeado a centavos, así las cuotas
+# suman exactamente el préstamo.
+#
+# Cada pago se asigna a las cuotas al registrarse (ver cartera.asignar_pago),
+# de la más vieja sin cubrir en adelante. La próxima cuota, las vencidas sin
+# pagar y lo que falta para estar al día salen de unos pocos enteros, sin
+# recorrer los pagos. Los montos van en centavos y las fechas como días
+# ordinales; en database.json se guarda como una lista de cuotas.
+
+PAGADA = "pagada"
+VENCIDA = "vencida"
+PENDIENTE = "pendiente"
+
+
+def _fecha(dia):
+    return date.fromordinal(dia).isoformat()
+
+
+class Cuotas:
+    """Cuotas semanales de un préstamo y lo abonado a cada una"""
+
+    __slots__ = ("inicio", "total", "abonado", "saldada", "cubierto", "siguiente")
+
+    def __init__(self, total, plazo, inicio):
+        if not isinstance(plazo, int) or plazo <= 0:
+            raise ValueError(f"plazo inválido: {plazo}")
+        self.inicio = inicio            # día en que vence la primera cuota
+        self.total = total              # centavos del préstamo
+        self.abonado = array("q", [0]) * plazo
+        self.saldada = array("l", [0]) * plazo  # día del pago que la completó
+        self.cubierto = 0               # centavos asignados a las cuotas
+        self.siguiente = 0              # primera cuota sin cubrir
+
+    def __len__(self):
+        return len(self.abonado)
+
+    def esperado(self, cuotas):
+        """Centavos que suman las primeras cuotas"""
+        plazo = len(self)
+        return (2 * self.total * cuotas + plazo) // (2 * plazo)
+
+    def monto(self, i):
+        return self.esperado(i + 1) - self.esperado(i)
+
+    def vence(self, i):
+        return self.inicio + 7 * i
+
+    def cubiertas(self, centavos):
+        """Cuotas que cubren centavos pagados de la primera en adelante (para
+        una fecha pasada, cuando no todos los pagos cuentan)"""
+        desde, hasta = 0, len(self)
+        while desde < hasta:
+            medio = (desde + hasta + 1) // 2
+            if self.esperado(medio) <= centavos:
+                desde = medio
+            else:
+                hasta = medio - 1
+        return desde
+
+    def vencidas(self, hoy):
+        """Cuotas que ya vencieron al día ordinal hoy"""
+        return min(len(self), max(0, (hoy - self.inicio) // 7 + 1))
+
+    def asignar(self, centavos, dia):
+        """Repartir un pago entre las cuotas sin cubrir, de la más vieja en adelante"""
+        while self.siguiente < len(self):
+            i = self.siguiente
+            falta = self.monto(i) - self.abonado[i]
+            if falta > 0:
+                if centavos <= 0:
+                    return
+                abono = min(centavos, falta)
+                self.abonado[i] += abono
+                self.cubierto += abono
+                centavos -= abono
+                if abono < falta:
+                    return
+            self.saldada[i] = dia
+            self.siguiente += 1
+
+    # Consultas en O(1); hoy es un día ordinal
+    def atrasadas(self, hoy):
+        return max(0, self.vencidas(hoy) - self.siguiente)
+
+    def para_estar_al_dia(self, hoy):
+        return max(0, self.esperado(self.vencidas(hoy)) - self.cubierto)
+
+    def proxima(self):
+        """(cuota, día en que vence, centavos que faltan) de la primera cuota
+        sin cubrir, o None si están todas pagadas"""
+        i = self.siguiente
+        if i >= len(self):
+            return None
+        return i, self.vence(i), self.monto(i) - self.abonado[i]
+
+    def estado(self, i, hoy):
+        if i < self.siguiente:
+            return PAGADA
+        return VENCIDA if self.vence(i) <= hoy else PENDIENTE
+
+    def a_json(self):
+        return [{
+            "vence": _fecha(self.vence(i)),
+            "monto": de_centavos(self.monto(i)),
+            "abonado": de_centavos(self.abonado[i]),
+            "saldada": _fecha(self.saldada[i]) if self.saldada[i] else None
+        } for i in range(len(self))]
+
+    @classmethod
+    def de_json(cls, valores):
+        """Cuotas guardadas con a_json, o None si no se pueden leer (se
+        vuelven a armar desde los pagos)"""
+        try:
+            cuotas = cls(sum(a_centavos(cuota["monto"]) for cuota in valores), len(valores),
+                         date.fromisoformat(valores[0]["vence"]).toordinal())
+            for i, cuota in enumerate(valores):
+                cuotas.abonado[i] = a_centavos(cuota["abonado"])
+                if cuota["saldada"]:
+                    cuotas.saldada[i] = date.fromisoformat(cuota["saldada"]).toordinal()
+        except (KeyError, IndexError, TypeError, ValueError, OverflowError):
+            return None
+        cuotas.cubierto = sum(cuotas.abonado)
+        while cuotas.siguiente < len(cuotas) and cuotas.abonado[cuotas.siguiente] >= cuotas.monto(cuotas.siguiente):
+            cuotas.siguiente += 1
+        return cuotas
@@ -0,0 +1,73 @@
+import os
+
+import bitacora
+import metricas
+from almacenamiento import RUTA_SQLITE, estadisticas_cache
+
+# Vista de Diagnóstico (consola e interfaz gráfica): tamaño de los archivos y
+# de la cartera, uso de la caché, tiempos y contadores de las operaciones
+# medidas (metricas.py) y, si está activo, el perfil. Avisa cuando la cartera
+# ya es grande para database.json.
+
+LIMITE_INSTANTANEA_MB = 50     # tamaño de database.json
+LIMITE_CARGA_SEGUNDOS = 2.0    # tiempo medio de cargar_datos
+
+
+def _tamano(ruta):
+    try:
+        return os.path.getsize(ruta)
+    except OSError:
+        return None
+
+def _mb(tamano):
+    return "no existe" if tamano is None else f"{tamano / 2**20:,.2f} MB"
+
+# Avisos para cuando la cartera creció más de lo que el JSON maneja bien
+def alertas(estadisticas=None):
+    estadisticas = estadisticas if estadisticas is not None else metricas.estadisticas()
+    avisos = []
+    tamano = _tamano(bitacora.RUTA_DATOS) or 0
+    if tamano > LIMITE_INSTANTANEA_MB * 2**20:
+        avisos.append(f"{bitacora.RUTA_DATOS} pesa {_mb(tamano)} (más de {LIMITE_INSTANTANEA_MB} MB)")
+    carga = estadisticas.get("cargar_datos")
+    if carga and carga["media_ms"] > LIMITE_CARGA_SEGUNDOS * 1000:
+        avisos.append(f"cargar_datos tarda {carga['media_ms'] / 1000:.1f} s en promedio")
+    if avisos and os.environ.get("PRESTAMOS_BACKEND", "json") != "sqlite":
+        avisos.append(f"considerar PRESTAMOS_BACKEND=sqlite (python almacenamiento.py migrar → {RUTA_SQLITE})")
+    return avisos
+
+def informe_diagnostico(datos=None):
+    lineas = ["🩺 DIAGNÓSTICO", "=" * 50, "", "📁 Archivos:"]
+    for ruta in (bitacora.RUTA_DATOS, bitacora.RUTA_BITACORA, bitacora.ruta_acumulados(bitacora.RUTA_DATOS)):
+        lineas.append(f"   {ruta}: {_mb(_tamano(ruta))}")
+
+    if datos is not None:
+        prestamos = [p for c in datos["clientes"] for p in c["prestamos"]]
+        lineas += ["", "👥 Cartera:",
+                   f"   Clientes: {len(datos['clientes']):,}",
+                   f"   Préstamos: {len(prestamos):,}",
+                   f"   Pagos: {sum(len(p['pagos']) for p in prestamos):,}",
+                   f"   Secuencia: {datos.get('secuencia', 0):,}"]
+
+    cache = estadisticas_cache()
+    if cache:
+        lineas += ["", "🗄️ Caché de datos:",
+                   f"   Aciertos: {cache['aciertos']:,} | Fallos: {cache['fallos']:,}",
+                   f"   Última carga: {cache['tiempo_ultima_carga'] * 1000:,.1f} ms "
+                   f"(total {cache['tiempo_carga_total']:,.2f} s)"]
+
+    estadisticas = metricas.estadisticas()
+    lineas += ["", "⏱️ Operaciones:", metricas.informe()]
+
+    avisos = alertas(estadisticas)
+    if avisos:
+        lineas += ["", "⚠️ La cartera está creciendo más de lo que maneja el archivo JSON:"]
+        lineas += [f"   • {aviso}" for aviso in avisos]
+
+    if metricas.perfil_activo():
+        lineas += ["", "🔬 Perfil (cProfile / tracemalloc):", metricas.informe_perfil()]
+    return "\n".join(lineas)
+
+
+if __name__ == "__main__":
+    print(informe_diagnostico(bitacora.cargar_datos()))
@@ -0,0 +1,21 @@
+# Montos en centavos. En database.json, la bitácora y las respuestas los
+# montos son números con decimales (1234.5), pero toda suma se hace en
+# centavos enteros y se vuelve a pesos solo al final: sumar floats uno tras
+# otro arrastra errores de redondeo (0.1 + 0.2 != 0.3) que en una cartera
+# grande ya se ven en los centavos del total, y los enteros son exactos y tan
+# rápidos de sumar como los floats.
+
+
+def a_centavos(monto):
+    return round(monto * 100)
+
+def de_centavos(centavos):
+    return centavos / 100
+
+# Suma exacta de montos en pesos, en centavos
+def sumar_centavos(montos):
+    return sum(map(a_centavos, montos))
+
+# Suma exacta de montos en pesos, en pesos
+def sumar(montos):
+    return de_centavos(sumar_centavos(montos))
@@ -0,0 +1,184 @@
+from cartera import asignar_pago, generar_cuotas
+from dinero import a_centavos, de_centavos
+from indices import Datos
+from modelo import Cliente, Prestamo
+from saldos import restante, sumar_pago
+
+# Cada operación que modifica los datos (agregar_cliente, registrar_prestamo,
+# registrar_pago, renganchar) se describe como un evento. El mismo evento se aplica en
+# memoria y se anexa a la bitácora, así que reconstruir el estado es volver a
+# aplicar los eventos en orden.
+
+
+# Crear eventos
+def evento_cliente(nombre, telefono):
+    return {
+        "tipo": "agregar_cliente",
+        "nombre": nombre,
+        "telefono": telefono
+    }
+
+def evento_prestamo(cliente_idx, monto, plazo_semanas, fecha_inicio):
+    return {
+        "tipo": "registrar_prestamo",
+        "cliente": cliente_idx,
+        "monto_total": monto,
+        "plazo_semanas": plazo_semanas,
+        "fecha_inicio": fecha_inicio
+    }
+
+# cobrador es opcional: solo se anota si se sabe quién cobró
+def evento_pago(cliente_idx, prestamo_idx, monto, fecha, cobrador=None):
+    evento = {
+        "tipo": "registrar_pago",
+        "cliente": cliente_idx,
+        "prestamo": prestamo_idx,
+        "monto": monto,
+        "fecha": fecha
+    }
+    if cobrador:
+        evento["cobrador"] = cobrador
+    return evento
+
+# Renganche: el saldo del préstamo se pasa a uno nuevo que suma monto de
+# crédito nuevo. El saldo se toma al aplicar el evento, no al crearlo.
+def evento_renganche(cliente_idx, prestamo_idx, monto, plazo_semanas, fecha_inicio):
+    return {
+        "tipo": "renganchar",
+        "cliente": cliente_idx,
+        "prestamo": prestamo_idx,
+        "monto": monto,
+        "plazo_semanas": plazo_semanas,
+        "fecha_inicio": fecha_inicio
+    }
+
+# Cargos de mora de una corrida: [[cliente_idx, prestamo_idx, monto], ...]
+def evento_mora(fecha, cargos):
+    return {
+        "tipo": "acumular_mora",
+        "fecha": fecha,
+        "cargos": cargos
+    }
+
+
+# Objetos que crea cada evento
+def nuevo_cliente(evento):
+    return Cliente({
+        "nombre": evento["nombre"],
+        "telefono": evento["telefono"],
+        "prestamos": []
+    })
+
+# El calendario de cuotas se arma al crear el préstamo
+def nuevo_prestamo(evento):
+    prestamo = Prestamo({
+        "monto_total": evento["monto_total"],
+        "plazo_semanas": evento["plazo_semanas"],
+        "fecha_inicio": evento["fecha_inicio"],
+        "pagos": [],
+        "renganches": [],
+        "pagado": 0,
+        "num_pagos": 0,
+        "ultimo_pago": None
+    })
+    cuotas = generar_cuotas(evento["monto_total"], evento["plazo_semanas"], evento["fecha_inicio"])
+    if cuotas is not None:
+        prestamo["cuotas"] = cuotas
+    return prestamo
+
+# Préstamo hijo de un renganche (saldo es lo que debía el padre, ya
+# en centavos exactos) y el pago que cierra al padre con ese saldo, o None si el padre
+# no debía nada. El pago lleva "renganche": el índice del hijo, para no
+# contarlo como cobrado en efectivo.
+def nuevo_renganche(evento, saldo, hijo_idx):
+    hijo = nuevo_prestamo({
+        "monto_total": de_centavos(a_centavos(evento["monto"]) + a_centavos(saldo)),
+        "plazo_semanas": evento["plazo_semanas"],
+        "fecha_inicio": evento["fecha_inicio"]
+    })
+    hijo["renganche_de"] = evento["prestamo"]
+    hijo["saldo_anterior"] = saldo
+    if saldo <= 0:
+        return hijo, None
+    return hijo, {"monto": saldo, "fecha": evento["fecha_inicio"], "renganche": hijo_idx}
+
+# Saldo que pasa de un préstamo a su renganche
+def saldo_renganche(prestamo):
+    return max(0, restante(prestamo))
+
+def nuevo_pago(evento):
+    pago = {
+        "monto": evento["monto"],
+        "fecha": evento["fecha"]
+    }
+    if evento.get("cobrador"):
+        pago["cobrador"] = evento["cobrador"]
+    return pago
+
+
+# Sumar un cargo de mora a un préstamo
+def cargar_mora(prestamo, fecha, monto):
+    prestamo["mora"] = de_centavos(a_centavos(prestamo.get("mora", 0)) + a_centavos(monto))
+    prestamo.setdefault("cargos_mora", []).append({"monto": monto, "fecha": fecha})
+
+
+# Agregar un pago a un préstamo con sus totales, cuotas e índices
+def agregar_pago(datos, cliente_idx, prestamo_idx, pago):
+    prestamo = datos["clientes"][cliente_idx]["prestamos"][prestamo_idx]
+    restante_anterior = restante(prestamo)
+    prestamo["pagos"].append(pago)
+    sumar_pago(prestamo, pago)
+    asignar_pago(prestamo, pago)
+    if isinstance(datos, Datos):
+        datos.pago_agregado(cliente_idx, prestamo_idx, prestamo, restante_anterior)
+
+
+# Aplicar un evento sobre los datos en memoria y devolver el objeto creado
+def aplicar_evento(datos, evento):
+    tipo = evento["tipo"]
+
+    if tipo == "agregar_cliente":
+        cliente = nuevo_cliente(evento)
+        datos["clientes"].append(cliente)
+        if isinstance(datos, Datos):
+            datos.cliente_agregado(len(datos["clientes"]) - 1, cliente)
+        return cliente
+
+    if tipo == "acumular_mora":
+        # Otra estación ya corrió la mora de esa fecha: no se cobra dos veces
+        if datos.get("mora_hasta") and datos["mora_hasta"] >= evento["fecha"]:
+            return []
+        for cliente_idx, prestamo_idx, monto in evento["cargos"]:
+            cargar_mora(datos["clientes"][cliente_idx]["prestamos"][prestamo_idx], evento["fecha"], monto)
+        datos["mora_hasta"] = evento["fecha"]
+        return evento["cargos"]
+
+    cliente = datos["clientes"][evento["cliente"]]
+
+    if tipo == "registrar_prestamo":
+        prestamo = nuevo_prestamo(evento)
+        cliente["prestamos"].append(prestamo)
+        if isinstance(datos, Datos):
+            datos.prestamo_agregado(prestamo)
+        return prestamo
+
+    if tipo == "registrar_pago":
+        pago = nuevo_pago(evento)
+        agregar_pago(datos, evento["cliente"], evento["prestamo"], pago)
+        return pago
+
+    if tipo == "renganchar":
+        padre = cliente["prestamos"][evento["prestamo"]]
+        hijo_idx = len(cliente["prestamos"])
+        hijo, traspaso = nuevo_renganche(evento, saldo_renganche(padre), hijo_idx)
+        cliente["prestamos"].append(hijo)
+        padre.setdefault("renganches", []).append(hijo_idx)
+        if isinstance(datos, Datos):
+            datos.prestamo_agregado(hijo)
+        if traspaso is not None:
+            agregar_pago(datos, evento["cliente"], evento["prestamo"], traspaso)
+        if isinstance(datos, Datos):
+            datos.renganche_agregado(evento["cliente"], evento["prestamo"], hijo_idx)
+        return hijo
+
+    raise ValueError(f"Tipo de evento desconocido: {tipo}")
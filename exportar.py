@@ -0,0 +1,192 @@
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from dinero import a_centavos, de_centavos
+from metricas import contar, medido
+from saldos import pagado
+
+# Exportes de toda la cartera (cierre de mes): una fila por cliente
+# ("clientes", lo de la tabla Todos los Clientes) o por préstamo
+# ("prestamos"), en CSV o JSONL, escritas directo al archivo.
+#
+# La lista de clientes se parte en tramos de TAMANO_PARTE; cada tramo se
+# convierte en texto y en sus totales en un proceso aparte y el proceso
+# principal escribe los textos en orden y suma los totales. Cada fila depende
+# solo de su cliente y los montos se llevan en centavos enteros, así que el
+# archivo y los totales son idénticos byte a byte a los de hacerlo en serie
+# (procesos=1), que es el mismo código corriendo los tramos de a uno.
+#
+# Con "fork" los procesos heredan los datos ya cargados y reciben solo los
+# límites del tramo; donde no hay fork (Windows) cada tramo viaja serializado.
+#
+# Uso: python exportar.py clientes|prestamos archivo.csv|archivo.jsonl [--procesos N]
+
+TIPOS = ("clientes", "prestamos")
+FORMATOS = ("csv", "jsonl")
+COLUMNAS = {
+    "clientes": ("n", "nombre", "telefono", "prestamos", "prestado", "pagado", "pendiente", "con_deuda"),
+    "prestamos": ("n", "cliente", "prestamo", "monto_total", "plazo_semanas", "fecha_inicio", "pagado",
+                  "pendiente", "num_pagos", "ultimo_pago", "mora", "renganche_de")
+}
+# Columnas en centavos: se escriben como monto con dos decimales
+MONTOS = {"prestado", "pagado", "pendiente", "monto_total", "mora"}
+TAMANO_PARTE = 2000      # clientes por tramo
+MINIMO_PARALELO = 10000  # con menos clientes no conviene arrancar procesos
+
+
+# Filas de un tramo; n es la posición del cliente desde 1, como en la tabla.
+# totales acumula clientes, prestamos, prestado, pagado (centavos) y con_deuda.
+def filas_clientes(clientes, desde, totales):
+    for n, cliente in enumerate(clientes, desde + 1):
+        prestado = cobrado = con_deuda = 0
+        for prestamo in cliente["prestamos"]:
+            monto, pagado_prestamo = a_centavos(prestamo["monto_total"]), a_centavos(pagado(prestamo))
+            prestado += monto
+            cobrado += pagado_prestamo
+            con_deuda += monto > pagado_prestamo
+        totales["clientes"] += 1
+        totales["prestamos"] += len(cliente["prestamos"])
+        totales["prestado"] += prestado
+        totales["pagado"] += cobrado
+        totales["con_deuda"] += con_deuda
+        yield {
+            "n": n,
+            "nombre": cliente["nombre"],
+            "telefono": cliente.get("telefono") or "",
+            "prestamos": len(cliente["prestamos"]),
+            "prestado": prestado,
+            "pagado": cobrado,
+            "pendiente": prestado - cobrado,
+            "con_deuda": con_deuda
+        }
+
+def filas_prestamos(clientes, desde, totales):
+    for n, cliente in enumerate(clientes, desde + 1):
+        totales["clientes"] += 1
+        for prestamo_idx, prestamo in enumerate(cliente["prestamos"]):
+            monto, pagado_prestamo = a_centavos(prestamo["monto_total"]), a_centavos(pagado(prestamo))
+            totales["prestamos"] += 1
+            totales["prestado"] += monto
+            totales["pagado"] += pagado_prestamo
+            totales["con_deuda"] += monto > pagado_prestamo
+            yield {
+                "n": n,
+                "cliente": cliente["nombre"],
+                "prestamo": prestamo_idx,
+                "monto_total": monto,
+                "plazo_semanas": prestamo["plazo_semanas"],
+                "fecha_inicio": prestamo["fecha_inicio"],
+                "pagado": pagado_prestamo,
+                "pendiente": monto - pagado_prestamo,
+                "num_pagos": len(prestamo["pagos"]),
+                "ultimo_pago": prestamo.get("ultimo_pago"),
+                "mora": a_centavos(prestamo.get("mora", 0)),
+                "renganche_de": prestamo.get("renganche_de")
+            }
+
+FILAS = {"clientes": filas_clientes, "prestamos": filas_prestamos}
+
+
+def _escribir_filas(filas, formato, salida):
+    if formato == "csv":
+        escritor = csv.writer(salida)
+        for fila in filas:
+            escritor.writerow([f"{de_centavos(valor):.2f}" if clave in MONTOS else valor for clave, valor in fila.items()])
+    else:
+        for fila in filas:
+            salida.write(json.dumps({clave: de_centavos(valor) if clave in MONTOS else valor for clave, valor in fila.items()},
+                                    ensure_ascii=False) + "\n")
+
+# Texto y totales de un tramo de clientes que empieza en la posición desde
+def exportar_parte(tipo, formato, desde, clientes):
+    totales = {"clientes": 0, "prestamos": 0, "prestado": 0, "pagado": 0, "con_deuda": 0}
+    salida = io.StringIO()
+    _escribir_filas(FILAS[tipo](clientes, desde, totales), formato, salida)
+    return salida.getvalue(), totales
+
+
+# Clientes que heredan los procesos creados con fork
+_clientes = None
+
+def _parte_heredada(tipo, formato, desde, hasta):
+    return exportar_parte(tipo, formato, desde, _clientes[desde:hasta])
+
+# Resultados de los tramos en orden, en serie o repartidos en procesos
+def _resultados(clientes, partes, tipo, formato, procesos):
+    if procesos <= 1 or len(clientes) < MINIMO_PARALELO:
+        for desde, hasta in partes:
+            yield exportar_parte(tipo, formato, desde, clientes[desde:hasta])
+        return
+
+    global _clientes
+    procesos = min(procesos, len(partes))
+    if "fork" in multiprocessing.get_all_start_methods():
+        _clientes = clientes
+        try:
+            with ProcessPoolExecutor(procesos, mp_context=multiprocessing.get_context("fork")) as pool:
+                yield from pool.map(_parte_heredada, repeat(tipo), repeat(formato),
+                                    [desde for desde, _ in partes], [hasta for _, hasta in partes])
+        finally:
+            _clientes = None
+    else:
+        with ProcessPoolExecutor(procesos) as pool:
+            yield from pool.map(exportar_parte, repeat(tipo), repeat(formato),
+                                [desde for desde, _ in partes], [clientes[desde:hasta] for desde, hasta in partes])
+
+# Exportar la cartera a ruta. El formato sale de la extensión si no se da;
+# procesos es la cantidad de procesos (por defecto, uno por núcleo).
+# al_avanzar(tramos_hechos, tramos) informa el avance. Devuelve los totales.
+@medido("exportar")
+def exportar(datos, ruta, tipo="clientes", formato=None, procesos=None, al_avanzar=None):
+    formato = formato or ("jsonl" if ruta.lower().endswith(".jsonl") else "csv")
+    if tipo not in TIPOS:
+        raise ValueError(f"exporte inválido: {tipo} (clientes o prestamos)")
+    if formato not in FORMATOS:
+        raise ValueError(f"formato inválido: {formato} (csv o jsonl)")
+    clientes = datos["clientes"]
+    partes = [(desde, min(desde + TAMANO_PARTE, len(clientes))) for desde in range(0, len(clientes), TAMANO_PARTE)]
+    totales = {"clientes": 0, "prestamos": 0, "prestado": 0, "pagado": 0, "con_deuda": 0}
+    with open(ruta, "w", newline="", encoding="utf-8") as archivo:
+        if formato == "csv":
+            csv.writer(archivo).writerow(COLUMNAS[tipo])
+        resultados = _resultados(clientes, partes, tipo, formato, procesos or os.cpu_count() or 1)
+        for hechos, (texto, parciales) in enumerate(resultados, 1):
+            archivo.write(texto)
+            for clave, valor in parciales.items():
+                totales[clave] += valor
+            if al_avanzar:
+                al_avanzar(hechos, len(partes))
+    contar("exportar", "registros_recorridos", len(clientes))
+    return {
+        "ruta": ruta,
+        "clientes": totales["clientes"],
+        "prestamos": totales["prestamos"],
+        "prestado": de_centavos(totales["prestado"]),
+        "pagado": de_centavos(totales["pagado"]),
+        "pendiente": de_centavos(totales["prestado"] - totales["pagado"]),
+        "prestamos_con_deuda": totales["con_deuda"]
+    }
+
+def informe_exporte(totales):
+    return (f"✅ Exporte guardado en {totales['ruta']}: {totales['clientes']} clientes, "
+            f"{totales['prestamos']} préstamos ({totales['prestamos_con_deuda']} con deuda)\n"
+            f"💰 Prestado: ${totales['prestado']:,.2f} | Pagado: ${totales['pagado']:,.2f} | "
+            f"Pendiente: ${totales['pendiente']:,.2f}")
+
+
+if __name__ == "__main__":
+    from almacenamiento import cargar_datos
+
+    parser = argparse.ArgumentParser(description="Exporte de la cartera por cliente o por préstamo")
+    parser.add_argument("tipo", choices=TIPOS)
+    parser.add_argument("ruta", help="archivo .csv o .jsonl")
+    parser.add_argument("--procesos", type=int, help="procesos a usar (por defecto, uno por núcleo)")
+    args = parser.parse_args()
+
+    print(informe_exporte(exportar(cargar_datos(), args.ruta, args.tipo, procesos=args.procesos)))
@@ -0,0 +1,93 @@
+import json
+
+# Lectura por partes de un objeto JSON grande ({"clave": valor, ...}) sin
+# armar el árbol completo: el archivo se lee en bloques y cada valor se
+# decodifica con raw_decode apenas está completo en el búfer. Los elementos
+# de la lista indicada se entregan de a uno, así la memoria depende del
+# elemento más grande y no del tamaño del archivo.
+
+TAMANO_BLOQUE = 1 << 16
+ESPACIOS = " \t\n\r"
+
+
+class LectorJSON:
+    def __init__(self, file, tamano_bloque=TAMANO_BLOQUE):
+        self.file = file
+        self.tamano_bloque = tamano_bloque
+        self.bufer = ""
+        self.pos = 0
+        self.fin_archivo = False
+        self.decodificador = json.JSONDecoder()
+
+    def _llenar(self):
+        if self.fin_archivo:
+            return False
+        # Se descarta lo ya consumido antes de agregar el bloque siguiente
+        self.bufer = self.bufer[self.pos:]
+        self.pos = 0
+        bloque = self.file.read(self.tamano_bloque)
+        if not bloque:
+            self.fin_archivo = True
+            return False
+        self.bufer += bloque
+        return True
+
+    def _caracter(self):
+        """Siguiente carácter que no es espacio (sin consumirlo), o "" al final"""
+        while True:
+            while self.pos < len(self.bufer) and self.bufer[self.pos] in ESPACIOS:
+                self.pos += 1
+            if self.pos < len(self.bufer):
+                return self.bufer[self.pos]
+            if not self._llenar():
+                return ""
+
+    def _esperar(self, caracteres):
+        caracter = self._caracter()
+        if not caracter or caracter not in caracteres:
+            raise json.JSONDecodeError(f"Se esperaba {caracteres!r}", self.bufer, self.pos)
+        self.pos += 1
+        return caracter
+
+    def _valor(self):
+        self._caracter()
+        while True:
+            try:
+                valor, fin = self.decodificador.raw_decode(self.bufer, self.pos)
+            except json.JSONDecodeError:
+                # Valor incompleto en el búfer: se lee otro bloque y se reintenta
+                if self._llenar():
+                    continue
+                raise
+            # Un número al final del búfer puede seguir en el bloque siguiente
+            if fin == len(self.bufer) and self._llenar():
+                continue
+            self.pos = fin
+            return valor
+
+    def _lista(self):
+        self._esperar("[")
+        if self._caracter() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self._valor()
+            if self._esperar(",]") == "]":
+                return
+
+    def recorrer(self, clave_lista):
+        """Entrega (clave, valor) por cada clave del objeto; para clave_lista
+        entrega (clave_lista, elemento) por cada elemento de la lista"""
+        self._esperar("{")
+        if self._caracter() == "}":
+            return
+        while True:
+            clave = self._valor()
+            self._esperar(":")
+            if clave == clave_lista and self._caracter() == "[":
+                for elemento in self._lista():
+                    yield clave, elemento
+            else:
+                yield clave, self._valor()
+            if self._esperar(",}") == "}":
+                return
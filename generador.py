@@ -0,0 +1,92 @@
+import argparse
+import os
+import random
+from datetime import date, timedelta
+
+from bitacora import escribir_instantanea
+from indices import Datos
+from saldos import recalcular_saldo
+
+# Carteras sintéticas para pruebas de rendimiento: N clientes con nombres
+# realistas (algunos repetidos o escritos distinto, como "Carlo " y "carlo"),
+# M préstamos por cliente en promedio y K pagos por día repartidos entre los
+# préstamos vigentes durante los últimos días.
+
+NOMBRES = ["carlo", "maría", "josé", "ana", "luis", "rosa", "juan", "carmen", "pedro", "lucía",
+           "miguel", "elena", "jorge", "sofía", "rafael", "marta", "andrés", "isabel", "diego", "paula"]
+APELLIDOS = ["pérez", "gómez", "rodríguez", "fernández", "lópez", "martínez", "sánchez", "díaz",
+             "ramírez", "torres", "flores", "rivera", "castillo", "morales", "ortiz", "reyes"]
+MONTOS = [1000, 1500, 2000, 3000, 5000, 8000, 10000]
+PLAZOS = [3, 4, 5, 6, 8, 10, 12]
+PROB_DUPLICADO = 0.02  # nombre de otro cliente con otra escritura
+
+
+def _nombre(azar, clientes):
+    if clientes and azar.random() < PROB_DUPLICADO:
+        base = azar.choice(clientes)["nombre"].strip()
+        return azar.choice([base.upper(), base.title(), base + " ", " " + base])
+    return f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)} {azar.randrange(10000)}"
+
+# Cartera sintética como Datos
+def generar_cartera(clientes, prestamos_por_cliente=2, pagos_por_dia=100, dias=120, hoy=None, semilla=1):
+    azar = random.Random(semilla)
+    hoy = hoy or date.today()
+    datos = Datos()
+    vigentes = []  # (préstamo, primer día de pago)
+    for _ in range(clientes):
+        cliente = {"nombre": _nombre(azar, datos["clientes"]), "telefono": f"809{azar.randrange(10**7):07d}", "prestamos": []}
+        for _ in range(azar.randint(0, 2 * prestamos_por_cliente)):
+            inicio = hoy - timedelta(days=azar.randrange(dias))
+            prestamo = {
+                "monto_total": float(azar.choice(MONTOS)),
+                "plazo_semanas": azar.choice(PLAZOS),
+                "fecha_inicio": inicio.isoformat(),
+                "pagos": [],
+                "renganches": []
+            }
+            cliente["prestamos"].append(prestamo)
+            vigentes.append((prestamo, inicio))
+        datos["clientes"].append(cliente)
+
+    # Cada día se paga sobre los préstamos que ya empezaron
+    vigentes.sort(key=lambda v: v[1])
+    del_dia = []
+    for atras in range(dias, -1, -1):
+        dia = hoy - timedelta(days=atras)
+        while len(del_dia) < len(vigentes) and vigentes[len(del_dia)][1] <= dia:
+            del_dia.append(vigentes[len(del_dia)][0])
+        if del_dia:
+            fecha = dia.isoformat()
+            for _ in range(pagos_por_dia):
+                prestamo = azar.choice(del_dia)
+                cuota = prestamo["monto_total"] / prestamo["plazo_semanas"] / 7
+                prestamo["pagos"].append({"monto": round(cuota * azar.choice([0.5, 1, 1, 1, 2]), 2), "fecha": fecha})
+
+    for cliente in datos["clientes"]:
+        for prestamo in cliente["prestamos"]:
+            recalcular_saldo(prestamo)
+    return datos
+
+def escribir_cartera(datos, ruta, formato=None):
+    with open(ruta, "w") as file:
+        escribir_instantanea(datos, file, formato)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generar una cartera sintética")
+    parser.add_argument("clientes", type=int)
+    parser.add_argument("--prestamos", type=int, default=2, help="préstamos por cliente (promedio)")
+    parser.add_argument("--pagos-dia", type=int, default=100, help="pagos por día en toda la cartera")
+    parser.add_argument("--dias", type=int, default=120, help="días de historia")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--salida", default="cartera_sintetica.json")
+    parser.add_argument("--forzar", action="store_true", help="sobrescribir el archivo de salida")
+    args = parser.parse_args()
+
+    if os.path.exists(args.salida) and not args.forzar:
+        parser.error(f"{args.salida} ya existe (usa --forzar para sobrescribirlo)")
+    datos = generar_cartera(args.clientes, args.prestamos, args.pagos_dia, args.dias, semilla=args.semilla)
+    escribir_cartera(datos, args.salida)
+    total_prestamos = sum(len(c["prestamos"]) for c in datos["clientes"])
+    total_pagos = sum(len(p["pagos"]) for c in datos["clientes"] for p in c["prestamos"])
+    print(f"✅ {args.salida}: {args.clientes} clientes, {total_prestamos} préstamos, {total_pagos} pagos.")
@@ -1,65 +1,37 @@
 import tkinter as tk
-from tkinter import messagebox, simpledialog, ttk
+from tkinter import filedialog, messagebox, simpledialog, ttk
 from datetime import datetime
-import json
 
-# Funciones del sistema principal
-def cargar_datos():
-    try:
-        with open("database.json", "r") as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return {"clientes": []}
-
-def guardar_datos(datos):
-    with open("database.json", "w") as file:
-        json.dump(datos, file, indent=4)
-
-def calcular_mora(dias_atraso, monto_prestamo):
-    if dias_atraso <= 0:
-        return 0
-    tasa_mora = 0.05  # 5% del préstamo original por día de atraso
-    return dias_atraso * tasa_mora * monto_prestamo
+from almacenamiento import cargar_datos, buscar_cliente, registrar_evento, sugerir_clientes
+from cartera import resta_prestamo
+from diagnostico import informe_diagnostico
+from eventos import evento_cliente, evento_prestamo, evento_pago, evento_renganche
+from exportar import exportar, informe_exporte
+from importar import importar_pagos, informe_importacion
+from metricas import medir
+from saldos import pagado, restante
+import servicio
+from servicio import NoEncontrado
+from tablas import ArbolEstadoCuenta, OrigenClientes, TablaPerezosa
+from tareas import EjecutorTareas
 
+# Funciones del sistema principal
 def resta_pago(datos, nombre, indice_prestamo=None):
-    cliente = next((c for c in datos["clientes"] if c["nombre"].lower() == nombre.lower()), None)
-    if not cliente:
-        return {"error": "Cliente no encontrado"}
-
-    if indice_prestamo is None or indice_prestamo >= len(cliente["prestamos"]) or indice_prestamo < 0:
-        return {"error": "Índice inválido"}
-
-    prestamo = cliente["prestamos"][indice_prestamo]
-
-    monto_total = prestamo["monto_total"]
-    pagado = sum(p["monto"] for p in prestamo["pagos"])
-    restante = monto_total - pagado
-
-    fecha_inicio = datetime.strptime(prestamo["fecha_inicio"], "%Y-%m-%d")
-    dias_transcurridos = (datetime.now() - fecha_inicio).days
-    semanas_transcurridas = dias_transcurridos // 7 + 1
-    pago_semanal = monto_total / prestamo["plazo_semanas"]
-
-    deberia_haber_pagado = pago_semanal * semanas_transcurridas
-    faltante_segun_plazo = max(0, deberia_haber_pagado - pagado)
-
-    return {
-        "cliente": nombre,
-        "prestamo_idx": indice_prestamo,
-        "monto_total": monto_total,
-        "pagado": pagado,
-        "restante": restante,
-        "deberia_haber_pagado": deberia_haber_pagado,
-        "faltante_segun_plazo": faltante_segun_plazo
-    }
+    try:
+        return servicio.resta_pago(datos, nombre, indice_prestamo)
+    except (ValueError, NoEncontrado) as error:
+        return {"error": str(error)}
 
 class GestionPrestamos:
     def __init__(self):
         self.ventana_principal = tk.Tk()
         self.ventana_principal.title("Gestión de Préstamos")
-        self.ventana_principal.geometry("500x600")
+        self.ventana_principal.geometry("500x770")
         self.ventana_principal.configure(bg="#f0f0f0")
         
+        # Carga, guardado y reportes en hilos de trabajo
+        self.tareas = EjecutorTareas(self.ventana_principal)
+
         # Configurar estilo
         self.configurar_interfaz()
         
@@ -83,11 +55,14 @@ class GestionPrestamos:
             ("Agregar Cliente", self.agregar_cliente_gui, "#27ae60"),
             ("Registrar Préstamo", self.registrar_prestamo_gui, "#3498db"),
             ("Registrar Pago", self.registrar_pago_gui, "#e67e22"),
+            ("Renganchar Préstamo", self.renganchar_gui, "#2980b9"),
+            ("Importar Pagos", self.importar_pagos_gui, "#d35400"),
             ("Estado de Cuenta", self.estado_cuenta_gui, "#9b59b6"),
             ("Resta del Pago", self.resta_pago_gui, "#1abc9c"),
             ("Resumen del Día", self.resumen_diario_gui, "#f39c12"),
             ("Ver Todos los Clientes", self.ver_todos_clientes, "#34495e"),
-            ("Salir", self.ventana_principal.quit, "#e74c3c")
+            ("Diagnóstico", self.diagnostico_gui, "#7f8c8d"),
+            ("Salir", self.salir, "#e74c3c")
         ]
         
         for texto, comando, color in botones:
@@ -187,56 +162,182 @@ class GestionPrestamos:
         ventana.transient(self.ventana_principal)
         ventana.grab_set()
 
-    def seleccionar_cliente(self, datos):
-        """Pide el nombre del cliente y devuelve su objeto"""
-        nombre = simpledialog.askstring("Cliente", "Nombre del cliente:")
-        if not nombre:
-            return None
-        nombre = nombre.strip()
-        return next((c for c in datos["clientes"] if c["nombre"].lower() == nombre.lower()), None)
+    def crear_ventana_tabla(self, titulo, crear_contenido, ancho=700, alto=600):
+        """Crear una ventana cuyo contenido arma crear_contenido(marco)"""
+        ventana = tk.Toplevel(self.ventana_principal)
+        ventana.title(titulo)
+        ventana.geometry(f"{ancho}x{alto}")
+        ventana.configure(bg="white")
+        ventana.resizable(True, True)
+
+        main_frame = tk.Frame(ventana, bg="white")
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        titulo_label = tk.Label(
+            main_frame,
+            text=titulo,
+            font=("Arial", 16, "bold"),
+            bg="white",
+            fg="#2c3e50"
+        )
+        titulo_label.pack(pady=(0, 15))
+
+        # Botón cerrar (se empaqueta primero abajo para que la tabla no lo tape)
+        btn_cerrar = tk.Button(
+            main_frame,
+            text="Cerrar",
+            command=ventana.destroy,
+            bg="#e74c3c",
+            fg="white",
+            font=("Arial", 10, "bold"),
+            padx=20,
+            pady=5
+        )
+        btn_cerrar.pack(side="bottom", pady=10)
+
+        crear_contenido(main_frame)
+
+        ventana.transient(self.ventana_principal)
+        ventana.grab_set()
+
+    def en_segundo_plano(self, funcion, al_terminar=None, titulo=None, operacion=None):
+        """Correr funcion(tarea) en un hilo de trabajo y llamar a
+        al_terminar(resultado) en el hilo de Tk. Con operacion el tiempo de
+        la tarea se mide como "gui.<operacion>" (ver Diagnóstico)."""
+        if operacion:
+            trabajo = funcion
+
+            def funcion(tarea):
+                with medir(f"gui.{operacion}"):
+                    return trabajo(tarea)
+
+        return self.tareas.ejecutar(
+            funcion,
+            al_terminar=al_terminar,
+            al_fallar=lambda error: messagebox.showerror("Error", f"❌ {error}"),
+            titulo=titulo
+        )
+
+    def seleccionar_cliente(self, al_elegir):
+        """Pide el nombre o teléfono del cliente y llama a al_elegir(índice,
+        cliente). Si ninguno se llama así, ofrece los parecidos."""
+        texto = simpledialog.askstring("Cliente", "Nombre o teléfono del cliente:")
+        if not texto:
+            al_elegir(None, None)
+            return
+
+        def buscar(tarea):
+            encontrado = buscar_cliente(texto.strip())
+            return encontrado, [] if encontrado[1] else sugerir_clientes(texto.strip())
+
+        def elegir(resultado):
+            encontrado, sugerencias = resultado
+            if encontrado[1] or not sugerencias:
+                al_elegir(*encontrado)
+            else:
+                self.elegir_sugerencia(sugerencias, al_elegir)
+
+        self.en_segundo_plano(buscar, elegir, operacion="seleccionar_cliente")
+
+    def elegir_sugerencia(self, sugerencias, al_elegir):
+        """Lista de clientes parecidos; al elegir uno se llama a al_elegir"""
+        ventana = tk.Toplevel(self.ventana_principal)
+        ventana.title("¿Quisiste decir?")
+        ventana.geometry("420x320")
+        ventana.configure(bg="white")
+
+        tk.Label(
+            ventana,
+            text="No hay un cliente con ese nombre. ¿Quisiste decir?",
+            font=("Arial", 10, "bold"),
+            bg="white",
+            fg="#2c3e50"
+        ).pack(pady=(15, 5))
+        lista = tk.Listbox(ventana, font=("Arial", 10), height=10)
+        for _, cliente, _ in sugerencias:
+            lista.insert(tk.END, f"{cliente['nombre']}  |  Tel: {cliente.get('telefono') or '-'}")
+        lista.selection_set(0)
+        lista.pack(fill=tk.BOTH, expand=True, padx=15, pady=5)
+
+        def elegir(_=None):
+            seleccion = lista.curselection()
+            if not seleccion:
+                return
+            cliente_idx, cliente, _ = sugerencias[seleccion[0]]
+            ventana.destroy()
+            al_elegir(cliente_idx, cliente)
+
+        lista.bind("<Double-Button-1>", elegir)
+        lista.bind("<Return>", elegir)
+        tk.Button(
+            ventana,
+            text="Elegir",
+            command=elegir,
+            bg="#3498db",
+            fg="white",
+            font=("Arial", 10, "bold"),
+            padx=15
+        ).pack(pady=(5, 15))
+        lista.focus_set()
+        ventana.transient(self.ventana_principal)
+        ventana.grab_set()
 
     def agregar_cliente_gui(self):
         nombre = simpledialog.askstring("Agregar Cliente", "Nombre del cliente:")
         telefono = simpledialog.askstring("Agregar Cliente", "Teléfono:")
-        if nombre and telefono:
-            datos = cargar_datos()
-            cliente = {
-                "nombre": nombre.strip(),
-                "telefono": telefono.strip(),
-                "prestamos": []
-            }
-            datos["clientes"].append(cliente)
-            guardar_datos(datos)
-            messagebox.showinfo("Éxito", f"✅ Cliente '{nombre}' agregado correctamente.")
+        if not (nombre and telefono):
+            return
+
+        def agregar(_=None):
+            self.en_segundo_plano(
+                lambda tarea: registrar_evento(evento_cliente(nombre.strip(), telefono.strip())),
+                lambda _: messagebox.showinfo("Éxito", f"✅ Cliente '{nombre}' agregado correctamente."),
+                operacion="agregar_cliente"
+            )
+
+        def revisar_duplicado(encontrado):
+            _, existente = encontrado
+            if existente and not messagebox.askyesno(
+                    "Cliente duplicado",
+                    f"⚠️ Ya existe un cliente llamado '{existente['nombre']}'. ¿Agregarlo de todos modos?"):
+                return
+            agregar()
+
+        self.en_segundo_plano(lambda tarea: buscar_cliente(nombre.strip()), revisar_duplicado,
+                              operacion="revisar_duplicado")
 
     def registrar_prestamo_gui(self):
-        datos = cargar_datos()
-        cliente = self.seleccionar_cliente(datos)
+        self.seleccionar_cliente(self._registrar_prestamo)
+
+    def _registrar_prestamo(self, cliente_idx, cliente):
         if not cliente:
             messagebox.showerror("Error", "❌ Cliente no encontrado.")
             return
 
         monto = simpledialog.askfloat("Registrar Préstamo", "Monto del préstamo:")
-        plazo_semanas = simpledialog.askinteger("Registrar Préstamo", "Plazo en semanas:")
+        plazo_semanas = simpledialog.askinteger("Registrar Préstamo", "Plazo en semanas:", minvalue=1)
         fecha_inicio = simpledialog.askstring("Registrar Préstamo", "Fecha de inicio (YYYY-MM-DD):")
 
         if None in [monto, plazo_semanas, fecha_inicio]:
             return
+        try:
+            fecha_inicio = servicio.validar_fecha(fecha_inicio)
+        except ValueError as error:
+            messagebox.showerror("Error", f"❌ {error}.")
+            return
 
-        prestamo = {
-            "monto_total": monto,
-            "plazo_semanas": plazo_semanas,
-            "fecha_inicio": fecha_inicio.strip(),
-            "pagos": []
-        }
-
-        cliente["prestamos"].append(prestamo)
-        guardar_datos(datos)
-        messagebox.showinfo("Éxito", f"✅ Préstamo de ${monto} registrado para {cliente['nombre']}.")
+        self.en_segundo_plano(
+            lambda tarea: registrar_evento(evento_prestamo(cliente_idx, monto, plazo_semanas, fecha_inicio)),
+            lambda _: messagebox.showinfo("Éxito", f"✅ Préstamo de ${monto} registrado para {cliente['nombre']}.\n"
+                                                   f"📆 {plazo_semanas} cuotas semanales de ${monto / plazo_semanas:,.2f}; "
+                                                   f"la primera vence el {fecha_inicio}."),
+            operacion="registrar_prestamo"
+        )
 
     def registrar_pago_gui(self):
-        datos = cargar_datos()
-        cliente = self.seleccionar_cliente(datos)
+        self.seleccionar_cliente(self._registrar_pago)
+
+    def _registrar_pago(self, cliente_idx, cliente):
         if not cliente or not cliente["prestamos"]:
             messagebox.showerror("Error", "❌ Cliente o préstamo no encontrado.")
             return
@@ -244,9 +345,7 @@ class GestionPrestamos:
         # Mostrar préstamos en una ventana
         prestamos_info = ""
         for i, p in enumerate(cliente["prestamos"]):
-            pagado = sum(pago["monto"] for pago in p["pagos"])
-            pendiente = p["monto_total"] - pagado
-            prestamos_info += f"{i}. Monto total: ${p['monto_total']} | Pagado: ${pagado} | Pendiente: ${pendiente}\n"
+            prestamos_info += f"{i}. Monto total: ${p['monto_total']} | Pagado: ${pagado(p)} | Pendiente: ${restante(p)}\n"
 
         self.crear_ventana_datos(f"Préstamos de {cliente['nombre']}", prestamos_info, 500, 300)
 
@@ -261,64 +360,112 @@ class GestionPrestamos:
 
         if None in [monto_pago, fecha_pago]:
             return
+        try:
+            fecha_pago = servicio.validar_fecha(fecha_pago)
+        except ValueError as error:
+            messagebox.showerror("Error", f"❌ {error}.")
+            return
 
-        cliente["prestamos"][idx]["pagos"].append({
-            "monto": monto_pago,
-            "fecha": fecha_pago.strip()
-        })
+        self.en_segundo_plano(
+            lambda tarea: registrar_evento(evento_pago(cliente_idx, idx, monto_pago, fecha_pago)),
+            lambda _: messagebox.showinfo("Éxito", f"✅ Pago de ${monto_pago} registrado correctamente."),
+            operacion="registrar_pago"
+        )
+
+    def renganchar_gui(self):
+        self.seleccionar_cliente(self._renganchar)
 
-        guardar_datos(datos)
-        messagebox.showinfo("Éxito", f"✅ Pago de ${monto_pago} registrado correctamente.")
+    def _renganchar(self, cliente_idx, cliente):
+        if not cliente or not cliente["prestamos"]:
+            messagebox.showerror("Error", "❌ Cliente o préstamo no encontrado.")
+            return
+
+        prestamos_info = ""
+        for i, p in enumerate(cliente["prestamos"]):
+            if restante(p) > 0 and not p.get("renganches"):
+                prestamos_info += f"{i}. Monto total: ${p['monto_total']} | Pendiente: ${restante(p):,.2f}\n"
+        if not prestamos_info:
+            messagebox.showinfo("Renganche", f"{cliente['nombre']} no tiene préstamos con saldo para renganchar.")
+            return
+
+        self.crear_ventana_datos(f"Préstamos de {cliente['nombre']}", prestamos_info, 500, 300)
+
+        idx = simpledialog.askinteger("Renganchar", "Índice del préstamo a renganchar:")
+        if idx is None:
+            return
+        if not 0 <= idx < len(cliente["prestamos"]) or cliente["prestamos"][idx].get("renganches") \
+                or restante(cliente["prestamos"][idx]) <= 0:
+            messagebox.showerror("Error", "❌ Ese préstamo no se puede renganchar.")
+            return
+
+        monto = simpledialog.askfloat("Renganchar", "Crédito nuevo (se suma al saldo pendiente):", minvalue=0.01)
+        plazo_semanas = simpledialog.askinteger("Renganchar", "Plazo en semanas:", minvalue=1)
+        fecha_inicio = simpledialog.askstring("Renganchar", "Fecha de inicio (YYYY-MM-DD):")
+
+        if None in [monto, plazo_semanas, fecha_inicio]:
+            return
+        try:
+            fecha_inicio = servicio.validar_fecha(fecha_inicio)
+            servicio.validar_renganche(cliente["prestamos"][idx], idx, fecha_inicio)
+        except ValueError as error:
+            messagebox.showerror("Error", f"❌ {error}.")
+            return
+
+        self.en_segundo_plano(
+            lambda tarea: registrar_evento(evento_renganche(cliente_idx, idx, monto, plazo_semanas, fecha_inicio)),
+            lambda hijo: messagebox.showinfo(
+                "Éxito", f"✅ Préstamo {idx} renganchado: saldo ${hijo['saldo_anterior']:,.2f} + "
+                         f"crédito nuevo ${monto:,.2f} = ${hijo['monto_total']:,.2f} "
+                         f"en {plazo_semanas} semanas."),
+            operacion="renganchar"
+        )
+
+    def importar_pagos_gui(self):
+        ruta = filedialog.askopenfilename(
+            title="Importar pagos",
+            filetypes=[("Pagos", "*.csv *.jsonl"), ("Todos los archivos", "*.*")]
+        )
+        if not ruta:
+            return
+
+        def importar(tarea):
+            return importar_pagos(ruta, avance=lambda f: tarea.avanzar(f, "Importando pagos..."))
+
+        self.en_segundo_plano(
+            importar,
+            lambda resultado: self.crear_ventana_datos("Importación de Pagos", informe_importacion(resultado), 650, 450),
+            titulo="Importando pagos...",
+            operacion="importar_pagos"
+        )
 
     def estado_cuenta_gui(self):
-        datos = cargar_datos()
-        cliente = self.seleccionar_cliente(datos)
+        self.seleccionar_cliente(self._estado_cuenta)
+
+    def _estado_cuenta(self, _, cliente):
         if not cliente:
             messagebox.showerror("Error", "❌ Cliente no encontrado.")
             return
 
-        contenido = f"👤 ESTADO DE CUENTA - {cliente['nombre'].upper()}\n"
-        contenido += f"📞 Teléfono: {cliente.get('telefono', 'No registrado')}\n"
-        contenido += "=" * 60 + "\n\n"
-
-        if not cliente["prestamos"]:
-            contenido += "No hay préstamos registrados para este cliente."
-        else:
-            for idx, prestamo in enumerate(cliente["prestamos"]):
-                monto_total = prestamo["monto_total"]
-                pagado = sum(p["monto"] for p in prestamo["pagos"])
-                restante = monto_total - pagado
-                
-                # Calcular información de plazo
-                fecha_inicio = datetime.strptime(prestamo["fecha_inicio"], "%Y-%m-%d")
-                dias_transcurridos = (datetime.now() - fecha_inicio).days
-                semanas_transcurridas = dias_transcurridos // 7
-                
-                contenido += f"💰 PRÉSTAMO #{idx + 1}\n"
-                contenido += f"   Monto total: ${monto_total:,.2f}\n"
-                contenido += f"   Plazo: {prestamo['plazo_semanas']} semanas\n"
-                contenido += f"   Fecha inicio: {prestamo['fecha_inicio']}\n"
-                contenido += f"   Pagado: ${pagado:,.2f}\n"
-                contenido += f"   Pendiente: ${restante:,.2f}\n"
-                contenido += f"   Semanas transcurridas: {semanas_transcurridas}\n"
-                contenido += f"   Días transcurridos: {dias_transcurridos}\n"
-                
-                if prestamo["pagos"]:
-                    contenido += f"\n   📋 HISTORIAL DE PAGOS:\n"
-                    for i, pago in enumerate(prestamo["pagos"], 1):
-                        contenido += f"      {i}. ${pago['monto']:,.2f} - {pago['fecha']}\n"
-                
-                contenido += "\n" + "-" * 50 + "\n\n"
-
-        self.crear_ventana_datos(f"Estado de Cuenta - {cliente['nombre']}", contenido, 700, 600)
+        def contenido(marco):
+            tk.Label(
+                marco,
+                text=f"📞 Teléfono: {cliente.get('telefono', 'No registrado')}",
+                font=("Arial", 10),
+                bg="white",
+                fg="#2c3e50"
+            ).pack(anchor="w", pady=(0, 10))
+            if not cliente["prestamos"]:
+                tk.Label(marco, text="No hay préstamos registrados para este cliente.", bg="white").pack()
+            else:
+                ArbolEstadoCuenta(marco, cliente)
+
+        with medir("gui.estado_cuenta"):
+            self.crear_ventana_tabla(f"Estado de Cuenta - {cliente['nombre']}", contenido, 850, 600)
 
     def resta_pago_gui(self):
-        datos = cargar_datos()
-        nombre = simpledialog.askstring("Cliente", "Nombre del cliente:")
-        if not nombre:
-            return
+        self.seleccionar_cliente(lambda _, cliente: self._resta_pago(cliente["nombre"] if cliente else None, cliente))
 
-        cliente = next((c for c in datos["clientes"] if c["nombre"].lower() == nombre.lower()), None)
+    def _resta_pago(self, nombre, cliente):
         if not cliente:
             messagebox.showerror("Error", "❌ Cliente no encontrado.")
             return
@@ -330,9 +477,7 @@ class GestionPrestamos:
         # Los préstamos disponibles
         prestamos_info = f"PRÉSTAMOS DISPONIBLES PARA {cliente['nombre'].upper()}:\n\n"
         for i, p in enumerate(cliente["prestamos"]):
-            pagado = sum(pago["monto"] for pago in p["pagos"])
-            pendiente = p["monto_total"] - pagado
-            prestamos_info += f"{i}. Monto total: ${p['monto_total']:,.2f} | Pendiente: ${pendiente:,.2f}\n"
+            prestamos_info += f"{i}. Monto total: ${p['monto_total']:,.2f} | Pendiente: ${restante(p):,.2f}\n"
 
         self.crear_ventana_datos("Seleccionar Préstamo", prestamos_info, 500, 300)
 
@@ -342,7 +487,8 @@ class GestionPrestamos:
             messagebox.showerror("Error", "❌ Índice inválido.")
             return
 
-        resultado = resta_pago(datos, nombre, idx)
+        with medir("resta_pago"):
+            resultado = {"cliente": nombre, "prestamo_idx": idx, **resta_prestamo(cliente["prestamos"][idx])}
 
         contenido = f"📊 ANÁLISIS DE PAGO - {resultado['cliente'].upper()}\n"
         contenido += "=" * 50 + "\n\n"
@@ -352,7 +498,14 @@ class GestionPrestamos:
         contenido += f"   Restante: ${resultado['restante']:,.2f}\n\n"
         contenido += f"📈 ANÁLISIS DE CUMPLIMIENTO:\n"
         contenido += f"   Debería haber pagado: ${resultado['deberia_haber_pagado']:,.2f}\n"
-        contenido += f"   Faltante según plazo: ${resultado['faltante_segun_plazo']:,.2f}\n\n"
+        contenido += f"   Faltante según plazo: ${resultado['faltante_segun_plazo']:,.2f}\n"
+        contenido += f"   Cuotas pagadas: {resultado['cuotas_pagadas']} | Vencidas: {resultado['cuotas_vencidas']}"
+        contenido += f" | Atrasadas: {resultado['cuotas_atrasadas']}\n"
+        if resultado["proxima_cuota"]:
+            proxima = resultado["proxima_cuota"]
+            contenido += f"   Próxima cuota: #{proxima['numero']}, vence el {proxima['vence']}"
+            contenido += f" (faltan ${proxima['falta']:,.2f})\n"
+        contenido += "\n"
         
         if resultado['faltante_segun_plazo'] > 0:
             contenido += f"⚠️  ESTADO: ATRASADO\n"
@@ -363,72 +516,122 @@ class GestionPrestamos:
         self.crear_ventana_datos("Análisis de Pago", contenido, 600, 400)
 
     def resumen_diario_gui(self):
-        datos = cargar_datos()
         hoy = datetime.now().strftime("%Y-%m-%d")
-        total_pagos = 0
-        clientes_deudores = 0
-        pagos_hoy = []
-
-        for cliente in datos["clientes"]:
-            for prestamo in cliente["prestamos"]:
-                # Pagos del dia
-                pagos_cliente_hoy = [p for p in prestamo["pagos"] if p["fecha"] == hoy]
-                for pago in pagos_cliente_hoy:
-                    total_pagos += pago["monto"]
-                    pagos_hoy.append({
-                        "cliente": cliente["nombre"],
-                        "monto": pago["monto"],
-                        "fecha": pago["fecha"]
-                    })
-                
-                # Deudas pendientes
-                restante = prestamo["monto_total"] - sum(p["monto"] for p in prestamo["pagos"])
-                if restante > 0:
-                    clientes_deudores += 1
-
-        contenido = f"📅 RESUMEN DEL DÍA - {hoy}\n"
+        fecha = simpledialog.askstring("Resumen del Día", "Día (YYYY-MM-DD):", initialvalue=hoy)
+        if fecha is None:
+            return
+        try:
+            fecha = servicio.validar_fecha(fecha or hoy)
+        except ValueError as error:
+            messagebox.showerror("Error", f"❌ {error}.")
+            return
+        self.en_segundo_plano(lambda tarea: self._calcular_resumen_diario(tarea, fecha),
+                              lambda contenido: self.crear_ventana_datos("Resumen Diario", contenido, 600, 500),
+                              titulo="Calculando resumen del día...", operacion="resumen_diario")
+
+    def _calcular_resumen_diario(self, tarea, fecha):
+        tarea.avanzar(0.1, "Cargando datos...")
+        datos = cargar_datos()
+        tarea.avanzar(0.6, f"Sumando pagos del {fecha}...")
+        # Solo se leen los pagos de ese día (índice por fecha); para un día
+        # pasado, los préstamos con deuda son los de ese día
+        resumen = servicio.resumen_diario(datos, fecha)
+        pagos_dia = resumen["pagos"]
+        tarea.avanzar(0.9)
+
+        contenido = f"📅 RESUMEN DEL DÍA - {fecha}\n"
         contenido += "=" * 50 + "\n\n"
-        contenido += f"💰 Total pagado hoy: ${total_pagos:,.2f}\n"
-        contenido += f"👥 Clientes con deudas pendientes: {clientes_deudores}\n"
-        contenido += f"📝 Número de pagos recibidos: {len(pagos_hoy)}\n\n"
+        contenido += f"💰 Total pagado ese día: ${resumen['total_pagos']:,.2f}\n"
+        contenido += f"👥 Clientes con deudas pendientes: {resumen['prestamos_con_deuda']}\n"
+        contenido += f"📊 Saldo de la cartera: ${resumen['saldo_cartera']:,.2f}\n"
+        contenido += f"📝 Número de pagos recibidos: {len(pagos_dia)}\n\n"
         
-        if pagos_hoy:
+        if pagos_dia:
             contenido += "📋 DETALLE DE PAGOS DEL DÍA:\n"
             contenido += "-" * 40 + "\n"
-            for pago in pagos_hoy:
+            for pago in pagos_dia:
                 contenido += f"• {pago['cliente']}: ${pago['monto']:,.2f}\n"
         else:
-            contenido += "No se registraron pagos el día de hoy.\n"
-
-        self.crear_ventana_datos("Resumen Diario", contenido, 600, 500)
+            contenido += "No se registraron pagos ese día.\n"
+        return contenido
 
     def ver_todos_clientes(self):
+        self.en_segundo_plano(self._preparar_clientes, self._mostrar_clientes, titulo="Cargando clientes...",
+                              operacion="ver_todos_clientes")
+
+    def _preparar_clientes(self, tarea):
+        tarea.avanzar(0.05, "Cargando datos...")
         datos = cargar_datos()
-        
-        if not datos["clientes"]:
+        origen = OrigenClientes(datos["clientes"])
+        total = len(origen)
+        # Los totales de cada cliente se calculan aquí y no en el hilo de Tk
+        for i in range(total):
+            if i % 1000 == 0:
+                tarea.avanzar(0.2 + 0.8 * i / total, f"Calculando totales ({i} de {total})...")
+            origen.totales(i)
+        return origen
+
+    def _mostrar_clientes(self, origen):
+        if not len(origen):
             messagebox.showinfo("Información", "No hay clientes registrados.")
             return
 
-        contenido = f"👥 TODOS LOS CLIENTES REGISTRADOS\n"
-        contenido += f"Total de clientes: {len(datos['clientes'])}\n"
-        contenido += "=" * 60 + "\n\n"
-
-        for idx, cliente in enumerate(datos["clientes"], 1):
-            contenido += f"{idx}. 👤 {cliente['nombre'].upper()}\n"
-            contenido += f"   📞 Teléfono: {cliente.get('telefono', 'No registrado')}\n"
-            contenido += f"   💰 Préstamos activos: {len(cliente['prestamos'])}\n"
-            
-            # Calculo totales
-            total_prestado = sum(p["monto_total"] for p in cliente["prestamos"])
-            total_pagado = sum(sum(pago["monto"] for pago in p["pagos"]) for p in cliente["prestamos"])
-            total_pendiente = total_prestado - total_pagado
-            
-            contenido += f"   💸 Total prestado: ${total_prestado:,.2f}\n"
-            contenido += f"   ✅ Total pagado: ${total_pagado:,.2f}\n"
-            contenido += f"   ⏳ Total pendiente: ${total_pendiente:,.2f}\n"
-            contenido += "\n" + "-" * 50 + "\n\n"
-
-        self.crear_ventana_datos("Todos los Clientes", contenido, 700, 600)
+        def contenido(marco):
+            tk.Label(
+                marco,
+                text=f"Total de clientes: {len(origen)}  (clic en una columna para ordenar)",
+                font=("Arial", 10),
+                bg="white",
+                fg="#2c3e50"
+            ).pack(anchor="w", pady=(0, 10))
+            tk.Button(
+                marco,
+                text="Exportar...",
+                command=self.exportar_cartera_gui,
+                bg="#34495e",
+                fg="white",
+                font=("Arial", 10, "bold"),
+                padx=20,
+                pady=5
+            ).pack(side="bottom", pady=(10, 0))
+            TablaPerezosa(marco, OrigenClientes.COLUMNAS, origen)
+
+        self.crear_ventana_tabla("Todos los Clientes", contenido, 800, 600)
+
+    # Exporte de toda la cartera a CSV o JSONL (ver exportar.py)
+    def exportar_cartera_gui(self):
+        ruta = filedialog.asksaveasfilename(
+            title="Exportar cartera",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSONL", "*.jsonl")]
+        )
+        if not ruta:
+            return
+        tipo = "prestamos" if messagebox.askyesno(
+            "Exportar cartera", "¿Una fila por préstamo?\n(No: una fila por cliente)") else "clientes"
+
+        def exportar_archivo(tarea):
+            tarea.avanzar(0.05, "Cargando datos...")
+            return exportar(cargar_datos(), ruta, tipo, al_avanzar=lambda hechos, total: tarea.avanzar(
+                0.1 + 0.9 * hechos / total, f"Exportando ({hechos} de {total} tramos)..."))
+
+        self.en_segundo_plano(
+            exportar_archivo,
+            lambda totales: messagebox.showinfo("Éxito", informe_exporte(totales)),
+            titulo="Exportando cartera...",
+            operacion="exportar"
+        )
+
+    def diagnostico_gui(self):
+        self.en_segundo_plano(
+            lambda tarea: informe_diagnostico(cargar_datos()),
+            lambda contenido: self.crear_ventana_datos("Diagnóstico", contenido, 750, 600),
+            operacion="diagnostico"
+        )
+
+    def salir(self):
+        self.tareas.cerrar()
+        self.ventana_principal.quit()
 
     def ejecutar(self):
         self.ventana_principal.mainloop()
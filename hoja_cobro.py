@@ -0,0 +1,182 @@
+import argparse
+import csv
+import sys
+from datetime import date
+
+from acumulados import SIN_COBRADOR
+from cartera import calendario, ordinal_fecha
+from dinero import de_centavos
+from metricas import contar, medido
+from saldos import restante
+
+# Hoja de cobro del día: para cada cobrador, los préstamos de sus clientes que
+# tienen algo que cobrar hoy según las cuotas (la misma regla de resta_pago),
+# del más atrasado al menos atrasado. Se arma en una sola pasada por la
+# cartera guardando por préstamo solo unos números; los textos de cada línea
+# se arman al escribir, de a una, en CSV o en texto listo para imprimir
+# (una página por cobrador).
+#
+# El cobrador de un cliente es su campo "cobrador" si lo tiene o, si no,
+# el del último pago que lo anotó.
+#
+# Uso: python hoja_cobro.py [fecha] [--cobrador NOMBRE] [--formato csv|texto] [--salida ruta]
+
+COLUMNAS = ("cobrador", "orden", "cliente", "telefono", "prestamo", "atraso", "cuota_hoy", "a_cobrar",
+            "cuotas_atrasadas")
+LINEAS_POR_PAGINA = 60
+
+
+# Cobrador del cliente: el anotado en el cliente o el del pago más reciente
+# que tenga cobrador
+def cobrador_cliente(cliente):
+    if cliente.get("cobrador"):
+        return cliente["cobrador"]
+    ultimo, cobrador = None, SIN_COBRADOR
+    for prestamo in cliente["prestamos"]:
+        pagos = prestamo["pagos"]
+        # Con el modelo compacto se leen los arreglos directamente
+        if hasattr(pagos, "cobradores"):
+            cobradores = pagos.cobradores or ()
+            for i in range(len(cobradores) - 1, -1, -1):
+                if cobradores[i] is not None:
+                    if ultimo is None or pagos.dias[i] > ultimo:
+                        ultimo, cobrador = pagos.dias[i], cobradores[i]
+                    break
+        else:
+            for pago in reversed(pagos):
+                if pago.get("cobrador"):
+                    if ultimo is None or pago["fecha"] > ultimo:
+                        ultimo, cobrador = pago["fecha"], pago["cobrador"]
+                    break
+    return cobrador
+
+
+# {cobrador: [fila, ...]} con las filas ya ordenadas por prioridad. Cada
+# fila es (cliente_idx, prestamo_idx, atraso, cuota_hoy, cuotas_atrasadas),
+# montos en centavos.
+@medido("hoja_cobro")
+def armar_hojas(datos, hoy=None, cobrador=None):
+    hoy = ordinal_fecha(hoy) if hoy else date.today().toordinal()
+    hojas = {}
+    recorridos = 0
+    for cliente_idx, cliente in enumerate(datos["clientes"]):
+        asignado = None
+        for prestamo_idx, prestamo in enumerate(cliente["prestamos"]):
+            recorridos += 1
+            if restante(prestamo) <= 0:
+                continue
+            try:
+                cuotas = calendario(prestamo)
+            except (KeyError, TypeError, ValueError, OverflowError):
+                continue  # préstamo con datos ilegibles
+            atraso = cuotas.para_estar_al_dia(hoy - 1)
+            cuota_hoy = cuotas.para_estar_al_dia(hoy) - atraso
+            if not atraso and not cuota_hoy:
+                continue
+            if asignado is None:
+                asignado = cobrador_cliente(cliente)
+                if cobrador is not None and asignado != cobrador:
+                    break
+            hojas.setdefault(asignado, []).append(
+                (cliente_idx, prestamo_idx, atraso, cuota_hoy, cuotas.atrasadas(hoy - 1)))
+    contar("hoja_cobro", "registros_recorridos", recorridos)
+    # Primero los de más cuotas atrasadas, después el mayor atraso
+    for filas in hojas.values():
+        filas.sort(key=lambda fila: (-fila[4], -fila[2], -fila[3], fila[0], fila[1]))
+    return dict(sorted(hojas.items()))
+
+# Filas de las hojas como diccionarios, de a una
+def filas_hojas(datos, hojas):
+    clientes = datos["clientes"]
+    for cobrador, filas in hojas.items():
+        for orden, (cliente_idx, prestamo_idx, atraso, cuota_hoy, atrasadas) in enumerate(filas, 1):
+            cliente = clientes[cliente_idx]
+            yield {
+                "cobrador": cobrador,
+                "orden": orden,
+                "cliente": cliente["nombre"].strip(),
+                "telefono": cliente.get("telefono") or "",
+                "prestamo": prestamo_idx,
+                "atraso": de_centavos(atraso),
+                "cuota_hoy": de_centavos(cuota_hoy),
+                "a_cobrar": de_centavos(atraso + cuota_hoy),
+                "cuotas_atrasadas": atrasadas
+            }
+
+
+def escribir_csv(datos, hojas, salida):
+    escritor = csv.DictWriter(salida, fieldnames=COLUMNAS)
+    escritor.writeheader()
+    for fila in filas_hojas(datos, hojas):
+        escritor.writerow(fila)
+
+# Texto de ancho fijo: cada cobrador empieza en una página nueva (\f) y el
+# encabezado se repite cada LINEAS_POR_PAGINA líneas
+def escribir_texto(datos, hojas, salida, fecha):
+    encabezado = (f"{'#':>4}  {'Cliente':<28}{'Teléfono':<14}{'Prést.':>6}{'Atraso':>12}{'Cuota hoy':>12}"
+                  f"{'A cobrar':>12}{'Cuotas':>7}\n" + "-" * 95 + "\n")
+    actual = None
+    lineas = pagina = visitas = 0
+    total = 0.0
+    for fila in filas_hojas(datos, hojas):
+        nuevo = fila["cobrador"] != actual
+        if nuevo or lineas >= LINEAS_POR_PAGINA:
+            if nuevo and actual is not None:
+                _escribir_total(salida, visitas, total)
+            if nuevo:
+                actual, pagina, visitas, total = fila["cobrador"], 0, 0, 0.0
+            if lineas or pagina:
+                salida.write("\f")
+            pagina += 1
+            salida.write(f"HOJA DE COBRO {fecha} - {actual or '(sin cobrador)'} - página {pagina}\n{encabezado}")
+            lineas = 0
+        salida.write(f"{fila['orden']:>4}  {fila['cliente'][:27]:<28}{fila['telefono'][:13]:<14}{fila['prestamo']:>6}"
+                     f"{fila['atraso']:>12,.2f}{fila['cuota_hoy']:>12,.2f}{fila['a_cobrar']:>12,.2f}"
+                     f"{fila['cuotas_atrasadas']:>7}\n")
+        lineas += 1
+        visitas += 1
+        total += fila["a_cobrar"]
+    if actual is not None:
+        _escribir_total(salida, visitas, total)
+
+def _escribir_total(salida, visitas, total):
+    salida.write("-" * 95 + f"\n{visitas:>4}  préstamos a visitar{'':<53}{total:>12,.2f}\n")
+
+# Escribir las hojas del día en un archivo (o en la salida estándar)
+def escribir_hojas(datos, hojas, ruta=None, formato="csv", fecha=None):
+    fecha = fecha or date.today().isoformat()
+    salida = open(ruta, "w", newline="", encoding="utf-8") if ruta else sys.stdout
+    try:
+        if formato == "csv":
+            escribir_csv(datos, hojas, salida)
+        else:
+            escribir_texto(datos, hojas, salida, fecha)
+    finally:
+        if ruta:
+            salida.close()
+
+
+# Resumen para la consola: préstamos y monto a cobrar por cobrador
+def resumen_hojas(hojas):
+    lineas = []
+    for cobrador, filas in hojas.items():
+        total = sum(atraso + cuota_hoy for _, _, atraso, cuota_hoy, _ in filas)
+        lineas.append(f"• {cobrador or '(sin cobrador)'}: {len(filas)} préstamos, ${de_centavos(total):,.2f}")
+    return "\n".join(lineas) or "No hay nada que cobrar ese día."
+
+
+if __name__ == "__main__":
+    from almacenamiento import cargar_datos
+
+    parser = argparse.ArgumentParser(description="Hoja de cobro del día por cobrador")
+    parser.add_argument("fecha", nargs="?", default=date.today().isoformat())
+    parser.add_argument("--cobrador", help="solo la hoja de este cobrador")
+    parser.add_argument("--formato", choices=("csv", "texto"), default="csv")
+    parser.add_argument("--salida", help="archivo de salida (por defecto, la pantalla)")
+    args = parser.parse_args()
+
+    datos = cargar_datos()
+    hojas = armar_hojas(datos, args.fecha, args.cobrador)
+    escribir_hojas(datos, hojas, args.salida, args.formato, args.fecha)
+    if args.salida:
+        print(resumen_hojas(hojas))
@@ -0,0 +1,114 @@
+import csv
+import json
+import os
+import sys
+import time
+
+from almacenamiento import cargar_datos, registrar_eventos
+from dinero import a_centavos, de_centavos, sumar_centavos
+from servicio import NoEncontrado, evento_registrar_pago
+
+# Importación masiva de pagos (la planilla de una ruta de cobro). Cada fila
+# trae cliente (nombre), prestamo (índice), monto, fecha y opcionalmente
+# cobrador, en CSV con encabezado o en JSONL. Las filas se leen de a una, se
+# validan contra el índice de clientes y se registran por lotes: cada lote es
+# una sola escritura en la bitácora. Las filas inválidas se informan con su número de línea y el
+# motivo, sin cortar la importación.
+
+TAMANO_LOTE = 1000
+COLUMNAS = ("cliente", "prestamo", "monto", "fecha")
+
+
+# Líneas del archivo binario como texto, sumando los bytes leídos en leido[0]
+def _lineas(file, leido):
+    for linea in file:
+        leido[0] += len(linea)
+        yield linea.decode("utf-8-sig")
+
+# Filas del archivo como (número de línea, fila); el formato sale de la
+# extensión. Una línea JSONL que no se puede leer llega como texto.
+def leer_filas(ruta, leido=None):
+    leido = leido if leido is not None else [0]
+    with open(ruta, "rb") as file:
+        lineas = _lineas(file, leido)
+        if ruta.lower().endswith(".jsonl"):
+            for numero, linea in enumerate(lineas, 1):
+                if not linea.strip():
+                    continue
+                try:
+                    yield numero, json.loads(linea)
+                except json.JSONDecodeError:
+                    yield numero, linea.strip()
+        else:
+            lector = csv.DictReader(lineas)
+            for fila in lector:
+                yield lector.line_num, fila
+
+# Validar una fila y armar su evento de pago; ValueError dice el motivo
+def evento_de_fila(datos, fila):
+    if not isinstance(fila, dict):
+        raise ValueError("línea con JSON inválido")
+    faltan = [c for c in COLUMNAS if fila.get(c) in (None, "")]
+    if faltan:
+        raise ValueError(f"faltan columnas: {', '.join(faltan)}")
+
+    try:
+        return evento_registrar_pago(datos, fila["cliente"], fila["prestamo"], fila["monto"], fila["fecha"],
+                                     fila.get("cobrador") or None)
+    except NoEncontrado as error:
+        raise ValueError(str(error)) from None
+
+# Importar los pagos de un archivo. avance(fracción) se llama después de cada lote.
+def importar_pagos(ruta, datos=None, tamano_lote=TAMANO_LOTE, avance=None):
+    datos = datos if datos is not None else cargar_datos()
+    inicio = time.perf_counter()
+    tamano_archivo = os.path.getsize(ruta) or 1
+    leido = [0]
+    resultado = {"archivo": ruta, "leidas": 0, "importados": 0, "total": 0, "lotes": 0, "rechazados": []}
+    lote = []
+
+    def registrar_lote():
+        registrar_eventos(lote, datos)
+        resultado["importados"] += len(lote)
+        resultado["total"] = de_centavos(a_centavos(resultado["total"]) + sumar_centavos(e["monto"] for e in lote))
+        resultado["lotes"] += 1
+        lote.clear()
+        if avance:
+            avance(leido[0] / tamano_archivo)
+
+    for numero, fila in leer_filas(ruta, leido):
+        resultado["leidas"] += 1
+        try:
+            lote.append(evento_de_fila(datos, fila))
+        except ValueError as error:
+            resultado["rechazados"].append((numero, str(error)))
+        if len(lote) >= tamano_lote:
+            registrar_lote()
+    if lote:
+        registrar_lote()
+
+    resultado["segundos"] = time.perf_counter() - inicio
+    resultado["filas_por_segundo"] = resultado["leidas"] / resultado["segundos"] if resultado["segundos"] else 0
+    return resultado
+
+# Texto del resultado para la consola y la interfaz gráfica
+def informe_importacion(resultado, max_rechazados=50):
+    lineas = [
+        f"📥 Importación de {resultado['archivo']}",
+        f"✅ Pagos importados: {resultado['importados']} (${resultado['total']:,.2f}) en {resultado['lotes']} lotes",
+        f"❌ Filas rechazadas: {len(resultado['rechazados'])} de {resultado['leidas']}",
+        f"⏱️ {resultado['segundos']:.2f} s ({resultado['filas_por_segundo']:,.0f} filas/s)"
+    ]
+    for numero, motivo in resultado["rechazados"][:max_rechazados]:
+        lineas.append(f"   • Línea {numero}: {motivo}")
+    if len(resultado["rechazados"]) > max_rechazados:
+        lineas.append(f"   ... y {len(resultado['rechazados']) - max_rechazados} más")
+    return "\n".join(lineas)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python importar.py archivo.csv|archivo.jsonl [tamaño_lote]")
+        sys.exit(1)
+    lote = int(sys.argv[2]) if len(sys.argv) > 2 else TAMANO_LOTE
+    print(informe_importacion(importar_pagos(sys.argv[1], tamano_lote=lote)))
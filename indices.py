@@ -0,0 +1,241 @@
+import bisect
+
+from acumulados import Acumulados
+from busqueda import LIMITE_SUGERENCIAS, IndiceBusqueda
+from dinero import sumar
+from metricas import contar, medido
+from modelo import Pagos
+from renganches import Linajes
+from saldos import es_traspaso, restante
+
+# Índices en memoria sobre los datos. No se guardan en database.json: se
+# construyen al primer uso y se mantienen al aplicar cada evento.
+
+
+# Nombre normalizado para comparar clientes ("Carlo " y "carlo" son el mismo)
+def normalizar_nombre(nombre):
+    return nombre.strip().lower()
+
+
+class IndiceClientes:
+    """Nombre normalizado -> posiciones en datos["clientes"]"""
+
+    def __init__(self, clientes):
+        self.clientes = clientes
+        self._posiciones = {}
+        for posicion, cliente in enumerate(clientes):
+            self.agregar(posicion, cliente)
+        contar("indice_clientes", "registros_recorridos", len(clientes))
+
+    def agregar(self, posicion, cliente):
+        self._posiciones.setdefault(normalizar_nombre(cliente["nombre"]), []).append(posicion)
+
+    def posiciones(self, nombre):
+        return self._posiciones.get(normalizar_nombre(nombre), [])
+
+    def buscar(self, nombre):
+        """Devuelve (índice, cliente) o (None, None)"""
+        posiciones = self.posiciones(nombre)
+        if not posiciones:
+            return None, None
+        # Con nombres repetidos se prefiere el escrito igual (sin contar mayúsculas)
+        for posicion in posiciones:
+            if self.clientes[posicion]["nombre"].lower() == nombre.lower():
+                return posicion, self.clientes[posicion]
+        return posiciones[0], self.clientes[posiciones[0]]
+
+    def es_duplicado(self, nombre):
+        return len(self.posiciones(nombre)) > 1
+
+    def duplicados(self):
+        """Nombres normalizados que corresponden a más de un cliente"""
+        return {nombre: posiciones for nombre, posiciones in self._posiciones.items() if len(posiciones) > 1}
+
+
+class IndicePagosPorFecha:
+    """Fecha "YYYY-MM-DD" -> [(cliente_idx, prestamo_idx, pago_idx), ...]"""
+
+    def __init__(self, clientes):
+        self._por_fecha = {}
+        self._fechas = []
+        for cliente_idx, cliente in enumerate(clientes):
+            for prestamo_idx, prestamo in enumerate(cliente["prestamos"]):
+                pagos = prestamo["pagos"]
+                fechas = pagos.fechas() if isinstance(pagos, Pagos) else (p["fecha"] for p in pagos)
+                for pago_idx, fecha in enumerate(fechas):
+                    self.agregar(fecha, (cliente_idx, prestamo_idx, pago_idx))
+                contar("indice_pagos_por_fecha", "registros_recorridos", len(pagos))
+        self._fechas.sort()
+
+    def agregar(self, fecha, referencia):
+        bucket = self._por_fecha.get(fecha)
+        if bucket is None:
+            bucket = self._por_fecha[fecha] = []
+            # Casi siempre la fecha nueva es la más reciente y queda al final
+            if self._fechas and fecha < self._fechas[-1]:
+                bisect.insort(self._fechas, fecha)
+            else:
+                self._fechas.append(fecha)
+        bucket.append(referencia)
+
+    def del_dia(self, fecha):
+        return self._por_fecha.get(fecha, [])
+
+    def entre(self, desde, hasta):
+        """Referencias de los pagos con desde <= fecha <= hasta, por fecha"""
+        inicio = bisect.bisect_left(self._fechas, desde)
+        fin = bisect.bisect_right(self._fechas, hasta)
+        for fecha in self._fechas[inicio:fin]:
+            yield from self._por_fecha[fecha]
+
+
+class Datos(dict):
+    """{"clientes": [...]} con los índices en memoria como atributos"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setdefault("clientes", [])
+        self._indice_clientes = None
+        self._pagos_por_fecha = None
+        self._con_deuda = None
+        self._acumulados = None
+        self._busqueda = None
+        self._linajes = None
+        # Hasta dónde se leyó la persistencia (ver bitacora.sincronizar)
+        self.firma_instantanea = None
+        self.posicion_bitacora = 0
+
+    def reemplazar(self, otros):
+        """Tomar el contenido de otros datos conservando este objeto"""
+        self.clear()
+        self.update(otros)
+        self._indice_clientes = None
+        self._pagos_por_fecha = None
+        self._con_deuda = None
+        self._acumulados = getattr(otros, "_acumulados", None)
+        self._busqueda = None
+        self._linajes = None
+        self.firma_instantanea = getattr(otros, "firma_instantanea", None)
+        self.posicion_bitacora = getattr(otros, "posicion_bitacora", 0)
+
+    @property
+    def indice_clientes(self):
+        if self._indice_clientes is None:
+            self._indice_clientes = IndiceClientes(self["clientes"])
+        return self._indice_clientes
+
+    @property
+    def pagos_por_fecha(self):
+        if self._pagos_por_fecha is None:
+            self._pagos_por_fecha = IndicePagosPorFecha(self["clientes"])
+        return self._pagos_por_fecha
+
+    @property
+    def prestamos_con_deuda(self):
+        """Cantidad de préstamos con saldo pendiente"""
+        if self._con_deuda is None:
+            self._con_deuda = sum(
+                1 for c in self["clientes"] for p in c["prestamos"] if restante(p) > 0)
+        return self._con_deuda
+
+    @property
+    def busqueda(self):
+        """Búsqueda aproximada por nombre y teléfono (ver busqueda.py)"""
+        if self._busqueda is None:
+            self._busqueda = IndiceBusqueda(self["clientes"])
+        return self._busqueda
+
+    @property
+    def linajes(self):
+        """Cadenas de renganches (ver renganches.py)"""
+        if self._linajes is None:
+            self._linajes = Linajes(self["clientes"])
+        return self._linajes
+
+    @property
+    def acumulados(self):
+        """Totales de cobranza por día, semana y cobrador (ver acumulados.py)"""
+        if self._acumulados is None:
+            self._acumulados = Acumulados.construir(self["clientes"])
+        return self._acumulados
+
+    def reconstruir_acumulados(self):
+        self._acumulados = Acumulados.construir(self["clientes"])
+
+    def cliente_agregado(self, posicion, cliente):
+        if self._indice_clientes is not None:
+            self._indice_clientes.agregar(posicion, cliente)
+        if self._busqueda is not None:
+            self._busqueda.agregar(posicion, cliente)
+
+    def prestamo_agregado(self, prestamo):
+        if self._con_deuda is not None and restante(prestamo) > 0:
+            self._con_deuda += 1
+        if self._acumulados is not None:
+            self._acumulados.agregar_prestamo(prestamo)
+
+    def pago_agregado(self, cliente_idx, prestamo_idx, prestamo, restante_anterior):
+        if self._pagos_por_fecha is not None:
+            pago_idx = len(prestamo["pagos"]) - 1
+            self._pagos_por_fecha.agregar(prestamo["pagos"][pago_idx]["fecha"], (cliente_idx, prestamo_idx, pago_idx))
+        if self._con_deuda is not None and restante_anterior > 0 >= restante(prestamo):
+            self._con_deuda -= 1
+        if self._acumulados is not None:
+            self._acumulados.agregar_pago(prestamo["pagos"][-1])
+            if restante_anterior > 0 >= restante(prestamo):
+                self._acumulados.agregar_saldado(prestamo["pagos"][-1])
+
+    def renganche_agregado(self, cliente_idx, padre_idx, hijo_idx):
+        if self._linajes is not None:
+            self._linajes.agregar(cliente_idx, padre_idx, hijo_idx)
+
+
+# Índice de clientes de cualquier diccionario de datos
+def indice_clientes(datos):
+    if isinstance(datos, Datos):
+        return datos.indice_clientes
+    return IndiceClientes(datos["clientes"])
+
+# Buscar un cliente por nombre: devuelve (índice, cliente) o (None, None)
+@medido("buscar_cliente")
+def buscar_cliente(datos, nombre):
+    return indice_clientes(datos).buscar(nombre)
+
+# Clientes parecidos a un nombre o teléfono mal escrito o incompleto:
+# [(índice, cliente, coincidencia)] de mejor a peor
+@medido("sugerir_clientes")
+def sugerir_clientes(datos, texto, limite=LIMITE_SUGERENCIAS):
+    indice = datos.busqueda if isinstance(datos, Datos) else IndiceBusqueda(datos["clientes"])
+    return [(posicion, datos["clientes"][posicion], coincidencia)
+            for posicion, _, coincidencia in indice.buscar(texto, limite)]
+
+# Pagos de un rango de fechas como (cliente, prestamo, pago), leyendo solo
+# los días pedidos del índice por fecha
+def pagos_entre(datos, desde, hasta=None):
+    if isinstance(datos, Datos):
+        indice = datos.pagos_por_fecha
+    else:
+        indice = IndicePagosPorFecha(datos["clientes"])
+    for cliente_idx, prestamo_idx, pago_idx in indice.entre(desde, hasta or desde):
+        cliente = datos["clientes"][cliente_idx]
+        prestamo = cliente["prestamos"][prestamo_idx]
+        yield cliente, prestamo, prestamo["pagos"][pago_idx]
+
+# Totales de pagos de un rango de fechas y préstamos con deuda pendiente
+# (sin los traspasos de saldo de los renganches, que no son dinero cobrado)
+@medido("resumen_pagos")
+def resumen_pagos(datos, desde, hasta=None):
+    pagos = [(cliente["nombre"], pago) for cliente, _, pago in pagos_entre(datos, desde, hasta)
+             if not es_traspaso(pago)]
+    contar("resumen_pagos", "registros_recorridos", len(pagos))
+    if isinstance(datos, Datos):
+        con_deuda = datos.prestamos_con_deuda
+    else:
+        con_deuda = sum(1 for c in datos["clientes"] for p in c["prestamos"] if restante(p) > 0)
+    return {
+        "desde": desde,
+        "hasta": hasta or desde,
+        "total_pagos": sumar(pago["monto"] for _, pago in pagos),
+        "pagos": pagos,
+        "prestamos_con_deuda": con_deuda
+    }
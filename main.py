@@ -1,67 +1,71 @@
-import json
 from datetime import datetime
 
-# Cargar datos desde archivo JSON
-def cargar_datos():
-    try:
-        with open("database.json", "r") as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return {"clientes": []}
-
-# Guardar datos en archivo JSON
-def guardar_datos(datos):
-    with open("database.json", "w") as file:
-        json.dump(datos, file, indent=4)
-
-# Función para calcular mora
-def calcular_mora(dias_atraso, monto_prestamo):
-    if dias_atraso <= 0:
-        return 0
-    tasa_mora = 0.05  # 5% del préstamo original por día de atraso
-    return dias_atraso * tasa_mora * monto_prestamo
+from almacenamiento import cargar_datos, guardar_datos, registrar_evento
+from cartera import atrasados
+from conciliacion import informe_conciliacion
+from diagnostico import informe_diagnostico
+from eventos import evento_cliente, evento_prestamo, evento_pago
+from exportar import exportar, informe_exporte
+from renganches import informe_cadenas
+from hoja_cobro import armar_hojas, escribir_hojas, resumen_hojas
+from importar import importar_pagos, informe_importacion
+from indices import buscar_cliente, indice_clientes, sugerir_clientes
+from saldos import restante
+import servicio
+from servicio import NoEncontrado
+
+# Buscar un cliente por nombre; si ninguno se llama así, ofrecer los
+# parecidos por nombre o teléfono para elegir uno
+def elegir_cliente(datos, texto):
+    cliente_idx, cliente = buscar_cliente(datos, texto)
+    if cliente or not texto.strip():
+        return cliente_idx, cliente
+    sugerencias = sugerir_clientes(datos, texto)
+    if not sugerencias:
+        return None, None
+    print("\n🔎 No hay un cliente con ese nombre. ¿Quisiste decir?")
+    for numero, (_, sugerido, _) in enumerate(sugerencias, 1):
+        print(f"{numero}. {sugerido['nombre']} | Tel: {sugerido.get('telefono') or '-'}")
+    eleccion = input("Número del cliente (Enter para cancelar): ").strip()
+    if eleccion.isdigit() and 1 <= int(eleccion) <= len(sugerencias):
+        cliente_idx, cliente, _ = sugerencias[int(eleccion) - 1]
+        return cliente_idx, cliente
+    return None, None
 
 # Agregar nuevo cliente
 def agregar_cliente(datos):
     nombre = input("Nombre del cliente: ")
     telefono = input("Teléfono: ")
-    cliente = {
-        "nombre": nombre,
-        "telefono": telefono,
-        "prestamos": []
-    }
-    datos["clientes"].append(cliente)
-    guardar_datos(datos)
+    if indice_clientes(datos).posiciones(nombre):
+        print(f"⚠️ Ya existe un cliente llamado '{nombre.strip()}'; se agregará como duplicado.")
+    registrar_evento(evento_cliente(nombre, telefono), datos)
     print(f"✅ Cliente {nombre} agregado.")
 
 # Registrar un préstamo
 def registrar_prestamo(datos):
-    nombre = input("Nombre del cliente: ")
-    cliente = next((c for c in datos["clientes"] if c["nombre"].lower() == nombre.lower()), None)
+    nombre = input("Nombre o teléfono del cliente: ")
+    cliente_idx, cliente = elegir_cliente(datos, nombre)
     if not cliente:
         print("❌ Cliente no encontrado.")
         return
 
     monto = float(input("Monto del préstamo: "))
     plazo_semanas = int(input("Plazo en semanas: "))
-    fecha_inicio = input("Fecha de inicio (YYYY-MM-DD): ")
-
-    prestamo = {
-        "monto_total": monto,
-        "plazo_semanas": plazo_semanas,
-        "fecha_inicio": fecha_inicio,
-        "pagos": [],
-        "renganches": []
-    }
+    try:
+        fecha_inicio = servicio.validar_fecha(input("Fecha de inicio (YYYY-MM-DD): "))
+    except ValueError as error:
+        print(f"❌ {error}.")
+        return
 
-    cliente["prestamos"].append(prestamo)
-    guardar_datos(datos)
-    print(f"✅ Préstamo de ${monto} registrado para {nombre}.")
+    prestamo = registrar_evento(evento_prestamo(cliente_idx, monto, plazo_semanas, fecha_inicio), datos)
+    print(f"✅ Préstamo de ${monto} registrado para {cliente['nombre']}.")
+    if prestamo.get("cuotas") is not None:
+        print(f"📆 {plazo_semanas} cuotas semanales de ${monto / plazo_semanas:,.2f}; la primera vence el {fecha_inicio}.")
 
 # Registrar pago
 def registrar_pago(datos):
-    nombre = input("Nombre del cliente: ").strip()
-    cliente = next((c for c in datos["clientes"] if c["nombre"].lower() == nombre.lower()), None)
+    nombre = input("Nombre o teléfono del cliente: ").strip()
+    cliente_idx, cliente = elegir_cliente(datos, nombre)
     if not cliente or not cliente["prestamos"]:
         print("❌ Cliente o préstamo no encontrado.")
         return
@@ -69,7 +73,7 @@ def registrar_pago(datos):
     # Mostrar préstamos disponibles
     print("\nPréstamos disponibles:")
     for idx, prestamo in enumerate(cliente["prestamos"]):
-        print(f"{idx}. Monto total: ${prestamo['monto_total']} | Pendiente: ${prestamo['monto_total'] - sum(p['monto'] for p in prestamo['pagos'])}")
+        print(f"{idx}. Monto total: ${prestamo['monto_total']} | Pendiente: ${restante(prestamo)}")
 
     # Validar índice del préstamo
     while True:
@@ -83,91 +87,169 @@ def registrar_pago(datos):
             print("❌ Por favor, ingresa un número válido.")
 
     monto_pago = float(input("Monto del pago: "))
-    fecha_pago = input("Fecha del pago (YYYY-MM-DD): ").strip()
-
-    cliente["prestamos"][prestamo_index]["pagos"].append({
-        "monto": monto_pago,
-        "fecha": fecha_pago
-    })
+    try:
+        fecha_pago = servicio.validar_fecha(input("Fecha del pago (YYYY-MM-DD): "))
+    except ValueError as error:
+        print(f"❌ {error}.")
+        return
 
-    guardar_datos(datos)
+    registrar_evento(evento_pago(cliente_idx, prestamo_index, monto_pago, fecha_pago), datos)
     print(f"✅ Pago de ${monto_pago} registrado.")
 
-    guardar_datos(datos)
-    print(f"✅ Pago de ${monto_pago} registrado.")
+# Renganchar un préstamo: su saldo pasa a un préstamo nuevo con crédito nuevo
+def renganchar_prestamo(datos):
+    _, cliente = elegir_cliente(datos, input("Nombre o teléfono del cliente: ").strip())
+    if not cliente or not cliente["prestamos"]:
+        print("❌ Cliente o préstamo no encontrado.")
+        return
 
-    guardar_datos(datos)
-    print(f"✅ Pago de ${monto_pago} registrado.")
+    print("\nPréstamos disponibles:")
+    for idx, prestamo in enumerate(cliente["prestamos"]):
+        if restante(prestamo) > 0 and not prestamo.get("renganches"):
+            print(f"{idx}. Monto total: ${prestamo['monto_total']} | Pendiente: ${restante(prestamo):,.2f}")
 
-# Mostrar resumen de hoy
-def resumen_diario(datos):
-    hoy = datetime.now().strftime("%Y-%m-%d")
-    total_pagos = 0
-    clientes_deudores = 0
+    try:
+        evento = servicio.evento_renganchar(
+            datos, cliente["nombre"], input("Índice del préstamo: "), input("Crédito nuevo: "),
+            input("Plazo en semanas: "), input("Fecha de inicio (YYYY-MM-DD): "))
+    except (ValueError, NoEncontrado) as error:
+        print(f"❌ {error}.")
+        return
 
-    for cliente in datos["clientes"]:
-        for prestamo in cliente["prestamos"]:
-            pagos = sum(p["monto"] for p in prestamo["pagos"] if p["fecha"] == hoy)
-            total_pagos += pagos
-            restante = prestamo["monto_total"] - sum(p["monto"] for p in prestamo["pagos"])
-            if restante > 0:
-                clientes_deudores += 1
+    hijo = registrar_evento(evento, datos)
+    print(f"✅ Renganche registrado: saldo ${hijo['saldo_anterior']:,.2f} + crédito nuevo "
+          f"${evento['monto']:,.2f} = ${hijo['monto_total']:,.2f} en {hijo['plazo_semanas']} semanas.")
+    print(informe_cadenas(servicio.renganches(datos, cliente["nombre"])["cadenas"]))
 
-    print(f"\n📅 Resumen del día {hoy}:")
-    print(f"💰 Total pagado hoy: ${total_pagos}")
-    print(f"👥 Clientes con deudas pendientes: {clientes_deudores}")
+# Fecha para consultar el pasado; Enter es hoy (None)
+def pedir_fecha(texto="Al día (YYYY-MM-DD, Enter para hoy): "):
+    return input(texto).strip() or None
+
+# Mostrar resumen de un día (hoy por defecto)
+def resumen_diario(datos):
+    try:
+        resumen = servicio.resumen_diario(datos, pedir_fecha("Día (YYYY-MM-DD, Enter para hoy): "))
+    except ValueError as error:
+        print(f"❌ {error}.")
+        return
+
+    print(f"\n📅 Resumen del día {resumen['fecha']}:")
+    print(f"💰 Total pagado ese día: ${resumen['total_pagos']}")
+    print(f"👥 Clientes con deudas pendientes: {resumen['prestamos_con_deuda']}")
+    print(f"📊 Saldo de la cartera: ${resumen['saldo_cartera']:,.2f}")
 
 # Mostrar estado de cuenta de un cliente
 def estado_cuenta(datos):
-    nombre = input("Nombre del cliente: ")
-    cliente = next((c for c in datos["clientes"] if c["nombre"].lower() == nombre.lower()), None)
+    nombre = input("Nombre o teléfono del cliente: ")
+    cliente_idx, cliente = elegir_cliente(datos, nombre)
     if not cliente:
         print("❌ Cliente no encontrado.")
         return
 
-    print(f"\n👤 Estado de cuenta de {cliente['nombre']}:")
-    for idx, prestamo in enumerate(cliente["prestamos"]):
-        monto_total = prestamo["monto_total"]
-        pagado = sum(p["monto"] for p in prestamo["pagos"])
-        restante = monto_total - pagado
-        fecha_inicio = datetime.strptime(prestamo["fecha_inicio"], "%Y-%m-%d")
-        dias_transcurridos = (datetime.now() - fecha_inicio).days
-        semanas_transcurridas = dias_transcurridos // 7
-        dias_atraso = max(0, semanas_transcurridas - prestamo["plazo_semanas"])
-        mora = calcular_mora(dias_atraso, monto_total)
-
-
-def resta_pago(datos, nombre, indice_prestamo=None):
-    cliente = next((c for c in datos["clientes"] if c["nombre"].lower() == nombre.lower()), None)
+    try:
+        estado = servicio.estado_cuenta_cliente(cliente, pedir_fecha())
+    except ValueError as error:
+        print(f"❌ {error}.")
+        return
+
+    print(f"\n👤 Estado de cuenta de {cliente['nombre']} al {estado['al']}:")
+    for prestamo in estado["prestamos"]:
+        print(f"{prestamo['prestamo_idx']}. Monto total: ${prestamo['monto_total']:,.2f} | "
+              f"Pagado: ${prestamo['pagado']:,.2f} | Pendiente: ${prestamo['pendiente']:,.2f} | "
+              f"Mora acumulada: ${prestamo['mora']:,.2f}")
+
+
+def resta_pago(datos, nombre, indice_prestamo=None, hoy=None):
+    try:
+        return servicio.resta_pago(datos, nombre, indice_prestamo, hoy)
+    except (ValueError, NoEncontrado) as error:
+        return {"error": str(error)}
+# Pedir cliente y préstamo y mostrar la resta del pago
+def mostrar_resta_pago(datos):
+    _, cliente = elegir_cliente(datos, input("Nombre o teléfono del cliente: ").strip())
     if not cliente:
-        return {"error": "Cliente no encontrado"}
-
-    if indice_prestamo is None or indice_prestamo >= len(cliente["prestamos"]) or indice_prestamo < 0:
-        return {"error": "Índice inválido"}
-
-    prestamo = cliente["prestamos"][indice_prestamo]
-
-    monto_total = prestamo["monto_total"]
-    pagado = sum(p["monto"] for p in prestamo["pagos"])
-    restante = monto_total - pagado
-
-    fecha_inicio = datetime.strptime(prestamo["fecha_inicio"], "%Y-%m-%d")
-    dias_transcurridos = (datetime.now() - fecha_inicio).days
-    semanas_transcurridas = dias_transcurridos // 7 + 1
-    pago_semanal = monto_total / prestamo["plazo_semanas"]
-
-    deberia_haber_pagado = pago_semanal * semanas_transcurridas
-    faltante_segun_plazo = max(0, deberia_haber_pagado - pagado)
-
-    return {
-        "cliente": nombre,
-        "prestamo_idx": indice_prestamo,
-        "monto_total": monto_total,
-        "pagado": pagado,
-        "restante": restante,
-        "deberia_haber_pagado": deberia_haber_pagado,
-        "faltante_segun_plazo": faltante_segun_plazo
-    }
+        print("❌ Cliente no encontrado.")
+        return
+    nombre = cliente["nombre"]
+    try:
+        indice = int(input("Índice del préstamo: "))
+    except ValueError:
+        print("❌ Por favor, ingresa un número válido.")
+        return
+    resultado = resta_pago(datos, nombre, indice, pedir_fecha())
+    if "error" in resultado:
+        print(f"❌ {resultado['error']}.")
+        return
+    print(f"\n📊 Préstamo #{indice + 1} de {resultado['cliente']}:")
+    print(f"💰 Pagado: ${resultado['pagado']:,.2f} | Restante: ${resultado['restante']:,.2f}")
+    print(f"📈 Debería haber pagado: ${resultado['deberia_haber_pagado']:,.2f}")
+    print(f"⚠️ Faltante según plazo: ${resultado['faltante_segun_plazo']:,.2f} "
+          f"({resultado['cuotas_atrasadas']} cuotas atrasadas)")
+    proxima = resultado["proxima_cuota"]
+    if proxima:
+        print(f"📆 Próxima cuota: #{proxima['numero']}, vence el {proxima['vence']} (faltan ${proxima['falta']:,.2f})")
+
+# Mostrar los préstamos atrasados de toda la cartera
+def mostrar_atrasados(datos):
+    lista = atrasados(datos)
+    print(f"\n⚠️ Préstamos atrasados: {len(lista)}")
+    for fila in lista:
+        print(f"• {fila['cliente']} (préstamo {fila['prestamo_idx']}): "
+              f"faltan ${fila['faltante_segun_plazo']:,.2f} | restante ${fila['restante']:,.2f}")
+
+# Importar los pagos de una ruta desde un archivo CSV o JSONL
+def importar_pagos_archivo(datos):
+    ruta = input("Archivo de pagos (.csv o .jsonl): ").strip()
+    try:
+        resultado = importar_pagos(ruta, datos)
+    except OSError as error:
+        print(f"❌ No se pudo leer el archivo: {error}")
+        return
+    print(informe_importacion(resultado))
+
+# Escribir la hoja de cobro de un día, por cobrador, en CSV o texto
+def generar_hoja_cobro(datos):
+    fecha = input("Fecha (YYYY-MM-DD, Enter para hoy): ").strip() or datetime.now().strftime("%Y-%m-%d")
+    formato = "texto" if input("Formato (csv/texto) [csv]: ").strip().lower() == "texto" else "csv"
+    ruta = f"hoja_cobro_{fecha}.{'txt' if formato == 'texto' else 'csv'}"
+    try:
+        hojas = armar_hojas(datos, fecha)
+    except ValueError:
+        print("❌ Fecha inválida.")
+        return
+    escribir_hojas(datos, hojas, ruta, formato, fecha)
+    print(f"✅ Hoja de cobro guardada en {ruta}")
+    print(resumen_hojas(hojas))
+
+# Exportar toda la cartera (por cliente o por préstamo) a CSV o JSONL
+def exportar_cartera(datos):
+    tipo = "prestamos" if input("Una fila por (clientes/prestamos) [clientes]: ").strip().lower() == "prestamos" \
+        else "clientes"
+    ruta = input(f"Archivo (.csv o .jsonl) [{tipo}.csv]: ").strip() or f"{tipo}.csv"
+    try:
+        totales = exportar(datos, ruta, tipo)
+    except OSError as error:
+        print(f"❌ No se pudo escribir el archivo: {error}")
+        return
+    print(informe_exporte(totales))
+
+# Conciliar la cobranza de un período contra los totales y, si hay, la caja
+def conciliar_cobranza(datos):
+    hoy = datetime.now().strftime("%Y-%m-%d")
+    desde = input(f"Desde (YYYY-MM-DD) [{hoy}]: ").strip() or hoy
+    hasta = input(f"Hasta (YYYY-MM-DD) [{desde}]: ").strip() or desde
+    por = "cobrador" if input("¿Por cobrador? (s/n) [n]: ").strip().lower() == "s" else "dia"
+    caja = input("Archivo de caja (.csv o .jsonl, Enter para omitir): ").strip() or None
+    try:
+        resultado = servicio.conciliacion(datos, desde, hasta, por, caja)
+    except ValueError as error:
+        print(f"❌ {error}.")
+        return
+    except OSError as error:
+        print(f"❌ No se pudo leer el archivo: {error}")
+        return
+    print(informe_conciliacion(resultado))
+
 # Menú principal
 def menu():
     datos = cargar_datos()
@@ -179,7 +261,14 @@ def menu():
         print("4. Estado de cuenta")
         print("5. Resta del pago")
         print("6. Resumen del día")
-        print("7. Salir")
+        print("7. Clientes atrasados")
+        print("8. Importar pagos")
+        print("9. Diagnóstico")
+        print("10. Hoja de cobro")
+        print("11. Renganchar préstamo")
+        print("12. Exportar cartera")
+        print("13. Conciliación")
+        print("14. Salir")
         opcion = input("Selecciona una opción: ")
 
         if opcion == "1":
@@ -191,10 +280,25 @@ def menu():
         elif opcion == "4":
              estado_cuenta (datos)
         elif opcion == "5":
-            resta_pago(datos)
+            mostrar_resta_pago(datos)
         elif opcion == "6":
             resumen_diario(datos)    
         elif opcion == "7":
+            mostrar_atrasados(datos)
+        elif opcion == "8":
+            importar_pagos_archivo(datos)
+        elif opcion == "9":
+            print(informe_diagnostico(datos))
+        elif opcion == "10":
+            generar_hoja_cobro(datos)
+        elif opcion == "11":
+            renganchar_prestamo(datos)
+        elif opcion == "12":
+            exportar_cartera(datos)
+        elif opcion == "13":
+            conciliar_cobranza(datos)
+        elif opcion == "14":
+            guardar_datos(datos)
             print("👋 Saliendo...")
             break
         else:
@@ -0,0 +1,213 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from functools import wraps
+
+# Mediciones de las operaciones del programa: cuántas veces se llamó cada una,
+# cuánto tardó (histograma de latencias en milisegundos) y contadores propios
+# como bytes leídos o escritos y registros recorridos. Las funciones se
+# marcan con @medido("nombre") y suman contadores con contar(). Todo queda en
+# memoria del proceso; la vista de Diagnóstico lo muestra (diagnostico.py).
+#
+# Con PRESTAMOS_PERFIL=1 (o activar_perfil()) además se perfilan las
+# operaciones medidas con cProfile y se siguen las asignaciones de memoria con
+# tracemalloc. Es bastante más lento: solo para buscar un problema.
+
+LIMITES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Metrica:
+    """Latencias y contadores acumulados de una operación"""
+
+    __slots__ = ("llamadas", "total", "minimo", "maximo", "histograma", "contadores")
+
+    def __init__(self):
+        self.llamadas = 0
+        self.total = 0.0
+        self.minimo = None
+        self.maximo = 0.0
+        # histograma[i]: llamadas de hasta LIMITES_MS[i] ms; la última, más lentas
+        self.histograma = [0] * (len(LIMITES_MS) + 1)
+        self.contadores = {}
+
+    def registrar(self, segundos):
+        self.llamadas += 1
+        self.total += segundos
+        self.minimo = segundos if self.minimo is None else min(self.minimo, segundos)
+        self.maximo = max(self.maximo, segundos)
+        self.histograma[bisect_left(LIMITES_MS, segundos * 1000)] += 1
+
+    def percentil(self, fraccion):
+        """Límite en ms del balde donde cae el percentil; en el balde de
+        las más lentas se informa el máximo"""
+        objetivo = fraccion * self.llamadas
+        acumulado = 0
+        for limite, cantidad in zip(LIMITES_MS, self.histograma):
+            acumulado += cantidad
+            if cantidad and acumulado >= objetivo:
+                return limite
+        return self.maximo * 1000
+
+    def a_json(self):
+        return {
+            "llamadas": self.llamadas,
+            "total_ms": self.total * 1000,
+            "media_ms": self.total * 1000 / self.llamadas if self.llamadas else 0.0,
+            "min_ms": (self.minimo or 0.0) * 1000,
+            "max_ms": self.maximo * 1000,
+            "p50_ms": self.percentil(0.5) if self.llamadas else 0.0,
+            "p95_ms": self.percentil(0.95) if self.llamadas else 0.0,
+            "histograma": dict(zip([f"<={limite}ms" for limite in LIMITES_MS] + [f">{LIMITES_MS[-1]}ms"],
+                                   self.histograma)),
+            **self.contadores
+        }
+
+
+_metricas = {}
+_candado = threading.Lock()
+
+
+def _metrica(nombre):
+    metrica = _metricas.get(nombre)
+    if metrica is None:
+        metrica = _metricas.setdefault(nombre, Metrica())
+    return metrica
+
+def registrar(nombre, segundos):
+    with _candado:
+        _metrica(nombre).registrar(segundos)
+
+# Sumar a un contador de la operación (bytes_leidos, registros_recorridos, ...)
+def contar(nombre, clave, cantidad=1):
+    with _candado:
+        contadores = _metrica(nombre).contadores
+        contadores[clave] = contadores.get(clave, 0) + cantidad
+
+
+class medir:
+    """with medir("nombre"): ...  mide el bloque (y lo perfila si está activo)"""
+
+    __slots__ = ("nombre", "inicio", "perfilando")
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.perfilando = _iniciar_perfil()
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        segundos = time.perf_counter() - self.inicio
+        if self.perfilando:
+            _detener_perfil()
+        registrar(self.nombre, segundos)
+        return False
+
+# Decorador: @medido("cargar_datos")
+def medido(nombre):
+    def decorador(funcion):
+        @wraps(funcion)
+        def medida(*args, **kwargs):
+            with medir(nombre):
+                return funcion(*args, **kwargs)
+        return medida
+    return decorador
+
+# Copia de las métricas como {nombre: {...}}, ordenadas por tiempo total
+def estadisticas():
+    with _candado:
+        copia = {nombre: metrica.a_json() for nombre, metrica in _metricas.items()}
+    return dict(sorted(copia.items(), key=lambda item: -item[1]["total_ms"]))
+
+def reiniciar():
+    with _candado:
+        _metricas.clear()
+
+def informe():
+    filas = estadisticas()
+    if not filas:
+        return "Todavía no se midió ninguna operación."
+    lineas = [f"{'Operación':<24}{'Llamadas':>9}{'Media ms':>11}{'p50 ms':>9}{'p95 ms':>9}{'Máx ms':>10}"]
+    for nombre, fila in filas.items():
+        if fila["llamadas"]:
+            lineas.append(f"{nombre:<24}{fila['llamadas']:>9}{fila['media_ms']:>11.2f}{fila['p50_ms']:>9.0f}"
+                          f"{fila['p95_ms']:>9.0f}{fila['max_ms']:>10.1f}")
+        else:  # solo contadores
+            lineas.append(nombre)
+        contadores = [f"{clave}={valor:,}" for clave, valor in fila.items() if clave not in _CAMPOS_FIJOS]
+        if contadores:
+            lineas.append(" " * 4 + "  ".join(contadores))
+    return "\n".join(lineas)
+
+_CAMPOS_FIJOS = set(Metrica().a_json())
+
+
+# Perfil opcional. Un solo cProfile para todo el proceso: se enciende en la
+# operación medida más externa de un hilo y, si otro hilo ya lo tiene, esa
+# operación solo se cronometra.
+_perfil = None
+_candado_perfil = threading.Lock()
+_local = threading.local()
+
+
+def perfil_activo():
+    return _perfil is not None
+
+def activar_perfil():
+    global _perfil
+    if _perfil is None:
+        _perfil = cProfile.Profile()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+def desactivar_perfil():
+    global _perfil
+    _perfil = None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def _iniciar_perfil():
+    perfil = _perfil
+    if perfil is None or getattr(_local, "perfil", None) is not None:
+        return False
+    if not _candado_perfil.acquire(blocking=False):
+        return False
+    try:
+        perfil.enable()
+    except ValueError:  # otra herramienta de perfilado ya está activa
+        _candado_perfil.release()
+        return False
+    # Se guarda el que se encendió: _perfil puede desactivarse mientras tanto
+    _local.perfil = perfil
+    return True
+
+def _detener_perfil():
+    _local.perfil.disable()
+    _local.perfil = None
+    _candado_perfil.release()
+
+def informe_perfil(limite=15):
+    if _perfil is None:
+        return "Perfil desactivado (iniciar con PRESTAMOS_PERFIL=1)."
+    salida = io.StringIO()
+    with _candado_perfil:
+        try:
+            pstats.Stats(_perfil, stream=salida).sort_stats("cumulative").print_stats(limite)
+        except TypeError:  # todavía no se perfiló nada
+            salida.write("Sin datos de perfil todavía.\n")
+    if tracemalloc.is_tracing():
+        actual, pico = tracemalloc.get_traced_memory()
+        salida.write(f"\nMemoria seguida: {actual / 2**20:.1f} MB (pico {pico / 2**20:.1f} MB)\n")
+        for estadistica in tracemalloc.take_snapshot().statistics("lineno")[:limite]:
+            salida.write(f"{estadistica}\n")
+    return salida.getvalue()
+
+
+if os.environ.get("PRESTAMOS_PERFIL") == "1":
+    activar_perfil()
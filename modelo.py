@@ -0,0 +1,252 @@
+import sys
+from array import array
+from collections.abc import MutableMapping
+from datetime import date
+from functools import lru_cache
+
+from cartera import ordinal_fecha
+from cuotas import Cuotas
+from dinero import a_centavos, de_centavos
+
+# Modelo compacto en memoria. Clientes y préstamos son objetos con __slots__
+# que se usan igual que los diccionarios de siempre (cliente["nombre"],
+# prestamo.get("mora"), ...), y los pagos de un préstamo se guardan en dos
+# arreglos paralelos: monto en centavos y fecha como día ordinal. Con un
+# millón de pagos eso son unos 12 bytes por pago en vez de un diccionario con
+# un float y un texto. El cobrador (opcional) va en una lista aparte que solo
+# existe si algún pago lo tiene, con los nombres compartidos (sys.intern).
+#
+# database.json no cambia: a_json() devuelve los mismos diccionarios, y los
+# valores que no se pueden representar así (un monto con fracción de centavo,
+# una fecha mal escrita) se guardan aparte tal como venían.
+
+
+@lru_cache(maxsize=None)
+def fecha_de_ordinal(dia):
+    return date.fromordinal(dia).isoformat()
+
+
+class Registro(MutableMapping):
+    """Objeto con __slots__ que se comporta como diccionario. Las claves de
+    CAMPOS van en slots; cualquier otra, en el diccionario "extra"."""
+
+    __slots__ = ("extra",)
+    CAMPOS = ()
+
+    def __init__(self, valores=()):
+        self.extra = None
+        for clave, valor in dict(valores).items():
+            self[clave] = valor
+
+    def __getitem__(self, clave):
+        if clave in self.CAMPOS:
+            try:
+                return getattr(self, clave)
+            except AttributeError:
+                raise KeyError(clave) from None
+        if self.extra is None:
+            raise KeyError(clave)
+        return self.extra[clave]
+
+    def __setitem__(self, clave, valor):
+        if clave in self.CAMPOS:
+            setattr(self, clave, valor)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[clave] = valor
+
+    def __delitem__(self, clave):
+        if clave in self.CAMPOS:
+            try:
+                delattr(self, clave)
+            except AttributeError:
+                raise KeyError(clave) from None
+        elif self.extra is None:
+            raise KeyError(clave)
+        else:
+            del self.extra[clave]
+
+    def __iter__(self):
+        for clave in self.CAMPOS:
+            if hasattr(self, clave):
+                yield clave
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+    def a_json(self):
+        return {clave: a_json(valor) for clave, valor in self.items()}
+
+
+class Pago(Registro):
+    __slots__ = ("monto", "fecha", "cobrador")
+    CAMPOS = ("monto", "fecha", "cobrador")
+
+
+class Pagos:
+    """Lista de pagos en arreglos paralelos: pagos[i] devuelve un Pago"""
+
+    __slots__ = ("centavos", "dias", "cobradores", "originales")
+
+    def __init__(self, pagos=()):
+        self.centavos = array("q")
+        self.dias = array("l")
+        # None mientras ningún pago tenga cobrador; después, uno por pago
+        self.cobradores = None
+        # posición -> claves que no entran en los arreglos (valores originales)
+        self.originales = None
+        self.extend(pagos)
+
+    def extend(self, pagos):
+        centavos, dias = self.centavos, self.dias
+        for pago in pagos:
+            # Caso común: monto y fecha representables sin pérdida y, como
+            # mucho, el nombre del cobrador
+            try:
+                monto, fecha = pago["monto"], pago["fecha"]
+                c, d = a_centavos(monto), ordinal_fecha(fecha)
+                cobrador = pago.get("cobrador") if len(pago) == 3 else None
+                exacto = ((len(pago) == 2 or isinstance(cobrador, str))
+                          and de_centavos(c) == monto and fecha_de_ordinal(d) == fecha)
+            except (KeyError, TypeError, ValueError, OverflowError):
+                exacto = False
+            if exacto:
+                centavos.append(c)
+                dias.append(d)
+                if cobrador is not None or self.cobradores is not None:
+                    self._anotar_cobrador(cobrador)
+            else:
+                self.append(pago)
+
+    def _anotar_cobrador(self, cobrador):
+        """Cobrador del pago recién agregado a los arreglos"""
+        if self.cobradores is None:
+            if cobrador is None:
+                return
+            self.cobradores = [None] * (len(self.centavos) - 1)
+        self.cobradores.append(None if cobrador is None else sys.intern(cobrador))
+
+    def append(self, pago):
+        aparte = {k: v for k, v in pago.items() if k not in Pago.CAMPOS}
+        cobrador = pago.get("cobrador")
+        if cobrador is not None and not isinstance(cobrador, str):
+            aparte["cobrador"] = cobrador
+            cobrador = None
+        monto, fecha = pago["monto"], pago["fecha"]
+        try:
+            centavos = a_centavos(monto)
+            if de_centavos(centavos) != monto:
+                aparte["monto"] = monto
+        except (TypeError, ValueError, OverflowError):
+            centavos = 0
+            aparte["monto"] = monto
+        try:
+            dia = ordinal_fecha(fecha)
+            if fecha_de_ordinal(dia) != fecha:
+                aparte["fecha"] = fecha
+        except (TypeError, ValueError):
+            dia = 0
+            aparte["fecha"] = fecha
+        self.centavos.append(centavos)
+        self.dias.append(dia)
+        self._anotar_cobrador(cobrador)
+        if aparte:
+            if self.originales is None:
+                self.originales = {}
+            self.originales[len(self.centavos) - 1] = aparte
+
+    def __len__(self):
+        return len(self.centavos)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        pago = Pago()
+        pago.monto = de_centavos(self.centavos[i])
+        pago.fecha = fecha_de_ordinal(self.dias[i]) if self.dias[i] else None
+        if self.cobradores and self.cobradores[i] is not None:
+            pago.cobrador = self.cobradores[i]
+        if self.originales and i in self.originales:
+            for clave, valor in self.originales[i].items():
+                pago[clave] = valor
+        return pago
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __eq__(self, otro):
+        return list(self) == list(otro)
+
+    def exactos(self):
+        """True si todos los montos y fechas están en los arreglos"""
+        return not self.originales or not any(
+            "monto" in o or "fecha" in o for o in self.originales.values())
+
+    def total_centavos(self):
+        return sum(self.centavos)
+
+    def totales(self):
+        """(pagado, num_pagos, ultimo_pago) desde los arreglos, o None si
+        algún pago guardó su valor original aparte"""
+        if not self.exactos():
+            return None
+        ultimo = fecha_de_ordinal(max(self.dias)) if self.dias else None
+        return de_centavos(self.total_centavos()), len(self), ultimo
+
+    def fechas(self):
+        """Fecha "YYYY-MM-DD" de cada pago, sin armar los Pago"""
+        if self.exactos():
+            return [fecha_de_ordinal(dia) for dia in self.dias]
+        return [pago["fecha"] for pago in self]
+
+    def a_json(self):
+        pagos = [{"monto": de_centavos(c), "fecha": fecha_de_ordinal(d) if d else None}
+                 for c, d in zip(self.centavos, self.dias)]
+        for i, cobrador in enumerate(self.cobradores or ()):
+            if cobrador is not None:
+                pagos[i]["cobrador"] = cobrador
+        for i, originales in (self.originales or {}).items():
+            pagos[i].update(originales)
+        return pagos
+
+
+class Prestamo(Registro):
+    __slots__ = ("monto_total", "plazo_semanas", "fecha_inicio", "pagos", "renganches",
+                 "pagado", "num_pagos", "ultimo_pago", "cuotas")
+    CAMPOS = __slots__
+
+    def __setitem__(self, clave, valor):
+        if clave == "pagos" and not isinstance(valor, Pagos):
+            valor = Pagos(valor)
+        elif clave == "cuotas" and isinstance(valor, list):
+            valor = Cuotas.de_json(valor)
+        super().__setitem__(clave, valor)
+
+
+class Cliente(Registro):
+    __slots__ = ("nombre", "telefono", "prestamos")
+    CAMPOS = __slots__
+
+    def __setitem__(self, clave, valor):
+        if clave == "prestamos":
+            valor = [p if isinstance(p, Prestamo) else Prestamo(p) for p in valor]
+        super().__setitem__(clave, valor)
+
+
+# Objeto del modelo (o lista de ellos) como diccionarios y listas comunes;
+# también sirve como json.dump(..., default=a_json)
+def a_json(objeto):
+    if isinstance(objeto, (Registro, Pagos, Cuotas)):
+        return objeto.a_json()
+    if isinstance(objeto, list) and objeto and isinstance(objeto[0], Registro):
+        return [a_json(elemento) for elemento in objeto]
+    return objeto
@@ -0,0 +1,90 @@
+import sys
+from datetime import date
+
+from almacenamiento import cargar_datos, registrar_evento
+from cartera import Cartera, np, ordinal_fecha
+from dinero import a_centavos, de_centavos, sumar
+from eventos import evento_mora
+
+# Mora (recargo por atraso). La mora de un préstamo a una fecha es
+# calcular_mora(dias_atraso, monto_total), con el mismo atraso que usa
+# estado_cuenta. La corrida nocturna (acumular_mora) carga a cada préstamo
+# vencido la diferencia entre esa mora y la que ya tiene cargada, y lo deja
+# registrado en un solo evento. datos["mora_hasta"] guarda la última fecha
+# procesada: repetir la corrida para esa fecha no vuelve a cobrar.
+
+TASA_MORA = 0.05  # 5% del préstamo original por día de atraso
+
+
+# Función para calcular mora
+def calcular_mora(dias_atraso, monto_prestamo):
+    if dias_atraso <= 0:
+        return 0
+    return dias_atraso * TASA_MORA * monto_prestamo
+
+# Atraso de un préstamo a una fecha (ordinal), como en estado_cuenta
+def dias_atraso(prestamo, hoy_ordinal):
+    semanas_transcurridas = (hoy_ordinal - ordinal_fecha(prestamo["fecha_inicio"])) // 7
+    return max(0, semanas_transcurridas - prestamo["plazo_semanas"])
+
+def mora_a_la_fecha(prestamo, hoy_ordinal):
+    return calcular_mora(dias_atraso(prestamo, hoy_ordinal), prestamo["monto_total"])
+
+def mora_cargada(prestamo):
+    return prestamo.get("mora", 0)
+
+# Mora cargada hasta una fecha "YYYY-MM-DD", inclusive
+def mora_al(prestamo, fecha):
+    return sumar(cargo["monto"] for cargo in prestamo.get("cargos_mora", ()) if cargo["fecha"] <= fecha)
+
+
+# Cargos pendientes a una fecha: [[cliente_idx, prestamo_idx, monto], ...]
+# para los préstamos con saldo a esa fecha cuya mora supera la ya cargada
+def calcular_cargos(datos, fecha):
+    hoy = ordinal_fecha(fecha)
+    cartera = Cartera(datos, hoy)
+    if not len(cartera):
+        return []
+    # Mora y cargos en centavos, como los saldos: la mora a la fecha se
+    # redondea a centavos (a_centavos) y el cargo es la resta entera
+    cargadas = [a_centavos(mora_cargada(datos["clientes"][c]["prestamos"][p])) for c, p in cartera.referencias]
+
+    if np is not None:
+        semanas = (hoy - cartera.inicio) // 7
+        atraso = np.maximum(0, semanas - cartera.plazo_semanas)
+        # np.rint redondea igual que round() en a_centavos
+        mora = np.rint(atraso * TASA_MORA * de_centavos(cartera.monto_total) * 100).astype(np.int64)
+        cargo = mora - np.array(cargadas, dtype=np.int64)
+        restante = cartera.monto_total - cartera.pagado
+        filas = np.flatnonzero((cargo > 0) & (restante > 0)).tolist()
+        cargos = cargo.tolist()
+    else:
+        filas, cargos = [], []
+        for i, (monto, plazo, inicio, pagado_prestamo) in enumerate(zip(
+                cartera.monto_total, cartera.plazo_semanas, cartera.inicio, cartera.pagado)):
+            atraso = max(0, (hoy - inicio) // 7 - plazo)
+            cargos.append(a_centavos(calcular_mora(atraso, de_centavos(monto))) - cargadas[i])
+            if cargos[i] > 0 and monto - pagado_prestamo > 0:
+                filas.append(i)
+
+    return [[*cartera.referencias[i], de_centavos(cargos[i])] for i in filas]
+
+# Corrida de mora hasta una fecha. Devuelve el evento registrado o None si
+# esa fecha ya estaba procesada.
+def acumular_mora(datos, fecha=None):
+    fecha = fecha or date.today().isoformat()
+    if datos.get("mora_hasta") and datos["mora_hasta"] >= fecha:
+        return None
+    evento = evento_mora(fecha, calcular_cargos(datos, fecha))
+    registrar_evento(evento, datos)
+    return evento
+
+
+if __name__ == "__main__":
+    fecha = sys.argv[1] if len(sys.argv) > 1 else None
+    evento = acumular_mora(cargar_datos(), fecha)
+    if evento is None:
+        print("✅ La mora de esa fecha ya estaba acumulada.")
+    else:
+        total = sumar(monto for _, _, monto in evento["cargos"])
+        print(f"✅ Mora al {evento['fecha']}: {len(evento['cargos'])} préstamos, ${total:,.2f}")
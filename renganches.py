@@ -0,0 +1,146 @@
+import sys
+
+from dinero import a_centavos, de_centavos, sumar, sumar_centavos
+from metricas import contar, medido
+from saldos import pagado_centavos, restante_centavos
+
+# Renganches: un préstamo con saldo se cierra pasando ese saldo a un préstamo
+# nuevo que además suma crédito nuevo (ver eventos.evento_renganche). El hijo
+# guarda "renganche_de" (índice del padre) y "saldo_anterior"; el padre anota
+# el índice del hijo en "renganches" y recibe un pago de traspaso por el saldo.
+#
+# Un préstamo que se rengancha varias veces forma una cadena. El índice de
+# linajes guarda, para cada préstamo de una cadena, la raíz, y para cada raíz
+# los préstamos en orden; se arma una vez recorriendo la cartera y se mantiene
+# con cada renganche, así recorrer las cadenas de un cliente o de toda la
+# cartera lee solo los préstamos renganchados.
+#
+# Por cadena:
+#   credito     crédito nuevo otorgado: el primer préstamo más lo nuevo de
+#               cada renganche (monto_total - saldo_anterior)
+#   cobrado     dinero cobrado en toda la cadena, sin los traspasos
+#   exposicion  saldo abierto de la cadena (el del último préstamo)
+#   rendimiento cobrado / credito: qué parte del crédito ya volvió en efectivo
+# Los montos de los préstamos ya incluyen el cargo del préstamo (no hay un
+# capital aparte), así que el rendimiento se mide sobre monto_total.
+#
+# Uso: python renganches.py [cliente]    cadenas de un cliente o de toda la cartera
+
+
+class Linajes:
+    """(cliente_idx, préstamo) -> raíz de su cadena y raíz -> préstamos de la cadena"""
+
+    def __init__(self, clientes):
+        self._raices = {}      # (cliente_idx, prestamo_idx) -> prestamo_idx raíz
+        self._cadenas = {}     # (cliente_idx, raíz) -> [prestamo_idx, ...] en orden
+        self._por_cliente = {}  # cliente_idx -> [raíz, ...]
+        recorridos = 0
+        for cliente_idx, cliente in enumerate(clientes):
+            for prestamo_idx, prestamo in enumerate(cliente["prestamos"]):
+                recorridos += 1
+                padre = prestamo.get("renganche_de")
+                if padre is not None:
+                    self.agregar(cliente_idx, padre, prestamo_idx)
+        contar("linajes", "registros_recorridos", recorridos)
+
+    def agregar(self, cliente_idx, padre_idx, hijo_idx):
+        raiz = self._raices.get((cliente_idx, padre_idx))
+        if raiz is None:
+            raiz = self._raices[(cliente_idx, padre_idx)] = padre_idx
+            self._cadenas[(cliente_idx, raiz)] = [padre_idx]
+            self._por_cliente.setdefault(cliente_idx, []).append(raiz)
+        self._raices[(cliente_idx, hijo_idx)] = raiz
+        self._cadenas[(cliente_idx, raiz)].append(hijo_idx)
+
+    def cadena(self, cliente_idx, prestamo_idx):
+        """Préstamos de la cadena de un préstamo, de la raíz al último"""
+        raiz = self._raices.get((cliente_idx, prestamo_idx))
+        return list(self._cadenas[(cliente_idx, raiz)]) if raiz is not None else [prestamo_idx]
+
+    def raices(self, cliente_idx):
+        return list(self._por_cliente.get(cliente_idx, ()))
+
+    def __iter__(self):
+        """(cliente_idx, [prestamo_idx, ...]) de cada cadena"""
+        for (cliente_idx, _), cadena in self._cadenas.items():
+            yield cliente_idx, cadena
+
+    def __len__(self):
+        return len(self._cadenas)
+
+
+# Índice de linajes de cualquier diccionario de datos
+def linajes(datos):
+    if hasattr(datos, "linajes"):
+        return datos.linajes
+    return Linajes(datos["clientes"])
+
+# Totales de una cadena de préstamos de un cliente
+def resumen_cadena(cliente, cadena):
+    prestamos = [cliente["prestamos"][i] for i in cadena]
+    traspasado = [a_centavos(p.get("saldo_anterior", 0)) for p in prestamos]
+    credito = sum(a_centavos(p["monto_total"]) for p in prestamos) - sum(traspasado)
+    # Lo traspasado entre préstamos de la cadena es el saldo_anterior de cada hijo
+    cobrado = sum(pagado_centavos(p) for p in prestamos) - sum(traspasado[1:])
+    exposicion = sum(max(0, restante_centavos(p)) for p in prestamos)
+    return {
+        "cliente": cliente["nombre"],
+        "prestamos": list(cadena),
+        "renganches": len(cadena) - 1,
+        "desde": prestamos[0]["fecha_inicio"],
+        "credito": de_centavos(credito),
+        "cobrado": de_centavos(cobrado),
+        "exposicion": de_centavos(exposicion),
+        "rendimiento": round(cobrado / credito, 4) if credito else None
+    }
+
+# Cadenas de un cliente
+def cadenas_cliente(datos, cliente_idx):
+    cliente = datos["clientes"][cliente_idx]
+    indice = linajes(datos)
+    return [resumen_cadena(cliente, indice.cadena(cliente_idx, raiz)) for raiz in indice.raices(cliente_idx)]
+
+# Cadenas de toda la cartera, de la de mayor exposición a la menor, y sus totales
+@medido("cadenas_renganches")
+def cadenas_cartera(datos):
+    cadenas = [resumen_cadena(datos["clientes"][cliente_idx], cadena)
+               for cliente_idx, cadena in linajes(datos)]
+    cadenas.sort(key=lambda c: (-c["exposicion"], c["cliente"]))
+    credito = sumar_centavos(c["credito"] for c in cadenas)
+    cobrado = sumar_centavos(c["cobrado"] for c in cadenas)
+    return {
+        "cadenas": cadenas,
+        "credito": de_centavos(credito),
+        "cobrado": de_centavos(cobrado),
+        "exposicion": sumar(c["exposicion"] for c in cadenas),
+        "rendimiento": round(cobrado / credito, 4) if credito else None
+    }
+
+
+# Líneas de consola para una lista de cadenas
+def informe_cadenas(cadenas):
+    lineas = []
+    for c in cadenas:
+        rendimiento = f"{c['rendimiento']:.1%}" if c["rendimiento"] is not None else "-"
+        lineas.append(f"• {c['cliente']} préstamos {' → '.join(map(str, c['prestamos']))} desde {c['desde']}: "
+                      f"crédito ${c['credito']:,.2f} | cobrado ${c['cobrado']:,.2f} | "
+                      f"exposición ${c['exposicion']:,.2f} | rendimiento {rendimiento}")
+    return "\n".join(lineas) or "No hay préstamos renganchados."
+
+
+if __name__ == "__main__":
+    from almacenamiento import cargar_datos
+    from indices import buscar_cliente
+
+    datos = cargar_datos()
+    if len(sys.argv) > 1:
+        cliente_idx, cliente = buscar_cliente(datos, sys.argv[1])
+        if cliente is None:
+            print(f"❌ Cliente no encontrado: {sys.argv[1]}")
+            sys.exit(1)
+        print(informe_cadenas(cadenas_cliente(datos, cliente_idx)))
+    else:
+        cartera = cadenas_cartera(datos)
+        print(informe_cadenas(cartera["cadenas"]))
+        print(f"\n🔗 {len(cartera['cadenas'])} cadenas | crédito ${cartera['credito']:,.2f} | "
+              f"cobrado ${cartera['cobrado']:,.2f} | exposición ${cartera['exposicion']:,.2f}")
@@ -0,0 +1,138 @@
+import math
+import sys
+
+from dinero import a_centavos, de_centavos, sumar
+
+# Totales de cada préstamo guardados en el propio préstamo:
+#   "pagado"      suma de los pagos
+#   "num_pagos"   cantidad de pagos
+#   "ultimo_pago" fecha del pago más reciente (o None)
+# Se actualizan en O(1) al registrar un pago, así que los reportes no vuelven
+# a sumar la lista "pagos". Si faltan (datos viejos) se recalculan al leerlos.
+# Con el modelo compacto (modelo.Pagos) los totales salen de los arreglos de
+# centavos y días sin armar cada pago. Las sumas se hacen en centavos (ver
+# dinero.py): "pagado" es siempre un monto exacto a centavos.
+
+CAMPOS_SALDO = ("pagado", "num_pagos", "ultimo_pago")
+
+
+# (pagado, num_pagos, ultimo_pago) de una lista de pagos
+def totales_pagos(pagos):
+    totales = pagos.totales() if hasattr(pagos, "totales") else None
+    if totales is not None:
+        return totales
+    return (sumar(p["monto"] for p in pagos),
+            len(pagos),
+            max((p["fecha"] for p in pagos), default=None))
+
+# Recalcular los totales desde la lista de pagos
+def recalcular_saldo(prestamo):
+    prestamo["pagado"], prestamo["num_pagos"], prestamo["ultimo_pago"] = totales_pagos(prestamo["pagos"])
+    return prestamo
+
+# Sumar un pago recién agregado a los totales
+def sumar_pago(prestamo, pago):
+    if "pagado" not in prestamo:
+        # El pago ya está en la lista; recalcular lo incluye
+        recalcular_saldo(prestamo)
+        return
+    prestamo["pagado"] = de_centavos(a_centavos(prestamo["pagado"]) + a_centavos(pago["monto"]))
+    prestamo["num_pagos"] += 1
+    if prestamo["ultimo_pago"] is None or pago["fecha"] > prestamo["ultimo_pago"]:
+        prestamo["ultimo_pago"] = pago["fecha"]
+
+# Pago que pasó el saldo a un renganche (ver eventos.nuevo_renganche): salda
+# el préstamo pero no es dinero cobrado
+def es_traspaso(pago):
+    return pago.get("renganche") is not None
+
+def pagado(prestamo):
+    if "pagado" not in prestamo:
+        recalcular_saldo(prestamo)
+    return prestamo["pagado"]
+
+def pagado_centavos(prestamo):
+    return a_centavos(pagado(prestamo))
+
+def restante_centavos(prestamo):
+    return a_centavos(prestamo["monto_total"]) - pagado_centavos(prestamo)
+
+def restante(prestamo):
+    return de_centavos(restante_centavos(prestamo))
+
+# Recalcular los totales de todos los préstamos
+def reconstruir_saldos(datos):
+    for cliente in datos["clientes"]:
+        for prestamo in cliente["prestamos"]:
+            recalcular_saldo(prestamo)
+
+# Comparar los totales guardados contra la lista de pagos.
+# Devuelve una lista de diferencias (vacía si todo cuadra).
+def verificar_saldos(datos):
+    diferencias = []
+    for cliente_idx, cliente in enumerate(datos["clientes"]):
+        for prestamo_idx, prestamo in enumerate(cliente["prestamos"]):
+            if "pagado" not in prestamo:
+                continue
+            reales = dict(zip(CAMPOS_SALDO, totales_pagos(prestamo["pagos"])))
+            for campo in CAMPOS_SALDO:
+                guardado = prestamo.get(campo)
+                real = reales[campo]
+                if campo == "pagado":
+                    iguales = guardado is not None and math.isclose(guardado, real, abs_tol=1e-6)
+                else:
+                    iguales = guardado == real
+                if not iguales:
+                    diferencias.append({
+                        "cliente": cliente["nombre"],
+                        "cliente_idx": cliente_idx,
+                        "prestamo_idx": prestamo_idx,
+                        "campo": campo,
+                        "guardado": guardado,
+                        "real": real
+                    })
+    return diferencias
+
+# Totales de toda la cartera recorriendo los clientes de a uno (sirve con
+# bitacora.iterar_clientes, que no carga todos los datos a la vez)
+def totales_cartera(clientes):
+    totales = {"clientes": 0, "prestamos": 0, "prestado": 0, "pagado": 0, "prestamos_con_deuda": 0}
+    for cliente in clientes:
+        totales["clientes"] += 1
+        for prestamo in cliente["prestamos"]:
+            monto, pagado_prestamo = a_centavos(prestamo["monto_total"]), pagado_centavos(prestamo)
+            totales["prestamos"] += 1
+            totales["prestado"] += monto
+            totales["pagado"] += pagado_prestamo
+            if monto > pagado_prestamo:
+                totales["prestamos_con_deuda"] += 1
+    totales["pendiente"] = de_centavos(totales["prestado"] - totales["pagado"])
+    totales["prestado"] = de_centavos(totales["prestado"])
+    totales["pagado"] = de_centavos(totales["pagado"])
+    return totales
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["totales"]:
+        from bitacora import iterar_clientes
+
+        totales = totales_cartera(iterar_clientes())
+        print(f"👥 Clientes: {totales['clientes']} | Préstamos: {totales['prestamos']} "
+              f"({totales['prestamos_con_deuda']} con deuda)")
+        print(f"💰 Prestado: ${totales['prestado']:,.2f} | Pagado: ${totales['pagado']:,.2f} | "
+              f"Pendiente: ${totales['pendiente']:,.2f}")
+        sys.exit(0)
+
+    from almacenamiento import cargar_datos, guardar_datos
+
+    datos = cargar_datos()
+    if sys.argv[1:2] == ["reconstruir"]:
+        reconstruir_saldos(datos)
+        guardar_datos(datos)
+        print("✅ Totales recalculados.")
+    else:
+        diferencias = verificar_saldos(datos)
+        for d in diferencias:
+            print(f"❌ {d['cliente']} préstamo {d['prestamo_idx']}: {d['campo']} guardado={d['guardado']} real={d['real']}")
+        if not diferencias:
+            print("✅ Todos los totales cuadran con los pagos.")
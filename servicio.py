@@ -0,0 +1,266 @@
+import math
+from datetime import date
+
+from cartera import estado_cuotas, ordinal_fecha, pagos_al, resta_prestamo
+from eventos import evento_cliente, evento_prestamo, evento_pago, evento_renganche
+from busqueda import LIMITE_SUGERENCIAS
+from conciliacion import conciliar
+from dinero import a_centavos, de_centavos
+from indices import buscar_cliente, resumen_pagos, sugerir_clientes as sugerir_en_datos
+from metricas import medido
+from mora import mora_al, mora_cargada
+from renganches import cadenas_cartera, cadenas_cliente
+from saldos import pagado, restante
+
+# Operaciones del sistema sin input() ni ventanas: reciben los datos y los
+# valores ya leídos y devuelven diccionarios listos para JSON. Las que
+# modifican algo solo validan y arman el evento; registrarlo queda a cargo de
+# quien llama (la consola de a uno, el servidor HTTP por lotes).
+# Un dato inválido es ValueError; un cliente o préstamo inexistente,
+# NoEncontrado.
+
+
+class NoEncontrado(LookupError):
+    pass
+
+
+def _cliente(datos, nombre):
+    nombre = str(nombre or "").strip()
+    cliente_idx, cliente = buscar_cliente(datos, nombre)
+    if not cliente:
+        raise NoEncontrado(f"cliente no encontrado: {nombre}")
+    return cliente_idx, cliente
+
+def _indice_prestamo(cliente, indice):
+    try:
+        indice = int(indice)
+    except (TypeError, ValueError):
+        raise ValueError(f"índice de préstamo inválido: {indice}") from None
+    if not 0 <= indice < len(cliente["prestamos"]):
+        raise NoEncontrado(f"{cliente['nombre'].strip()} no tiene el préstamo {indice}")
+    return indice
+
+def _monto(valor):
+    try:
+        monto = float(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"monto inválido: {valor}") from None
+    if not (monto > 0 and math.isfinite(monto)):
+        raise ValueError(f"monto inválido: {valor}")
+    return monto
+
+# Fecha en su forma canónica "YYYY-MM-DD": todo lo que ordena o agrupa por
+# fecha compara los textos, así que "2024-1-5" se guarda como "2024-01-05"
+def validar_fecha(valor):
+    fecha = str(valor or "").strip()
+    try:
+        return date.fromordinal(ordinal_fecha(fecha)).isoformat()
+    except ValueError:
+        raise ValueError(f"fecha inválida (YYYY-MM-DD): {fecha}") from None
+
+
+# Eventos validados
+def evento_agregar_cliente(datos, nombre, telefono):
+    nombre = str(nombre or "").strip()
+    if not nombre:
+        raise ValueError("falta el nombre del cliente")
+    return evento_cliente(nombre, str(telefono or "").strip())
+
+def _plazo(valor):
+    try:
+        plazo_semanas = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"plazo inválido: {valor}") from None
+    if plazo_semanas <= 0:
+        raise ValueError(f"plazo inválido: {valor}")
+    return plazo_semanas
+
+def evento_registrar_prestamo(datos, nombre, monto, plazo_semanas, fecha_inicio):
+    cliente_idx, _ = _cliente(datos, nombre)
+    return evento_prestamo(cliente_idx, _monto(monto), _plazo(plazo_semanas), validar_fecha(fecha_inicio))
+
+def evento_registrar_pago(datos, nombre, prestamo_idx, monto, fecha, cobrador=None):
+    cliente_idx, cliente = _cliente(datos, nombre)
+    prestamo_idx = _indice_prestamo(cliente, prestamo_idx)
+    cobrador = str(cobrador).strip() if cobrador is not None else None
+    return evento_pago(cliente_idx, prestamo_idx, _monto(monto), validar_fecha(fecha), cobrador)
+
+# Solo se rengancha un préstamo con saldo, una vez, desde su fecha de inicio
+def validar_renganche(prestamo, prestamo_idx, fecha_inicio):
+    if prestamo.get("renganches"):
+        raise ValueError(f"el préstamo {prestamo_idx} ya fue renganchado")
+    if restante(prestamo) <= 0:
+        raise ValueError(f"el préstamo {prestamo_idx} no tiene saldo para renganchar")
+    if fecha_inicio < prestamo["fecha_inicio"]:
+        raise ValueError(f"el renganche no puede ser anterior al préstamo ({prestamo['fecha_inicio']})")
+
+def evento_renganchar(datos, nombre, prestamo_idx, monto, plazo_semanas, fecha_inicio):
+    cliente_idx, cliente = _cliente(datos, nombre)
+    prestamo_idx = _indice_prestamo(cliente, prestamo_idx)
+    fecha_inicio = validar_fecha(fecha_inicio)
+    validar_renganche(cliente["prestamos"][prestamo_idx], prestamo_idx, fecha_inicio)
+    return evento_renganche(cliente_idx, prestamo_idx, _monto(monto), _plazo(plazo_semanas), fecha_inicio)
+
+# Volver a validar un evento ya armado contra los datos de ahora: entre que
+# se armó y se registra pueden haber entrado otras escrituras (el servidor
+# junta varias peticiones en un lote, y dos pueden renganchar el mismo préstamo)
+def validar_evento(datos, evento):
+    if evento["tipo"] not in ("registrar_prestamo", "registrar_pago", "renganchar"):
+        return
+    if not 0 <= evento["cliente"] < len(datos["clientes"]):
+        raise NoEncontrado(f"cliente no encontrado: {evento['cliente']}")
+    cliente = datos["clientes"][evento["cliente"]]
+    if evento["tipo"] != "registrar_prestamo":
+        prestamo_idx = _indice_prestamo(cliente, evento["prestamo"])
+        if evento["tipo"] == "renganchar":
+            validar_renganche(cliente["prestamos"][prestamo_idx], prestamo_idx, evento["fecha_inicio"])
+
+
+# Consultas
+def sugerir_clientes(datos, texto, limite=LIMITE_SUGERENCIAS):
+    texto = str(texto or "").strip()
+    if not texto:
+        raise ValueError("falta el nombre o teléfono a buscar")
+    return {
+        "consulta": texto,
+        "sugerencias": [{
+            "cliente_idx": cliente_idx,
+            "nombre": cliente["nombre"],
+            "telefono": cliente.get("telefono"),
+            "coincidencia": coincidencia
+        } for cliente_idx, cliente, coincidencia in sugerir_en_datos(datos, texto, limite)]
+    }
+
+# Estado de cuenta de un cliente ya encontrado. Con al ("YYYY-MM-DD") es el
+# estado al cierre de ese día: solo los préstamos iniciados y los pagos y
+# cargos de mora hasta entonces.
+def estado_cuenta_cliente(cliente, al=None):
+    dia = ordinal_fecha(validar_fecha(al)) if al else None
+    prestamos = []
+    for idx, prestamo in enumerate(cliente["prestamos"]):
+        if dia is None:
+            pagado_prestamo, num_pagos, mora = pagado(prestamo), len(prestamo["pagos"]), mora_cargada(prestamo)
+        elif ordinal_fecha(prestamo["fecha_inicio"]) > dia:
+            continue
+        else:
+            (pagado_prestamo, num_pagos), mora = pagos_al(prestamo, dia), mora_al(prestamo, al)
+        prestamos.append({
+            "prestamo_idx": idx,
+            "monto_total": prestamo["monto_total"],
+            "plazo_semanas": prestamo["plazo_semanas"],
+            "fecha_inicio": prestamo["fecha_inicio"],
+            "pagado": pagado_prestamo,
+            "pendiente": de_centavos(a_centavos(prestamo["monto_total"]) - a_centavos(pagado_prestamo)),
+            "mora": mora,
+            "num_pagos": num_pagos
+        })
+    return {
+        "cliente": cliente["nombre"],
+        "telefono": cliente.get("telefono"),
+        "al": validar_fecha(al) if al else date.today().isoformat(),
+        "prestamos": prestamos
+    }
+
+def estado_cuenta(datos, nombre, al=None):
+    _, cliente = _cliente(datos, nombre)
+    return estado_cuenta_cliente(cliente, al)
+
+@medido("resta_pago")
+def resta_pago(datos, nombre, prestamo_idx, hoy=None):
+    _, cliente = _cliente(datos, nombre)
+    prestamo_idx = _indice_prestamo(cliente, prestamo_idx)
+    hoy = validar_fecha(hoy) if hoy else None
+    return {
+        "cliente": nombre,
+        "prestamo_idx": prestamo_idx,
+        **resta_prestamo(cliente["prestamos"][prestamo_idx], hoy)
+    }
+
+def cuotas_prestamo(datos, nombre, prestamo_idx, hoy=None):
+    _, cliente = _cliente(datos, nombre)
+    prestamo_idx = _indice_prestamo(cliente, prestamo_idx)
+    return {
+        "cliente": cliente["nombre"],
+        "prestamo_idx": prestamo_idx,
+        "cuotas": estado_cuotas(cliente["prestamos"][prestamo_idx], validar_fecha(hoy) if hoy else None)
+    }
+
+# Resumen de un día; para un día pasado, los préstamos con deuda son los de
+# ese día (desde los totales materializados), no los de hoy
+def resumen_diario(datos, fecha=None):
+    hoy = date.today().isoformat()
+    fecha = validar_fecha(fecha) if fecha else hoy
+    resumen = resumen_pagos(datos, fecha)
+    saldo = datos.acumulados.saldo_al(fecha)
+    return {
+        "fecha": fecha,
+        "total_pagos": resumen["total_pagos"],
+        "prestamos_con_deuda": resumen["prestamos_con_deuda"] if fecha >= hoy else saldo["prestamos_con_deuda"],
+        "saldo_cartera": saldo["saldo"],
+        "pagos": [{"cliente": nombre, "monto": pago["monto"], "fecha": pago["fecha"]}
+                  for nombre, pago in resumen["pagos"]]
+    }
+
+# Cadenas de renganches de un cliente, o de toda la cartera sin nombre
+def renganches(datos, nombre=None):
+    if nombre is None:
+        return cadenas_cartera(datos)
+    cliente_idx, cliente = _cliente(datos, nombre)
+    return {"cliente": cliente["nombre"], "cadenas": cadenas_cliente(datos, cliente_idx)}
+
+# Saldo de toda la cartera al cierre de un día
+def saldo_cartera(datos, fecha=None):
+    return datos.acumulados.saldo_al(validar_fecha(fecha) if fecha else date.today().isoformat())
+
+# Cobranza de un período desde los totales materializados;
+# por es "dia", "semana" (contra las cuotas esperadas) o "cobrador"
+def cobranza(datos, desde, hasta=None, por="semana"):
+    desde = validar_fecha(desde)
+    hasta = validar_fecha(hasta) if hasta else desde
+    if hasta < desde:
+        raise ValueError(f"período inválido: {desde} a {hasta}")
+    consultas = {
+        "dia": datos.acumulados.por_dia,
+        "semana": datos.acumulados.por_semana,
+        "cobrador": datos.acumulados.por_cobrador
+    }
+    if por not in consultas:
+        raise ValueError(f"agrupación inválida: {por} (dia, semana o cobrador)")
+    return {"desde": desde, "hasta": hasta, "por": por,
+            **datos.acumulados.total(desde, hasta), "filas": consultas[por](desde, hasta)}
+
+# Conciliación de la cobranza de un período entre los pagos y los totales
+# materializados (y la caja, con un archivo de caja); por es "dia" o "cobrador"
+def conciliacion(datos, desde, hasta=None, por="dia", ruta_caja=None):
+    desde = validar_fecha(desde)
+    hasta = validar_fecha(hasta) if hasta else desde
+    if hasta < desde:
+        raise ValueError(f"período inválido: {desde} a {hasta}")
+    if por not in ("dia", "cobrador"):
+        raise ValueError(f"agrupación inválida: {por} (dia o cobrador)")
+    return conciliar(datos, desde, hasta, ruta_caja, por == "cobrador")
+
+
+# Respuesta de una escritura recién aplicada (aplicado es lo que devolvió
+# aplicar_evento: el cliente, préstamo o pago creado). Se arma apenas se
+# aplica el evento, así "pendiente" no incluye pagos posteriores del lote.
+def resultado_evento(datos, evento, aplicado):
+    if evento["tipo"] == "agregar_cliente":
+        return {"cliente": aplicado["nombre"], "telefono": aplicado["telefono"]}
+
+    cliente = datos["clientes"][evento["cliente"]]
+    if evento["tipo"] in ("registrar_prestamo", "renganchar"):
+        prestamo_idx = next(i for i in range(len(cliente["prestamos"]) - 1, -1, -1)
+                            if cliente["prestamos"][i] is aplicado)
+        resultado = {"cliente": cliente["nombre"], "prestamo_idx": prestamo_idx,
+                     "monto_total": aplicado["monto_total"], "plazo_semanas": aplicado["plazo_semanas"],
+                     "fecha_inicio": aplicado["fecha_inicio"]}
+        if evento["tipo"] == "renganchar":
+            resultado["renganche_de"] = evento["prestamo"]
+            resultado["saldo_anterior"] = aplicado["saldo_anterior"]
+        return resultado
+
+    prestamo = cliente["prestamos"][evento["prestamo"]]
+    return {"cliente": cliente["nombre"], "prestamo_idx": evento["prestamo"],
+            "monto": aplicado["monto"], "fecha": aplicado["fecha"], "cobrador": aplicado.get("cobrador"),
+            "pendiente": restante(prestamo)}
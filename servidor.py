@@ -0,0 +1,337 @@
+import asyncio
+import json
+import os
+import re
+import sys
+import traceback
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import almacenamiento
+import servicio
+from modelo import a_json
+from servicio import NoEncontrado
+
+# Servidor HTTP/JSON local sobre servicio.py, para que los cobradores envíen
+# pagos desde sus equipos sin correr cada uno su copia del programa.
+# Todas las conexiones comparten los mismos datos en memoria (un solo hilo,
+# el del bucle de asyncio), y las escrituras que llegan casi juntas se
+# registran en un solo lote: una escritura y un fsync de la bitácora para
+# todas. Dentro del lote cada petición se vuelve a validar contra lo que
+# dejaron las anteriores y entra entera o se rechaza sola (así dos renganches
+# del mismo préstamo no entran los dos). Cada petición recibe su respuesta
+# cuando su lote ya está guardado.
+#
+#   GET  /clientes/<nombre>                         estado de cuenta (?al=YYYY-MM-DD)
+#   GET  /clientes/<nombre>/prestamos/<i>/resta     resta del pago (?hoy=)
+#   GET  /clientes/<nombre>/prestamos/<i>/cuotas    cuotas y su estado (?hoy=)
+#   GET  /clientes/<nombre>/renganches              cadenas de renganches del cliente
+#   GET  /renganches                                cadenas de toda la cartera
+#   GET  /resumen?fecha=YYYY-MM-DD                  resumen del día
+#   GET  /saldo?fecha=YYYY-MM-DD                    saldo de la cartera a esa fecha
+#   GET  /buscar?q=<nombre o teléfono>              clientes parecidos
+#   GET  /cobranza?desde=&hasta=&por=semana         cobranza por dia/semana/cobrador
+#   GET  /conciliacion?desde=&hasta=&por=dia        pagos contra totales, por dia/cobrador
+#   POST /clientes   {"nombre", "telefono"}
+#   POST /prestamos  {"cliente", "monto", "plazo_semanas", "fecha_inicio"}
+#   POST /pagos      {"cliente", "prestamo", "monto", "fecha", "cobrador"} o una lista
+#   POST /renganches {"cliente", "prestamo", "monto", "plazo_semanas", "fecha_inicio"}
+#
+# Uso: python servidor.py [puerto]
+
+HOST = os.environ.get("PRESTAMOS_HOST", "127.0.0.1")
+PUERTO = int(os.environ.get("PRESTAMOS_PUERTO", "8080"))
+VENTANA_LOTE = 0.005  # segundos que se esperan para juntar escrituras
+MAXIMO_LOTE = 1000    # eventos por lote
+MAXIMO_CUERPO = 1 << 20
+
+ESTADOS = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error"
+}
+
+
+class ErrorHTTP(Exception):
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+class EscritorPorLotes:
+    """Junta los eventos de muchas peticiones y los registra juntos"""
+
+    def __init__(self, obtener_datos):
+        self.obtener_datos = obtener_datos
+        self.cola = asyncio.Queue()
+        self.lotes = 0
+        self.eventos = 0
+
+    async def registrar(self, eventos):
+        """Encola los eventos de una petición y devuelve sus resultados
+        cuando el lote que los contiene ya está en la bitácora"""
+        futuro = asyncio.get_running_loop().create_future()
+        await self.cola.put((eventos, futuro))
+        return await futuro
+
+    def _tomar_pendientes(self, pendientes):
+        total = sum(len(eventos) for eventos, _ in pendientes)
+        while not self.cola.empty() and total < MAXIMO_LOTE:
+            pendientes.append(self.cola.get_nowait())
+            total += len(pendientes[-1][0])
+        return pendientes
+
+    async def ejecutar(self):
+        while True:
+            pendientes = [await self.cola.get()]
+            await asyncio.sleep(VENTANA_LOTE)
+            pendientes = self._tomar_pendientes(pendientes)
+
+            # Se registra en el hilo del bucle: mientras dura el fsync no se
+            # atienden otras peticiones, que se acumulan para el lote siguiente
+            try:
+                resultados = almacenamiento.registrar_grupos(
+                    [grupo for grupo, _ in pendientes], self.obtener_datos(),
+                    servicio.validar_evento, servicio.resultado_evento)
+            except Exception as error:
+                for _, futuro in pendientes:
+                    if not futuro.done():
+                        futuro.set_exception(error)
+                continue
+            self.lotes += 1
+            for (_, futuro), resultado in zip(pendientes, resultados):
+                if isinstance(resultado, Exception):
+                    if not futuro.done():
+                        futuro.set_exception(resultado)
+                    continue
+                self.eventos += len(resultado)
+                if not futuro.done():
+                    futuro.set_result(resultado)
+
+
+class Servidor:
+    def __init__(self):
+        self.datos = almacenamiento.cargar_datos()
+        # Con el backend JSON la caché devuelve siempre el mismo objeto, al día
+        # con lo que anexen otros procesos (solo compara la firma de los
+        # archivos). SQLite arma datos nuevos en cada carga: se cargan una vez.
+        self.refrescar = isinstance(almacenamiento.obtener_repositorio(), almacenamiento.RepositorioJSON)
+        self.escritor = EscritorPorLotes(self.obtener_datos)
+        self.rutas = [
+            ("GET", re.compile(r"/clientes/(?P<nombre>[^/]+)"), self.estado_cuenta),
+            ("GET", re.compile(r"/clientes/(?P<nombre>[^/]+)/prestamos/(?P<prestamo>[^/]+)/resta"), self.resta_pago),
+            ("GET", re.compile(r"/clientes/(?P<nombre>[^/]+)/prestamos/(?P<prestamo>[^/]+)/cuotas"), self.cuotas),
+            ("GET", re.compile(r"/clientes/(?P<nombre>[^/]+)/renganches"), self.renganches),
+            ("GET", re.compile(r"/renganches"), self.renganches),
+            ("GET", re.compile(r"/resumen"), self.resumen_diario),
+            ("GET", re.compile(r"/saldo"), self.saldo_cartera),
+            ("GET", re.compile(r"/buscar"), self.buscar),
+            ("GET", re.compile(r"/cobranza"), self.cobranza),
+            ("GET", re.compile(r"/conciliacion"), self.conciliacion),
+            ("POST", re.compile(r"/clientes"), self.agregar_cliente),
+            ("POST", re.compile(r"/prestamos"), self.registrar_prestamo),
+            ("POST", re.compile(r"/pagos"), self.registrar_pagos),
+            ("POST", re.compile(r"/renganches"), self.renganchar)
+        ]
+
+    def obtener_datos(self):
+        if self.refrescar:
+            self.datos = almacenamiento.cargar_datos()
+        return self.datos
+
+    # Consultas
+    async def estado_cuenta(self, parametros, consulta, cuerpo):
+        return 200, servicio.estado_cuenta(self.obtener_datos(), parametros["nombre"], consulta.get("al"))
+
+    async def resta_pago(self, parametros, consulta, cuerpo):
+        return 200, servicio.resta_pago(self.obtener_datos(), parametros["nombre"], parametros["prestamo"],
+                                        consulta.get("hoy"))
+
+    async def cuotas(self, parametros, consulta, cuerpo):
+        return 200, servicio.cuotas_prestamo(self.obtener_datos(), parametros["nombre"], parametros["prestamo"],
+                                             consulta.get("hoy"))
+
+    async def renganches(self, parametros, consulta, cuerpo):
+        return 200, servicio.renganches(self.obtener_datos(), parametros.get("nombre"))
+
+    async def resumen_diario(self, parametros, consulta, cuerpo):
+        return 200, servicio.resumen_diario(self.obtener_datos(), consulta.get("fecha"))
+
+    async def saldo_cartera(self, parametros, consulta, cuerpo):
+        return 200, servicio.saldo_cartera(self.obtener_datos(), consulta.get("fecha"))
+
+    async def buscar(self, parametros, consulta, cuerpo):
+        return 200, servicio.sugerir_clientes(self.obtener_datos(), consulta.get("q"))
+
+    async def cobranza(self, parametros, consulta, cuerpo):
+        return 200, servicio.cobranza(self.obtener_datos(), consulta.get("desde"), consulta.get("hasta"),
+                                      consulta.get("por", "semana"))
+
+    async def conciliacion(self, parametros, consulta, cuerpo):
+        return 200, servicio.conciliacion(self.obtener_datos(), consulta.get("desde"), consulta.get("hasta"),
+                                          consulta.get("por", "dia"))
+
+    # Escrituras: se validan contra los datos actuales y se encolan
+    async def agregar_cliente(self, parametros, consulta, cuerpo):
+        valores = _objeto(cuerpo)
+        evento = servicio.evento_agregar_cliente(self.obtener_datos(), valores.get("nombre"), valores.get("telefono"))
+        return 201, (await self.escritor.registrar([evento]))[0]
+
+    async def registrar_prestamo(self, parametros, consulta, cuerpo):
+        valores = _objeto(cuerpo)
+        evento = servicio.evento_registrar_prestamo(
+            self.obtener_datos(), valores.get("cliente"), valores.get("monto"),
+            _entero(valores, "plazo_semanas"), valores.get("fecha_inicio"))
+        return 201, (await self.escritor.registrar([evento]))[0]
+
+    async def renganchar(self, parametros, consulta, cuerpo):
+        valores = _objeto(cuerpo)
+        evento = servicio.evento_renganchar(
+            self.obtener_datos(), valores.get("cliente"), _entero(valores, "prestamo"), valores.get("monto"),
+            _entero(valores, "plazo_semanas"), valores.get("fecha_inicio"))
+        return 201, (await self.escritor.registrar([evento]))[0]
+
+    async def registrar_pagos(self, parametros, consulta, cuerpo):
+        valores = _json(cuerpo)
+        lista = valores if isinstance(valores, list) else [valores]
+        datos = self.obtener_datos()
+        eventos = []
+        # Una lista (pagos guardados sin conexión) se acepta entera o nada
+        for numero, pago in enumerate(lista):
+            if not isinstance(pago, dict):
+                raise ValueError(f"pago {numero}: se esperaba un objeto JSON")
+            try:
+                eventos.append(servicio.evento_registrar_pago(
+                    datos, pago.get("cliente"), _entero(pago, "prestamo"), pago.get("monto"), pago.get("fecha"),
+                    pago.get("cobrador")))
+            except (ValueError, NoEncontrado) as error:
+                if len(lista) > 1:
+                    raise type(error)(f"pago {numero}: {error}") from None
+                raise
+        if not eventos:
+            raise ValueError("no hay pagos")
+        resultados = await self.escritor.registrar(eventos)
+        return 201, resultados if isinstance(valores, list) else resultados[0]
+
+    async def despachar(self, metodo, destino, cuerpo):
+        partes = urlsplit(destino)
+        ruta = partes.path.rstrip("/") or "/"
+        consulta = {clave: valores[-1] for clave, valores in parse_qs(partes.query).items()}
+        metodos = []
+        for metodo_ruta, patron, funcion in self.rutas:
+            coincide = patron.fullmatch(ruta)
+            if not coincide:
+                continue
+            if metodo_ruta != metodo:
+                metodos.append(metodo_ruta)
+                continue
+            parametros = {clave: unquote(valor) for clave, valor in coincide.groupdict().items()}
+            try:
+                return await funcion(parametros, consulta, cuerpo)
+            except NoEncontrado as error:
+                return 404, {"error": str(error)}
+            except ValueError as error:
+                return 400, {"error": str(error)}
+        if metodos:
+            return 405, {"error": f"método no permitido: {metodo}"}
+        return 404, {"error": f"ruta desconocida: {ruta}"}
+
+    async def atender(self, lector, escritor):
+        try:
+            while True:
+                linea = await lector.readline()
+                if not linea:
+                    break
+                try:
+                    metodo, destino, version = linea.decode("latin-1").split()
+                    encabezados = await _leer_encabezados(lector)
+                    largo = int(encabezados.get("content-length") or 0)
+                    if largo > MAXIMO_CUERPO:
+                        raise ErrorHTTP(413, "cuerpo demasiado grande")
+                    cuerpo = await lector.readexactly(largo) if largo > 0 else b""
+                except ErrorHTTP as error:
+                    _responder(escritor, error.estado, {"error": str(error)}, False)
+                    break
+                except ValueError:
+                    _responder(escritor, 400, {"error": "petición HTTP inválida"}, False)
+                    break
+
+                try:
+                    estado, resultado = await self.despachar(metodo.upper(), destino, cuerpo)
+                except Exception as error:
+                    traceback.print_exc()
+                    estado, resultado = 500, {"error": str(error)}
+
+                conexion = encabezados.get("connection", "").lower()
+                mantener = conexion == "keep-alive" if version == "HTTP/1.0" else conexion != "close"
+                _responder(escritor, estado, resultado, mantener)
+                await escritor.drain()
+                if not mantener:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    async def servir(self, host=HOST, puerto=PUERTO):
+        tarea = asyncio.create_task(self.escritor.ejecutar())
+        servidor = await asyncio.start_server(self.atender, host, puerto)
+        print(f"✅ Servidor de préstamos en http://{host}:{puerto} ({len(self.datos['clientes'])} clientes)")
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            tarea.cancel()
+
+
+async def _leer_encabezados(lector):
+    encabezados = {}
+    while True:
+        linea = await lector.readline()
+        if linea in (b"\r\n", b"\n", b""):
+            return encabezados
+        clave, separador, valor = linea.decode("latin-1").partition(":")
+        if not separador:
+            raise ValueError("encabezado inválido")
+        encabezados[clave.strip().lower()] = valor.strip()
+
+def _json(cuerpo):
+    if not cuerpo:
+        raise ValueError("falta el cuerpo JSON")
+    try:
+        return json.loads(cuerpo)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("cuerpo JSON inválido") from None
+
+def _objeto(cuerpo):
+    valores = _json(cuerpo)
+    if not isinstance(valores, dict):
+        raise ValueError("se esperaba un objeto JSON")
+    return valores
+
+# Campo entero de un cuerpo JSON: int() convertiría 1.5 o true en 1 y el
+# pago iría a otro préstamo, así que solo se aceptan enteros
+def _entero(valores, clave):
+    valor = valores.get(clave)
+    if not isinstance(valor, int) or isinstance(valor, bool):
+        raise ValueError(f"{clave} inválido: {json.dumps(valor)} (se esperaba un entero)")
+    return valor
+
+def _responder(escritor, estado, resultado, mantener):
+    cuerpo = json.dumps(resultado, ensure_ascii=False, default=a_json).encode("utf-8")
+    escritor.write(
+        f"HTTP/1.1 {estado} {ESTADOS[estado]}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(cuerpo)}\r\n"
+        f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n".encode("latin-1") + cuerpo)
+
+
+if __name__ == "__main__":
+    puerto = int(sys.argv[1]) if len(sys.argv) > 1 else PUERTO
+    try:
+        asyncio.run(Servidor().servir(HOST, puerto))
+    except KeyboardInterrupt:
+        pass
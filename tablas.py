@@ -0,0 +1,199 @@
+import tkinter as tk
+from datetime import date
+from tkinter import ttk
+
+from cartera import ordinal_fecha
+from indices import normalizar_nombre
+from dinero import a_centavos, de_centavos
+from mora import mora_cargada
+from saldos import pagado, pagado_centavos, restante
+
+# Tablas para la interfaz gráfica. En vez de armar todo el contenido como un
+# texto, la tabla pide a su "origen" solo las filas que se van mostrando:
+#   len(origen)            -> cantidad de filas
+#   origen.fila(i)         -> valores a mostrar de la fila i
+#   origen.clave(i, col)   -> valor para ordenar la fila i por la columna col
+
+TAMANO_PAGINA = 200
+
+
+class TablaPerezosa:
+    """ttk.Treeview que inserta las filas por páginas a medida que se desplaza"""
+
+    def __init__(self, padre, columnas, origen, tamano_pagina=TAMANO_PAGINA):
+        self.origen = origen
+        self.tamano_pagina = tamano_pagina
+        self.titulos = {c[0]: c[1] for c in columnas}
+        self.orden = None  # posiciones ordenadas, None = orden original
+        self.columna_orden = None
+        self.descendente = False
+        self.cargadas = 0
+        self._pagina_pendiente = False
+
+        marco = tk.Frame(padre, bg="white")
+        marco.pack(fill=tk.BOTH, expand=True)
+        self.tabla = ttk.Treeview(marco, columns=[c[0] for c in columnas], show="headings")
+        for columna, titulo, ancho, alineacion in columnas:
+            self.tabla.heading(columna, text=titulo, command=lambda c=columna: self.ordenar(c))
+            self.tabla.column(columna, width=ancho, anchor=alineacion)
+        self.barra = ttk.Scrollbar(marco, orient="vertical", command=self.tabla.yview)
+        self.tabla.configure(yscrollcommand=self._al_desplazar)
+        self.tabla.pack(side="left", fill="both", expand=True)
+        self.barra.pack(side="right", fill="y")
+
+        self.estado = tk.Label(padre, bg="white", fg="#7f8c8d", font=("Arial", 9))
+        self.estado.pack(anchor="w", pady=(5, 0))
+
+        self.cargar_pagina()
+
+    def _posicion(self, n):
+        return self.orden[n] if self.orden is not None else n
+
+    def cargar_pagina(self):
+        self._pagina_pendiente = False
+        fin = min(self.cargadas + self.tamano_pagina, len(self.origen))
+        for n in range(self.cargadas, fin):
+            i = self._posicion(n)
+            self.tabla.insert("", "end", iid=str(i), values=self.origen.fila(i))
+        self.cargadas = fin
+        self.estado.config(text=f"Mostrando {self.cargadas} de {len(self.origen)}")
+
+    def _al_desplazar(self, primero, ultimo):
+        self.barra.set(primero, ultimo)
+        # Cerca del final se agrega la página siguiente
+        if float(ultimo) >= 0.95 and self.cargadas < len(self.origen) and not self._pagina_pendiente:
+            self._pagina_pendiente = True
+            self.tabla.after_idle(self.cargar_pagina)
+
+    def ordenar(self, columna):
+        self.descendente = self.columna_orden == columna and not self.descendente
+        self.columna_orden = columna
+        self.orden = sorted(range(len(self.origen)),
+                            key=lambda i: self.origen.clave(i, columna),
+                            reverse=self.descendente)
+        for c, titulo in self.titulos.items():
+            flecha = (" ▼" if self.descendente else " ▲") if c == columna else ""
+            self.tabla.heading(c, text=titulo + flecha)
+        # Solo se borran las filas ya insertadas (a lo sumo unas pocas páginas)
+        self.tabla.delete(*self.tabla.get_children())
+        self.cargadas = 0
+        self.cargar_pagina()
+        self.tabla.yview_moveto(0)
+
+
+class OrigenClientes:
+    """Filas de la tabla "Todos los Clientes" """
+
+    COLUMNAS = [
+        ("n", "#", 50, "e"),
+        ("nombre", "Nombre", 170, "w"),
+        ("telefono", "Teléfono", 110, "w"),
+        ("prestamos", "Préstamos", 80, "e"),
+        ("prestado", "Prestado", 110, "e"),
+        ("pagado", "Pagado", 110, "e"),
+        ("pendiente", "Pendiente", 110, "e")
+    ]
+
+    def __init__(self, clientes):
+        self.clientes = clientes
+        self._totales = {}
+
+    def __len__(self):
+        return len(self.clientes)
+
+    def totales(self, i):
+        """(prestado, pagado) del cliente i, calculado una sola vez"""
+        if i not in self._totales:
+            prestamos = self.clientes[i]["prestamos"]
+            self._totales[i] = (de_centavos(sum(a_centavos(p["monto_total"]) for p in prestamos)),
+                                de_centavos(sum(pagado_centavos(p) for p in prestamos)))
+        return self._totales[i]
+
+    def fila(self, i):
+        cliente = self.clientes[i]
+        prestado, total_pagado = self.totales(i)
+        return (
+            i + 1,
+            cliente["nombre"],
+            cliente.get("telefono", "No registrado"),
+            len(cliente["prestamos"]),
+            f"${prestado:,.2f}",
+            f"${total_pagado:,.2f}",
+            f"${prestado - total_pagado:,.2f}"
+        )
+
+    def clave(self, i, columna):
+        if columna == "n":
+            return i
+        if columna == "nombre":
+            return normalizar_nombre(self.clientes[i]["nombre"])
+        if columna == "telefono":
+            return self.clientes[i].get("telefono", "")
+        if columna == "prestamos":
+            return len(self.clientes[i]["prestamos"])
+        prestado, total_pagado = self.totales(i)
+        if columna == "prestado":
+            return prestado
+        if columna == "pagado":
+            return total_pagado
+        return prestado - total_pagado
+
+
+class ArbolEstadoCuenta:
+    """Préstamos de un cliente; los pagos se insertan al abrir cada préstamo"""
+
+    COLUMNAS = [
+        ("monto", "Monto", 110, "e"),
+        ("fecha", "Fecha", 100, "center"),
+        ("plazo", "Plazo", 150, "w"),
+        ("pagado", "Pagado", 110, "e"),
+        ("pendiente", "Pendiente", 110, "e"),
+        ("mora", "Mora", 90, "e")
+    ]
+
+    def __init__(self, padre, cliente):
+        self.cliente = cliente
+        self.abiertos = set()
+
+        marco = tk.Frame(padre, bg="white")
+        marco.pack(fill=tk.BOTH, expand=True)
+        self.tabla = ttk.Treeview(marco, columns=[c[0] for c in self.COLUMNAS], show="tree headings")
+        self.tabla.heading("#0", text="Préstamo / Pago")
+        self.tabla.column("#0", width=140)
+        for columna, titulo, ancho, alineacion in self.COLUMNAS:
+            self.tabla.heading(columna, text=titulo)
+            self.tabla.column(columna, width=ancho, anchor=alineacion)
+        barra = ttk.Scrollbar(marco, orient="vertical", command=self.tabla.yview)
+        self.tabla.configure(yscrollcommand=barra.set)
+        self.tabla.pack(side="left", fill="both", expand=True)
+        barra.pack(side="right", fill="y")
+        self.tabla.bind("<<TreeviewOpen>>", self._al_abrir)
+
+        hoy = date.today().toordinal()
+        for idx, prestamo in enumerate(cliente["prestamos"]):
+            pagado_prestamo = pagado(prestamo)
+            try:
+                transcurridas = f"{(hoy - ordinal_fecha(prestamo['fecha_inicio'])) // 7} transcurridas"
+            except (TypeError, ValueError):
+                transcurridas = "fecha inválida"
+            self.tabla.insert("", "end", iid=str(idx), text=f"💰 Préstamo #{idx + 1}", values=(
+                f"${prestamo['monto_total']:,.2f}",
+                prestamo["fecha_inicio"],
+                f"{prestamo['plazo_semanas']} sem. ({transcurridas})",
+                f"${pagado_prestamo:,.2f}",
+                f"${restante(prestamo):,.2f}",
+                f"${mora_cargada(prestamo):,.2f}"
+            ))
+            if prestamo["pagos"]:
+                # Marcador para que aparezca el botón de abrir
+                self.tabla.insert(str(idx), "end", iid=f"{idx}-cargando", text="…")
+
+    def _al_abrir(self, _evento):
+        item = self.tabla.focus()
+        if item in self.abiertos or "-" in item:
+            return
+        self.abiertos.add(item)
+        self.tabla.delete(f"{item}-cargando")
+        for i, pago in enumerate(self.cliente["prestamos"][int(item)]["pagos"], 1):
+            self.tabla.insert(item, "end", iid=f"{item}-{i}", text=f"   Pago {i}",
+                              values=(f"${pago['monto']:,.2f}", pago["fecha"], "", "", "", ""))
@@ -0,0 +1,144 @@
+import sys
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk
+
+# Tareas en segundo plano para la interfaz gráfica. La carga, el guardado y
+# los reportes corren en hilos; el resultado se entrega en el hilo de Tk
+# revisando los pendientes con after(), así la ventana nunca se congela.
+# La función de la tarea recibe la Tarea como primer argumento para informar
+# su avance y enterarse si la cancelaron.
+
+
+class TareaCancelada(Exception):
+    pass
+
+
+class Tarea:
+    def __init__(self, titulo=None):
+        self.titulo = titulo
+        self.progreso = 0.0
+        self.mensaje = ""
+        self._cancelada = threading.Event()
+
+    def cancelar(self):
+        self._cancelada.set()
+
+    @property
+    def cancelada(self):
+        return self._cancelada.is_set()
+
+    def avanzar(self, progreso, mensaje=""):
+        """Informar el avance (0 a 1); corta la tarea si fue cancelada"""
+        if self.cancelada:
+            raise TareaCancelada()
+        self.progreso = progreso
+        if mensaje:
+            self.mensaje = mensaje
+
+
+class VentanaProgreso:
+    """Barra de avance con botón para cancelar la tarea"""
+
+    def __init__(self, raiz, tarea):
+        self.tarea = tarea
+        self.ventana = tk.Toplevel(raiz)
+        self.ventana.title(tarea.titulo)
+        self.ventana.geometry("360x130")
+        self.ventana.configure(bg="white")
+        self.ventana.resizable(False, False)
+        self.ventana.protocol("WM_DELETE_WINDOW", tarea.cancelar)
+
+        self.etiqueta = tk.Label(self.ventana, text=tarea.titulo, bg="white", fg="#2c3e50", font=("Arial", 10))
+        self.etiqueta.pack(pady=(15, 5))
+        self.barra = ttk.Progressbar(self.ventana, length=300, mode="determinate", maximum=100)
+        self.barra.pack(pady=5)
+        tk.Button(
+            self.ventana,
+            text="Cancelar",
+            command=tarea.cancelar,
+            bg="#e74c3c",
+            fg="white",
+            font=("Arial", 9, "bold"),
+            padx=15
+        ).pack(pady=5)
+        self.ventana.transient(raiz)
+
+    def actualizar(self):
+        self.barra["value"] = self.tarea.progreso * 100
+        texto = "Cancelando..." if self.tarea.cancelada else (self.tarea.mensaje or self.tarea.titulo)
+        self.etiqueta.config(text=texto)
+
+    def cerrar(self):
+        self.ventana.destroy()
+
+
+class EjecutorTareas:
+    """Pool de hilos cuyos resultados se entregan en el hilo de Tk"""
+
+    def __init__(self, raiz, hilos=2, intervalo_ms=50):
+        self.raiz = raiz
+        self.intervalo_ms = intervalo_ms
+        self.pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="tarea")
+        self.pendientes = []
+        self._revisando = False
+
+    def ejecutar(self, funcion, *args, al_terminar=None, al_fallar=None, titulo=None):
+        """Corre funcion(tarea, *args) en un hilo. Con titulo se muestra una
+        ventana de progreso con opción de cancelar."""
+        tarea = Tarea(titulo)
+        futuro = self.pool.submit(funcion, tarea, *args)
+        ventana = VentanaProgreso(self.raiz, tarea) if titulo else None
+        self.pendientes.append((tarea, futuro, ventana, al_terminar, al_fallar))
+        if not self._revisando:
+            self._revisando = True
+            self.raiz.after(self.intervalo_ms, self._revisar)
+        return tarea
+
+    def _revisar(self):
+        # Los callbacks pueden lanzar tareas nuevas: se agregan a self.pendientes
+        actuales, self.pendientes = self.pendientes, []
+        sigue = []
+        try:
+            while actuales:
+                pendiente = actuales.pop(0)
+                tarea, futuro, ventana, al_terminar, al_fallar = pendiente
+                if not futuro.done():
+                    if ventana:
+                        ventana.actualizar()
+                    sigue.append(pendiente)
+                    continue
+                # Un callback que falla se informa y no corta la entrega de
+                # los resultados de las demás tareas
+                try:
+                    self._entregar(futuro, ventana, al_terminar, al_fallar)
+                except Exception:
+                    self.raiz.report_callback_exception(*sys.exc_info())
+        finally:
+            # Lo no revisado (si algo falló afuera de los callbacks) sigue pendiente
+            self.pendientes = sigue + actuales + self.pendientes
+            if self.pendientes:
+                self.raiz.after(self.intervalo_ms, self._revisar)
+            else:
+                self._revisando = False
+
+    @staticmethod
+    def _entregar(futuro, ventana, al_terminar, al_fallar):
+        if ventana:
+            ventana.cerrar()
+        if futuro.cancelled():
+            return
+        error = futuro.exception()
+        if isinstance(error, TareaCancelada):
+            return
+        if error is not None:
+            if al_fallar:
+                al_fallar(error)
+        elif al_terminar:
+            al_terminar(futuro.result())
+
+    def cerrar(self):
+        for tarea, *_ in self.pendientes:
+            tarea.cancelar()
+        self.pool.shutdown(wait=False, cancel_futures=True)